@@ -0,0 +1,94 @@
+"""Precomputed task alerts for a day's schedule.
+
+This module has no Qt dependency: the desktop app feeds it the schedule and
+the current time, and arms a single-shot timer for `seconds_until_next()`.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+
+
+START = 'start'
+END_SOON = 'end_soon'
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# `at` is seconds since midnight
+AlertEvent = namedtuple('AlertEvent', 'at kind task')
+
+
+def parse_slot_time(value):
+    hours, minutes = value.split(':')
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+def seconds_since_midnight(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class AlertEngine:
+    """Sorted queue of start and end-soon events for one day.
+
+    Consecutive slots holding the same task are treated as one block, so a
+    two-hour focus block alerts once when it starts and once before it ends.
+    """
+
+    def __init__(self, start_lead_minutes=0, end_lead_minutes=5, slot_minutes=30,
+                 enabled=(START, END_SOON)):
+        self.start_lead = start_lead_minutes * 60
+        self.end_lead = end_lead_minutes * 60
+        self.slot_length = slot_minutes * 60
+        self.enabled = set(enabled)
+        self.events = []
+        self._index = 0
+        self._last_now = 0
+
+    def rebuild(self, schedule, now=0):
+        """Recompute events from `{"HH:MM": task}` and skip the ones before `now`."""
+        slots = sorted((parse_slot_time(time), task.strip())
+                       for time, task in schedule.items() if task and task.strip())
+        events = []
+        block_start = block_end = block_task = None
+        for start, task in slots:
+            if task == block_task and start == block_end:
+                block_end = start + self.slot_length
+                continue
+            if block_task is not None:
+                events.extend(self._block_events(block_start, block_end, block_task))
+            block_start, block_end, block_task = start, start + self.slot_length, task
+        if block_task is not None:
+            events.extend(self._block_events(block_start, block_end, block_task))
+
+        self.events = sorted(events)
+        self._index = bisect_left(self.events, (now,))
+        self._last_now = now
+
+    def _block_events(self, start, end, task):
+        yield AlertEvent(max(start - self.start_lead, 0), START, task)
+        yield AlertEvent(max(end - self.end_lead, start), END_SOON, task)
+
+    def pop_due(self, now):
+        """Return enabled events due at or before `now` that have not fired yet."""
+        if now < self._last_now:
+            # Clock passed midnight; the same schedule applies again
+            self._index = 0
+        self._last_now = now
+        due = []
+        while self._index < len(self.events) and self.events[self._index].at <= now:
+            event = self.events[self._index]
+            if event.kind in self.enabled:
+                due.append(event)
+            self._index += 1
+        return due
+
+    def next_event(self):
+        for event in self.events[self._index:]:
+            if event.kind in self.enabled:
+                return event
+        return None
+
+    def seconds_until_next(self, now):
+        """Seconds to wait before the next event, or until midnight if none is left."""
+        event = self.next_event()
+        if event is None:
+            return SECONDS_PER_DAY - now
+        return max(event.at - now, 0)
@@ -0,0 +1,140 @@
+"""Time-usage statistics over schedule history.
+
+Slot and summary rows are loaded in bulk into NumPy arrays and aggregated
+with vectorized group-bys (`np.unique` + `np.bincount`) rather than Python
+loops per entry. Week/month completion and per-task hours come from
+`timeboxing_daily_summary`, which a trigger keeps up to date on every write,
+so multi-year ranges read one small row per day instead of every slot.
+"""
+import numpy as np
+
+
+PERIODS = ('week', 'month')
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# 1970-01-01 (day 0 of datetime64[D]) was a Thursday
+_EPOCH_WEEKDAY = 3
+
+SLOT_ROWS_SQL = """
+    SELECT e.date, s.minute, COALESCE(e.slot_minutes, 30), s.task, s.checked
+    FROM timeboxing_entry e
+    CROSS JOIN LATERAL timeboxing_schedule_slots(e.schedule) s
+    WHERE e.user_id = %s AND e.date BETWEEN %s AND %s AND COALESCE(s.task, '') <> ''
+"""
+
+SUMMARY_ROWS_SQL = """
+    SELECT date, planned_slots, completed_slots, planned_minutes, completed_minutes
+    FROM timeboxing_daily_summary
+    WHERE user_id = %s AND date BETWEEN %s AND %s
+    ORDER BY date
+"""
+
+TASK_MINUTES_SQL = """
+    SELECT t.key, t.value::int
+    FROM timeboxing_daily_summary s
+    CROSS JOIN LATERAL jsonb_each_text(s.task_minutes) t
+    WHERE s.user_id = %s AND s.date BETWEEN %s AND %s
+"""
+
+
+def _weekday(days):
+    return (days.astype('int64') + _EPOCH_WEEKDAY) % 7
+
+
+def _period_start(days, period):
+    if period == 'week':
+        return days - _weekday(days).astype('timedelta64[D]')
+    if period == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"period must be one of {PERIODS}")
+
+
+def _columns(rows, count):
+    if rows:
+        return list(zip(*rows))
+    return [()] * count
+
+
+def load_slots(cursor, user_id, start, end):
+    """Planned slots in range as columnar arrays."""
+    cursor.execute(SLOT_ROWS_SQL, (user_id, start, end))
+    dates, minutes, slot_minutes, tasks, checked = _columns(cursor.fetchall(), 5)
+    return {
+        'date': np.array(dates, dtype='datetime64[D]'),
+        'minute': np.array(minutes, dtype=np.int32),
+        'duration': np.array(slot_minutes, dtype=np.int32),
+        'task': np.array(tasks, dtype=object),
+        'checked': np.array(checked, dtype=bool),
+    }
+
+
+def load_daily_summary(cursor, user_id, start, end):
+    cursor.execute(SUMMARY_ROWS_SQL, (user_id, start, end))
+    dates, planned, completed, planned_minutes, completed_minutes = _columns(cursor.fetchall(), 5)
+    return {
+        'date': np.array(dates, dtype='datetime64[D]'),
+        'planned': np.array(planned, dtype=np.int64),
+        'completed': np.array(completed, dtype=np.int64),
+        'planned_minutes': np.array(planned_minutes, dtype=np.int64),
+        'completed_minutes': np.array(completed_minutes, dtype=np.int64),
+    }
+
+
+def hours_per_task(cursor, user_id, start, end):
+    """`[(task, hours)]` sorted by hours, descending."""
+    cursor.execute(TASK_MINUTES_SQL, (user_id, start, end))
+    tasks, minutes = _columns(cursor.fetchall(), 2)
+    if not tasks:
+        return []
+    names, codes = np.unique(np.array(tasks, dtype=object), return_inverse=True)
+    totals = np.bincount(codes, weights=np.array(minutes, dtype=np.float64)) / 60
+    order = np.argsort(-totals, kind='stable')
+    return [(str(names[i]), round(float(totals[i]), 2)) for i in order]
+
+
+def completion_by_period(summary, period='week'):
+    """`[(period_start, planned, completed, rate)]` for each week or month."""
+    if not len(summary['date']):
+        return []
+    starts, codes = np.unique(_period_start(summary['date'], period), return_inverse=True)
+    planned = np.bincount(codes, weights=summary['planned'], minlength=len(starts))
+    completed = np.bincount(codes, weights=summary['completed'], minlength=len(starts))
+    rates = np.divide(completed, planned, out=np.zeros_like(planned), where=planned > 0)
+    return [
+        (str(day), int(p), int(c), round(float(r), 3))
+        for day, p, c, r in zip(starts, planned, completed, rates)
+    ]
+
+
+def planned_vs_completed(summary):
+    planned = int(summary['planned'].sum())
+    completed = int(summary['completed'].sum())
+    return {
+        'planned_slots': planned,
+        'completed_slots': completed,
+        'planned_hours': round(float(summary['planned_minutes'].sum()) / 60, 2),
+        'completed_hours': round(float(summary['completed_minutes'].sum()) / 60, 2),
+        'completion_rate': round(completed / planned, 3) if planned else 0.0,
+    }
+
+
+def busiest_hours(slots):
+    """7x24 array of planned hours by weekday (Mon first) and hour of day."""
+    cells = _weekday(slots['date']) * 24 + slots['minute'] // 60
+    hours = np.bincount(cells, weights=slots['duration'] / 60, minlength=7 * 24)
+    return hours.reshape(7, 24)
+
+
+def report(cursor, user_id, start, end, period='week'):
+    """Everything the /stats page shows for `user_id`, as plain JSON-friendly values."""
+    summary = load_daily_summary(cursor, user_id, start, end)
+    heatmap = busiest_hours(load_slots(cursor, user_id, start, end))
+    return {
+        'from': str(start),
+        'to': str(end),
+        'period': period,
+        'hours_per_task': hours_per_task(cursor, user_id, start, end),
+        'completion': completion_by_period(summary, period),
+        'totals': planned_vs_completed(summary),
+        'heatmap': [[round(float(hours), 2) for hours in row] for row in heatmap],
+    }
@@ -0,0 +1,374 @@
+"""Async serving mode for the web planner.
+
+    uvicorn asgi:app --workers 1 --port 8000
+    hypercorn asgi:app --bind 127.0.0.1:8000
+
+The planner page, history and the JSON entry/search API are served by
+async handlers on one shared psycopg 3 connection pool (async_db), so a
+request waiting on Postgres does not hold a worker. The live change stream
+(/api/changes) is async too, so open pages do not each hold a thread. Every other route
+(stats, search page, export/import, /metrics, static files) falls through
+to the regular Flask app from app.py, which runs in a thread pool. The
+pages are rendered from the same templates, and `python app.py` still
+starts the sync server.
+
+DATABASE_URL, USER_HEADER and TIMEBOXING_USER mean the same as for app.py;
+ASYNC_POOL_MIN/ASYNC_POOL_MAX size the pool.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+import anyio
+import psycopg2
+from a2wsgi import WSGIMiddleware
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response, \
+    StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+import app as sync_app
+import async_db
+import entry_io
+from migrations import migrate
+from schedule_codec import decode
+from schedule_grid import (SLOT_FIELDS, SLOT_MINUTE_CHOICES, grid_from_mapping, grid_of, is_slot_time,
+                           regrid_schedule, slot_minutes_of_hour)
+from live_changes import HEARTBEAT_SECONDS, SSE_HEARTBEAT, sse_event
+from search import highlight
+from timeboxing_db import MISSING, RevisionConflict, as_date, fill_day_cache, prefetch_window
+
+
+DATABASE_URL = sync_app.app.config['SQLALCHEMY_DATABASE_URI']
+POOL_MIN_SIZE = int(os.getenv('ASYNC_POOL_MIN', 2))
+POOL_MAX_SIZE = int(os.getenv('ASYNC_POOL_MAX', 20))
+
+pool = async_db.make_pool(DATABASE_URL, POOL_MIN_SIZE, POOL_MAX_SIZE)
+change_hub = async_db.ChangeHub(DATABASE_URL)
+
+# URLs are built from the Flask app's routes, so the templates' url_for()
+# calls resolve exactly as they do there
+url_adapter = sync_app.app.url_map.bind('localhost')
+templates = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')),
+    autoescape=select_autoescape(['html', 'xml']),
+    enable_async=True,
+)
+templates.globals['url_for'] = lambda endpoint, **values: url_adapter.build(endpoint, values)
+
+
+def current_user_id(request):
+    user_id = request.headers.get(sync_app.USER_HEADER) if sync_app.USER_HEADER else None
+    return user_id or sync_app.FALLBACK_USER
+
+
+def entry_etag(user_id, date, revision, *variant):
+    return ":".join(str(part) for part in (user_id, date, revision, *variant))
+
+
+def is_fresh(request, etag, last_modified):
+    if request.headers.get('if-none-match'):
+        return parse_etags(request.headers['if-none-match']).contains(etag)
+    since = parse_date(request.headers.get('if-modified-since'))
+    return since is not None and last_modified is not None and last_modified.replace(microsecond=0) <= since
+
+
+def add_validators(response, etag, last_modified):
+    response.headers['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = 'no-cache, private'
+    return response
+
+
+async def read_form(request):
+    # Plain urlencoded posts only; the planner form has no file fields
+    return dict(parse_qsl((await request.body()).decode('utf-8'), keep_blank_values=True))
+
+
+async def render(name, **context):
+    return await templates.get_template(name).render_async(**context)
+
+
+async def load_day(cursor, cache, user_id, date):
+    """Async load_day: read through `cache`, prefetching the days around `date`."""
+    entry = cache.get(date)
+    if entry is not MISSING:
+        return entry
+    start, end = prefetch_window(date, sync_app.PREFETCH_DAYS)
+    entries = await async_db.fetch_entries_between(cursor, user_id, start, end)
+    return fill_day_cache(cache, date, start, end, entries)
+
+
+async def index(request):
+    user_id = current_user_id(request)
+    day_cache = sync_app.day_cache_for(user_id)
+
+    if request.method == 'POST':
+        form = await read_form(request)
+        try:
+            date = datetime.strptime(form['date'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return PlainTextResponse("Date must be YYYY-MM-DD", status_code=400)
+        try:
+            grid = grid_from_mapping(form)
+        except ValueError as e:
+            return PlainTextResponse(str(e), status_code=400)
+        posted = {key: value for key, value in form.items() if is_slot_time(key)}
+        schedule = regrid_schedule(posted, grid)
+        expected_revision = int(form['revision']) if form.get('revision', '').isdigit() else None
+
+        day_cache.invalidate(date)
+        try:
+            async with pool.connection() as conn:
+                entry = await async_db.upsert_entry(conn.cursor(), user_id, date, form['top_priorities'],
+                                                    form['brain_dump'], schedule, grid,
+                                                    expected_revision=expected_revision)
+        except RevisionConflict:
+            return PlainTextResponse("This day was changed in another window. Reload it before saving again.",
+                                     status_code=409)
+        day_cache.put(date, entry)
+        return RedirectResponse(url_adapter.build('index'), status_code=302)
+
+    date = request.query_params.get('date', datetime.now().strftime('%Y-%m-%d'))
+    try:
+        as_date(date)
+    except ValueError:
+        return PlainTextResponse("Date must be YYYY-MM-DD", status_code=400)
+    variant = request.url.query
+    async with pool.connection() as conn:
+        cursor = conn.cursor()
+        # Cheap revision-only lookup first; a matching ETag skips loading and rendering
+        revision, updated_at = await async_db.fetch_revision(cursor, user_id, as_date(date))
+        if is_fresh(request, entry_etag(user_id, date, revision, variant), updated_at):
+            return add_validators(Response(status_code=304), entry_etag(user_id, date, revision, variant),
+                                  updated_at)
+        entry = await load_day(cursor, day_cache, user_id, as_date(date))
+        if (entry.revision if entry else 0) != revision:
+            # Another process wrote this day since we cached it
+            day_cache.invalidate(date)
+            entry = await load_day(cursor, day_cache, user_id, as_date(date))
+
+    try:
+        grid = grid_from_mapping(request.query_params, default=grid_of(entry))
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    stored = regrid_schedule(decode(entry.schedule), grid) if entry else {}
+    schedule = {time: slot.task for time, slot in stored.items()}
+    page = await render('index.html', date=date, entry=entry, schedule=schedule, grid=grid,
+                        minutes=slot_minutes_of_hour(grid), slot_minute_choices=SLOT_MINUTE_CHOICES)
+    return add_validators(HTMLResponse(page), entry_etag(user_id, date, entry.revision if entry else 0, variant),
+                          entry.updated_at if entry else None)
+
+
+async def view_history(request):
+    before = request.query_params.get('before')
+    try:
+        limit = int(request.query_params.get('limit', sync_app.HISTORY_PAGE_SIZE))
+    except ValueError:
+        limit = sync_app.HISTORY_PAGE_SIZE
+    limit = max(min(limit, sync_app.HISTORY_MAX_PAGE_SIZE), 1)
+    try:
+        before = as_date(before) if before else None
+    except ValueError:
+        return PlainTextResponse("before must be a YYYY-MM-DD date", status_code=400)
+
+    async with pool.connection() as conn:
+        rows = await async_db.fetch_history(
+            conn.cursor(), current_user_id(request), before, limit + 1,
+            sync_app.HISTORY_SUMMARY_LENGTH)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].date.strftime('%Y-%m-%d')
+    stream = templates.get_template('view_history.html').generate_async(
+        entries=rows, next_cursor=next_cursor, limit=limit)
+    return StreamingResponse(stream, media_type='text/html; charset=utf-8')
+
+
+async def api_entries(request):
+    try:
+        start = as_date(request.query_params['from'])
+        end = as_date(request.query_params['to'])
+    except (KeyError, ValueError):
+        return JSONResponse({'error': "from and to must be YYYY-MM-DD dates"}, status_code=400)
+    if not 0 <= (end - start).days <= sync_app.API_MAX_RANGE_DAYS:
+        return JSONResponse({'error': f"Range must be at most {sync_app.API_MAX_RANGE_DAYS} days"},
+                            status_code=400)
+
+    user_id = current_user_id(request)
+    async with pool.connection() as conn:
+        entries = await async_db.fetch_entries_between(conn.cursor(), user_id, start, end)
+    fingerprint = ";".join(f"{entry.date}:{entry.revision}" for entry in entries)
+    etag = hashlib.sha1(f"{user_id}:{start}:{end}:{fingerprint}".encode()).hexdigest()
+    last_modified = max((entry.updated_at for entry in entries), default=None)
+    if is_fresh(request, etag, last_modified):
+        return add_validators(Response(status_code=304), etag, last_modified)
+    records = [sync_app.api_record(entry) for entry in entries]
+    return add_validators(JSONResponse({'entries': records}), etag, last_modified)
+
+
+async def api_patch_slot(request):
+    slot = request.path_params['slot']
+    if not is_slot_time(slot):
+        return JSONResponse({'error': "Slot must be HH:MM"}, status_code=404)
+    try:
+        date = as_date(request.path_params['date'])
+    except ValueError:
+        return JSONResponse({'error': "Date must be YYYY-MM-DD"}, status_code=404)
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return JSONResponse({'error': "Expected a JSON object"}, status_code=400)
+    fields = SLOT_FIELDS
+    changes = {key: body[key] for key in fields if key in body}
+    if not changes or any(not isinstance(value, fields[key]) for key, value in changes.items()):
+        return JSONResponse({'error': "Send at least one of task (string), checked (bool), color (string)"},
+                            status_code=400)
+    revision = body.get('revision')
+    if not sync_app.is_revision(revision):
+        return JSONResponse({'error': "revision must be an integer"}, status_code=400)
+
+    user_id = current_user_id(request)
+    try:
+        async with pool.connection() as conn:
+            entry = await async_db.patch_slot(conn.cursor(), user_id, date, slot, changes,
+                                              expected_revision=revision)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except RevisionConflict as e:
+        return JSONResponse({'error': str(e)}, status_code=409)
+    sync_app.day_cache_for(user_id).put(date, entry)
+    return add_validators(JSONResponse(sync_app.api_record(entry)), entry_etag(user_id, date, entry.revision),
+                          entry.updated_at)
+
+
+async def api_batch_upsert(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    records = body.get('entries') if isinstance(body, dict) else body
+    if not isinstance(records, list):
+        return JSONResponse({'error': "Expected a list of entries"}, status_code=400)
+    try:
+        rows = [entry_io.record_to_row(record) for record in records]
+    except (KeyError, TypeError, ValueError) as e:
+        return JSONResponse({'error': f"Invalid entry: {e}"}, status_code=400)
+
+    user_id = current_user_id(request)
+    async with pool.connection() as conn:
+        saved = await async_db.upsert_entries(conn.cursor(), user_id, rows)
+    day_cache = sync_app.day_cache_for(user_id)
+    for entry in saved:
+        day_cache.put(entry.date, entry)
+    return JSONResponse({'entries': [sync_app.api_record(entry) for entry in saved]})
+
+
+async def api_search(request):
+    query = request.query_params.get('q', '')
+    try:
+        limit = max(min(int(request.query_params.get('limit', 50)), 200), 1)
+    except ValueError:
+        return JSONResponse({'error': "limit must be an integer"}, status_code=400)
+    async with pool.connection() as conn:
+        results = await async_db.search_entries(conn.cursor(), current_user_id(request), query, limit)
+    return JSONResponse({'results': [
+        {'date': str(result.date), 'rank': result.rank, 'snippet': highlight(result.snippet)}
+        for result in results
+    ]})
+
+
+async def api_changes(request):
+    # Same event stream as the Flask route, without holding a thread per open page
+    subscription = change_hub.subscribe(current_user_id(request))
+
+    async def stream():
+        try:
+            while True:
+                try:
+                    change = await asyncio.wait_for(subscription.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield SSE_HEARTBEAT
+                    continue
+                yield sse_event(change)
+        finally:
+            change_hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+class RequestMetrics:
+    """Times the async handlers into the same histogram the Flask app uses.
+
+    Requests that fall through to Flask are timed by Flask itself.
+    """
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = getattr(scope.get('endpoint'), '__name__', None)
+            if endpoint in ASYNC_ENDPOINTS:
+                sync_app.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                                 method=scope['method'], status=status)
+
+
+def run_migrations():
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    await anyio.to_thread.run_sync(run_migrations)
+    await pool.open()
+    try:
+        yield
+    finally:
+        await change_hub.close()
+        await pool.close()
+
+
+routes = [
+    Route('/', index, methods=['GET', 'POST']),
+    Route('/history', view_history),
+    Route('/api/entries', api_entries),
+    Route('/api/entries/{date}/slots/{slot}', api_patch_slot, methods=['PATCH']),
+    Route('/api/entries:batch', api_batch_upsert, methods=['POST']),
+    Route('/api/search', api_search),
+    Route('/api/changes', api_changes),
+]
+ASYNC_ENDPOINTS = {route.endpoint.__name__ for route in routes}
+
+app = RequestMetrics(Starlette(
+    routes=routes + [Mount('/', app=WSGIMiddleware(sync_app.app))],
+    lifespan=lifespan,
+))
@@ -0,0 +1,170 @@
+"""Async counterparts of the timeboxing_db helpers, on psycopg 3.
+
+These run the very same SQL as timeboxing_db. The pool hands out
+connections whose cursors bind parameters client-side (AsyncClientCursor),
+as psycopg2 does, so the shared psycopg2-style statements work unchanged.
+"""
+import asyncio
+import time
+from collections import namedtuple
+
+import psycopg
+from psycopg import AsyncClientCursor
+from psycopg_pool import AsyncConnectionPool
+
+import metrics
+import schedule_codec
+from live_changes import CHANNEL, RESYNC, parse_change
+from schedule_grid import grid_of
+from search import SEARCH_LIMIT, SEARCH_SQL, SearchResult
+from timeboxing_db import (SELECT_ENTRY_FOR_UPDATE_SQL, SELECT_RANGE_SQL, SELECT_REVISION_SQL, UPSERT_ENTRY_SQL,
+                           UPSERT_IF_REVISION_SQL, UPSERT_TEMPLATE, DayEntry, RevisionConflict, check_slot_fits, entry_params)
+
+
+HistoryRow = namedtuple('HistoryRow', 'id date summary')
+
+SELECT_HISTORY_SQL = """
+    SELECT id, date, substr(top_priorities, 1, %(summary_length)s) AS summary
+    FROM timeboxing_entry
+    WHERE user_id = %(user_id)s AND (%(before)s::date IS NULL OR date < %(before)s::date)
+    ORDER BY date DESC
+    LIMIT %(limit)s
+"""
+
+
+def make_pool(conninfo, min_size=2, max_size=20):
+    """Connection pool for `conninfo`; open it with `await pool.open()`."""
+    return AsyncConnectionPool(conninfo, min_size=min_size, max_size=max_size, open=False,
+                               kwargs={'cursor_factory': AsyncClientCursor})
+
+
+async def _execute(cursor, statement, params=None):
+    started = time.perf_counter()
+    try:
+        await cursor.execute(statement, params)
+    finally:
+        metrics.record_query(statement, time.perf_counter() - started)
+
+
+async def fetch_revision(cursor, user_id, date):
+    await _execute(cursor, SELECT_REVISION_SQL, (user_id, date))
+    return await cursor.fetchone() or (0, None)
+
+
+async def fetch_entries_between(cursor, user_id, start, end):
+    await _execute(cursor, SELECT_RANGE_SQL, (user_id, start, end))
+    return [DayEntry(*row) for row in await cursor.fetchall()]
+
+
+async def fetch_history(cursor, user_id, before, limit, summary_length):
+    await _execute(cursor, SELECT_HISTORY_SQL, {
+        'user_id': user_id, 'before': before, 'limit': limit, 'summary_length': summary_length,
+    })
+    return [HistoryRow(*row) for row in await cursor.fetchall()]
+
+
+async def upsert_entry(cursor, user_id, date, top_priorities, brain_dump, schedule, grid=None,
+                       expected_revision=None):
+    params = entry_params(user_id, date, top_priorities, brain_dump, schedule, grid)
+    if expected_revision is None:
+        await _execute(cursor, UPSERT_ENTRY_SQL % UPSERT_TEMPLATE, params)
+    else:
+        await _execute(cursor, UPSERT_IF_REVISION_SQL, (*params, expected_revision))
+    row = await cursor.fetchone()
+    if row is None:
+        raise RevisionConflict(f"Entry for {date} was modified by another client")
+    return DayEntry(*row)
+
+
+async def upsert_entries(cursor, user_id, entries, page_size=500):
+    """Like timeboxing_db.upsert_entries: one multi-row upsert per page."""
+    by_date = {}
+    for entry in entries:
+        by_date[entry[0]] = entry_params(user_id, *entry)
+    rows = list(by_date.values())
+    saved = []
+    for offset in range(0, len(rows), page_size):
+        values = ", ".join(cursor.mogrify(UPSERT_TEMPLATE, params) for params in rows[offset:offset + page_size])
+        await _execute(cursor, UPSERT_ENTRY_SQL % values)
+        saved.extend(DayEntry(*row) for row in await cursor.fetchall())
+    return saved
+
+
+async def patch_slot(cursor, user_id, date, time, changes, expected_revision=None):
+    await _execute(cursor, SELECT_ENTRY_FOR_UPDATE_SQL, (user_id, date))
+    row = await cursor.fetchone()
+    current = DayEntry(*row) if row else None
+    check_slot_fits(time, current)
+    revision = current.revision if current else 0
+    if expected_revision is not None and expected_revision != revision:
+        raise RevisionConflict(f"Entry for {date} was modified by another client")
+    schedule = schedule_codec.patch_slot(current and current.schedule, time, changes)
+    return await upsert_entry(cursor, user_id, date, current and current.top_priorities,
+                              current and current.brain_dump, schedule, grid_of(current), expected_revision=revision)
+
+
+async def search_entries(cursor, user_id, query, limit=SEARCH_LIMIT):
+    if not query.strip():
+        return []
+    await _execute(cursor, SEARCH_SQL, (query, user_id, limit))
+    return [SearchResult(*row) for row in await cursor.fetchall()]
+
+
+class ChangeHub:
+    """asyncio counterpart of live_changes.ChangeHub, listening on a psycopg 3 connection.
+
+    Subscribers get an asyncio.Queue of their user's Changes. The listening
+    task starts with the first subscriber and runs until close(); after a
+    reconnect it puts RESYNC on every queue.
+    """
+
+    def __init__(self, conninfo, retry_seconds=1, max_retry_seconds=60):
+        self.conninfo = conninfo
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._subscribers = {}  # queue -> user_id
+        self._task = None
+
+    def subscribe(self, user_id):
+        subscription = asyncio.Queue()
+        self._subscribers[subscription] = user_id
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.pop(subscription, None)
+
+    def publish(self, change):
+        for subscription, user_id in list(self._subscribers.items()):
+            if change is RESYNC or change.user_id == user_id:
+                subscription.put_nowait(change)
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    if failures:
+                        self.publish(RESYNC)
+                    failures = 0
+                    async for notify in conn.notifies():
+                        try:
+                            self.publish(parse_change(notify.payload))
+                        except (ValueError, KeyError, TypeError):
+                            print(f"Ignoring malformed change notification: {notify.payload!r}")
+            except psycopg.Error as e:
+                delay = min(self.retry_seconds * 2 ** failures, self.max_retry_seconds)
+                failures += 1
+                print(f"Change listener disconnected ({e}); retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
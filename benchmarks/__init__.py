@@ -0,0 +1,12 @@
+"""Benchmarks for the web and desktop apps.
+
+    pip install -r benchmarks/requirements.txt
+    pytest -c benchmarks/pytest.ini benchmarks
+    pytest -c benchmarks/pytest.ini benchmarks --benchmark-compare   # against the last saved run
+
+Results are saved under benchmarks/.results. BENCH_YEARS sets how much
+synthetic history is loaded (default 3); see conftest.py for the database.
+
+loadtest.py compares the sync (Flask) and async (asgi.py) servers under
+concurrent clients; see its docstring.
+"""
@@ -0,0 +1,31 @@
+"""Schedule encoding benchmarks: decode time and stored size, legacy vs version 2."""
+import json
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import schedule_codec
+from benchmarks.datagen import generate_entries
+
+
+@pytest.fixture(scope='module')
+def schedules():
+    """Stored JSON of one year of desktop-shaped days, in both formats."""
+    days = [row[3] for row in generate_entries(years=1, legacy_ratio=0)]
+    return {
+        'legacy': [json.dumps(schedule) for schedule in days],
+        'v2': [schedule_codec.dumps(schedule) for schedule in days],
+    }
+
+
+@pytest.mark.parametrize('encoding', ['legacy', 'v2'])
+def test_decode(benchmark, schedules, encoding):
+    stored = schedules[encoding]
+    benchmark.extra_info['bytes_per_day'] = sum(map(len, stored)) // len(stored)
+    benchmark(lambda: [schedule_codec.decode(schedule) for schedule in stored])
+
+
+def test_encode(benchmark, schedules):
+    days = [json.loads(schedule) for schedule in schedules['legacy']]
+    benchmark(lambda: [schedule_codec.dumps(schedule) for schedule in days])
@@ -0,0 +1,107 @@
+"""Desktop app benchmarks on Qt's offscreen platform."""
+import itertools
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+timeboxing_app = pytest.importorskip('timeboxing_app', reason="PyQt5 (with QtMultimedia) is not usable here",
+                                     exc_type=ImportError)
+
+
+@pytest.fixture(scope='module')
+def window(connect_env, tmp_path_factory):
+    os.environ.update(connect_env)
+    os.environ['LOCAL_STORE'] = str(tmp_path_factory.mktemp('desktop') / 'local.sqlite3')
+    qt_app = timeboxing_app.QApplication.instance() or timeboxing_app.QApplication([])
+    window = timeboxing_app.TimeboxingApp()
+    # Fill the local store up front, as the first background sync would
+    window.sync.synchronizer.sync()
+    yield window
+    window.close()
+    qt_app.processEvents()
+
+
+@pytest.fixture(scope='module')
+def dates(seeded_database):
+    return [row[0].isoformat() for row in seeded_database['entries']]
+
+
+def show_date(window, date):
+    """Point the date picker at `date` without going through the worker pool."""
+    from PyQt5.QtCore import QDate
+    window.date_edit.blockSignals(True)
+    window.date_edit.setDate(QDate.fromString(date, "yyyy-MM-dd"))
+    window.date_edit.blockSignals(False)
+
+
+def test_initial_sync(benchmark, window, connect_env, tmp_path):
+    # First start on a new machine: pull every day into an empty local store
+    stores = iter(range(1000))
+
+    def setup():
+        store = timeboxing_app.LocalStore(str(tmp_path / f"{next(stores)}.sqlite3"))
+        return (timeboxing_app.Synchronizer(store, window.connect_server),), {}
+
+    def run(synchronizer):
+        synchronizer.sync()
+        synchronizer.close()
+        synchronizer.store.close()
+
+    benchmark.pedantic(run, setup=setup, rounds=3)
+
+
+def test_load_entry_query(benchmark, window, dates):
+    # The worker-thread half of a load: cache miss, local range query and decode
+    days = itertools.cycle(dates[::7])
+
+    def run():
+        window.repository.cache.invalidate()
+        return window._load_entry(next(days))
+
+    benchmark(run)
+
+
+def test_load_entry_render(benchmark, window, dates):
+    # The GUI-thread half of a load: filling the widgets and the grid model
+    entries = [window.repository.load_entry(date) for date in dates[-14:]]
+    pairs = itertools.cycle(zip(dates[-14:], entries))
+
+    def run():
+        date, entry = next(pairs)
+        show_date(window, date)
+        window.on_load_finished(date, entry)
+
+    benchmark(run)
+
+
+def test_save_changes(benchmark, window, dates):
+    date = dates[-1]
+    show_date(window, date)
+    window.on_load_finished(date, window.repository.load_entry(date))
+    tasks = itertools.cycle(["Deep work", "Code review", "Walk"])
+
+    def run():
+        index = window.schedule_model.index(0, window.schedule_model.TASK)
+        window.schedule_model.setData(index, next(tasks))
+        window.mark_dirty()
+        window.autosave.flush_blocking()
+
+    benchmark(run)
+
+
+def test_keystroke_task_options(benchmark, window, dates):
+    date = dates[-1]
+    show_date(window, date)
+    window.on_load_finished(date, window.repository.load_entry(date))
+    # Each round is the text as it stands after one more keystroke
+    base = window.top_priorities.toPlainText()
+    typed = "\nReview the quarterly plan"
+    texts = itertools.cycle(base + typed[:length] for length in range(len(typed) + 1))
+
+    def run():
+        window.top_priorities.setPlainText(next(texts))
+        window.update_task_options()
+
+    benchmark(run)
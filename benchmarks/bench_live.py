@@ -0,0 +1,71 @@
+"""Live change benchmarks: from a committed save to the change reaching a listener."""
+import itertools
+import queue
+import select
+from datetime import date, timedelta
+
+import psycopg2
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import live_changes
+from timeboxing_db import DEFAULT_USER, upsert_entry
+
+
+@pytest.fixture
+def writer(seeded_database):
+    conn = psycopg2.connect(seeded_database['url'])
+    yield conn
+    conn.close()
+
+
+def _save(conn, day):
+    with conn.cursor() as cursor:
+        upsert_entry(cursor, DEFAULT_USER, day, 'live', '', {'09:00': 'Live'})
+    conn.commit()
+
+
+def test_notify_to_listener(benchmark, seeded_database, writer):
+    listener = psycopg2.connect(seeded_database['url'])
+    live_changes.listen(listener)
+    days = (date(2041, 1, 1) + timedelta(days=offset % 365) for offset in itertools.count())
+
+    def run():
+        day = next(days)
+        _save(writer, day)
+        changes = []
+        while not any(change.date == day for change in changes):
+            assert select.select([listener], [], [], 5)[0], "no notification within 5s"
+            changes = live_changes.drain(listener)
+
+    try:
+        benchmark(run)
+    finally:
+        listener.close()
+
+
+def test_notify_to_hub_subscriber(benchmark, seeded_database, writer):
+    # The path of an open web page: listening thread, then the subscriber's queue
+    hub = live_changes.ChangeHub(lambda: psycopg2.connect(seeded_database['url']))
+    subscription = hub.subscribe(DEFAULT_USER)
+    days = (date(2042, 1, 1) + timedelta(days=offset % 365) for offset in itertools.count())
+    # Saves made before the hub's thread is listening are not announced
+    for _ in range(50):
+        _save(writer, date(2042, 12, 31))
+        try:
+            subscription.get(timeout=0.1)
+            break
+        except queue.Empty:
+            pass
+
+    def run():
+        day = next(days)
+        _save(writer, day)
+        while subscription.get(timeout=5).date != day:
+            pass
+
+    try:
+        benchmark(run)
+    finally:
+        hub.unsubscribe(subscription)
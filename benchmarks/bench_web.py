@@ -0,0 +1,112 @@
+"""Web app benchmarks through the Flask test client."""
+import itertools
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.fixture(scope='module')
+def web(seeded_database):
+    # Flask-SQLAlchemy builds its engine from the config at import time
+    os.environ['DATABASE_URL'] = seeded_database['url']
+    import app as web_app
+    web_app.day_caches.clear()
+    return web_app
+
+
+@pytest.fixture
+def client(web):
+    return web.app.test_client()
+
+
+@pytest.fixture(scope='module')
+def dates(seeded_database):
+    return [row[0] for row in seeded_database['entries']]
+
+
+def _get(client, url, **kwargs):
+    response = client.get(url, **kwargs)
+    body = response.get_data()  # Drain streamed responses
+    assert response.status_code in (200, 304), response.status_code
+    return body
+
+
+def test_index_get_cold(benchmark, web, client, dates):
+    days = itertools.cycle(dates[::7])
+
+    def run():
+        web.day_caches.clear()
+        return _get(client, f"/?date={next(days)}")
+
+    benchmark(run)
+
+
+def test_index_get_cached(benchmark, web, client, dates):
+    # Walking day by day mostly hits the neighbours load_day prefetched
+    web.day_caches.clear()
+    days = itertools.cycle(dates[-90:])
+    benchmark(lambda: _get(client, f"/?date={next(days)}"))
+
+
+def test_index_get_not_modified(benchmark, client, dates):
+    url = f"/?date={dates[-1]}"
+    etag = client.get(url).headers['ETag']
+    benchmark(lambda: _get(client, url, headers={'If-None-Match': etag}))
+
+
+def test_index_post(benchmark, client, seeded_database):
+    day, top_priorities, brain_dump, schedule, grid = seeded_database['entries'][-1]
+    form = {'date': day.isoformat(), 'top_priorities': top_priorities, 'brain_dump': brain_dump,
+            'slot_minutes': grid.slot_minutes, 'day_start': grid.day_start, 'day_end': grid.day_end}
+    form.update({time: data if isinstance(data, str) else data['task'] for time, data in schedule.items()})
+
+    def run():
+        response = client.post('/', data=form)
+        assert response.status_code == 302, response.status_code
+
+    benchmark(run)
+
+
+def test_history_first_page(benchmark, client):
+    benchmark(lambda: _get(client, '/history'))
+
+
+def test_history_oldest_page(benchmark, client, dates):
+    benchmark(lambda: _get(client, f"/history?before={dates[60]}"))
+
+
+def test_api_entries_month(benchmark, client, dates):
+    start, end = dates[-31], dates[-1]
+    benchmark(lambda: _get(client, f"/api/entries?from={start}&to={end}"))
+
+
+def test_week_view_cold(benchmark, web, client, dates):
+    weeks = itertools.cycle(dates[::7])
+
+    def run():
+        web.day_fragments = web.FragmentCache()
+        return _get(client, f"/week?date={next(weeks)}")
+
+    benchmark(run)
+
+
+def test_month_view_cached_fragments(benchmark, client, dates):
+    # Unchanged days come out of the fragment cache; only the page is rendered
+    url = f"/month?date={dates[-1]}"
+    _get(client, url)
+    benchmark(lambda: _get(client, url))
+
+
+def test_apply_template_quarter(benchmark, client, seeded_database):
+    _day, _top_priorities, _brain_dump, schedule, grid = seeded_database['entries'][-1]
+    response = client.put('/api/templates/bench', json={'schedule': schedule, **grid._asdict()})
+    assert response.status_code == 200, response.status_code
+    body = {'from': '2040-01-01', 'to': '2040-03-31', 'weekdays': [0, 1, 2, 3, 4], 'merge': True}
+
+    def run():
+        response = client.post('/api/templates/bench/apply', json=body)
+        assert response.status_code == 200, response.status_code
+
+    benchmark(run)
@@ -0,0 +1,78 @@
+"""Shared fixtures: a throwaway Postgres loaded with synthetic entries.
+
+Set BENCH_DATABASE_URL (a postgresql:// URI) to benchmark against an existing
+database; it must be disposable, the suite writes to it. Otherwise a cluster
+is created in a temp dir with the initdb/pg_ctl found in PG_BIN or on PATH,
+listening on a Unix socket only, and removed afterwards.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from urllib.parse import quote
+
+import psycopg2
+import pytest
+from psycopg2.extensions import parse_dsn
+
+from benchmarks.datagen import generate_entries
+from migrations import migrate
+from timeboxing_db import DEFAULT_USER, upsert_entries
+
+
+BENCH_YEARS = float(os.getenv('BENCH_YEARS', 3))
+
+
+def _pg_tool(name):
+    pg_bin = os.getenv('PG_BIN')
+    return shutil.which(name, path=pg_bin) if pg_bin else shutil.which(name)
+
+
+@pytest.fixture(scope='session')
+def database_url():
+    url = os.getenv('BENCH_DATABASE_URL')
+    if url:
+        yield url
+        return
+
+    initdb, pg_ctl = _pg_tool('initdb'), _pg_tool('pg_ctl')
+    if not (initdb and pg_ctl):
+        pytest.skip("Set BENCH_DATABASE_URL or put initdb/pg_ctl on PATH (or in PG_BIN)")
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        pytest.skip("initdb refuses to run as root; set BENCH_DATABASE_URL instead")
+
+    workdir = tempfile.mkdtemp(prefix='timeboxing-bench-')
+    datadir = os.path.join(workdir, 'data')
+    subprocess.run([initdb, '-D', datadir, '-U', 'postgres', '-A', 'trust', '--no-sync'],
+                   check=True, capture_output=True)
+    subprocess.run([pg_ctl, '-D', datadir, '-l', os.path.join(workdir, 'postgres.log'), '-w',
+                    '-o', f"-k {workdir} -c listen_addresses='' -c fsync=off", 'start'],
+                   check=True, capture_output=True)
+    try:
+        yield f"postgresql://postgres@/postgres?host={quote(workdir, safe='')}"
+    finally:
+        subprocess.run([pg_ctl, '-D', datadir, '-m', 'immediate', 'stop'], capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def seeded_database(database_url):
+    """Migrate the database and load BENCH_YEARS of synthetic days into it."""
+    conn = psycopg2.connect(database_url)
+    try:
+        migrate(conn)
+        with conn, conn.cursor() as cursor:
+            cursor.execute("TRUNCATE timeboxing_entry, timeboxing_daily_summary RESTART IDENTITY")
+            entries = list(generate_entries(BENCH_YEARS))
+            upsert_entries(cursor, DEFAULT_USER, entries)
+    finally:
+        conn.close()
+    return {'url': database_url, 'entries': entries}
+
+
+@pytest.fixture(scope='session')
+def connect_env(seeded_database):
+    """The DB_* variables timeboxing_db.env_connect_kwargs reads, for the desktop app."""
+    params = parse_dsn(seeded_database['url'])
+    names = {'dbname': 'DB_NAME', 'user': 'DB_USER', 'password': 'DB_PASSWORD', 'host': 'DB_HOST'}
+    return {env: params[key] for key, env in names.items() if params.get(key)}
@@ -0,0 +1,90 @@
+"""Deterministic synthetic day entries for the benchmarks.
+
+The same seed always yields the same entries, so runs are comparable. Days
+alternate between the two schedule shapes found in real data: the web form's
+legacy `{"HH:MM": "task"}` map and the desktop `{"HH:MM": {task, checked,
+color}}` map, on a mix of slot grids.
+
+    python -m benchmarks.datagen --years 5 -o entries.ndjson
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import date, timedelta
+
+from schedule_grid import SlotGrid, slot_times
+
+
+DEFAULT_SEED = 2024
+DEFAULT_START = date(2020, 1, 1)
+
+TASKS = [
+    "Deep work", "Email triage", "Standup", "Code review", "Write report", "Gym", "Lunch",
+    "Read papers", "1:1 with manager", "Plan sprint", "Groceries", "Call family", "Walk",
+    "Fix flaky build", "Prepare slides", "Inbox zero", "Language practice", "Budget review",
+]
+COLORS = ['#ffffff', '#ffd6d6', '#d6ffd6', '#d6e4ff', '#fff3c4', '#ead6ff']
+WORDS = ("ship release notes draft proposal refactor billing dashboard migrate backlog "
+         "interview candidate doctor appointment renew passport book flights tidy garage").split()
+GRIDS = [SlotGrid(30, 5, 24), SlotGrid(15, 7, 22), SlotGrid(60, 6, 23)]
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def make_schedule(rng, grid, legacy, fill=0.6):
+    """Schedule for one day on `grid`, filling about `fill` of the slots."""
+    schedule = {}
+    for time in slot_times(grid):
+        if rng.random() >= fill:
+            continue
+        task = rng.choice(TASKS)
+        if legacy:
+            schedule[time] = task
+        else:
+            schedule[time] = {'task': task, 'checked': rng.random() < 0.5, 'color': rng.choice(COLORS)}
+    return schedule
+
+
+def generate_entries(years=3, start=DEFAULT_START, seed=DEFAULT_SEED, legacy_ratio=0.5):
+    """Yield (date, top_priorities, brain_dump, schedule, grid) rows, one per day.
+
+    Rows match what `timeboxing_db.upsert_entries` takes.
+    """
+    rng = random.Random(seed)
+    days = int(round(years * 365.25))
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        legacy = rng.random() < legacy_ratio
+        # The web form only ever posted the default grid
+        grid = GRIDS[0] if legacy else rng.choice(GRIDS)
+        top_priorities = "\n".join(_sentence(rng, 2, 5) for _ in range(3))
+        brain_dump = "\n".join(_sentence(rng, 3, 10) for _ in range(rng.randint(0, 8)))
+        yield day, top_priorities, brain_dump, make_schedule(rng, grid, legacy), grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--start', type=date.fromisoformat, default=DEFAULT_START)
+    parser.add_argument('-o', '--output', help="NDJSON file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for day, top_priorities, brain_dump, schedule, grid in generate_entries(args.years, args.start, args.seed):
+            out.write(json.dumps({
+                'date': day.isoformat(), 'top_priorities': top_priorities, 'brain_dump': brain_dump,
+                'schedule': schedule, 'slot_minutes': grid.slot_minutes,
+                'day_start': grid.day_start, 'day_end': grid.day_end,
+            }) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Concurrent load test of the sync (Flask) and async (ASGI) serving modes.
+
+    python -m benchmarks.loadtest --database-url postgresql://... [--clients 32] [--duration 20]
+    python -m benchmarks.loadtest --sync-url http://127.0.0.1:5000 --async-url http://127.0.0.1:8000
+
+With --database-url both servers are started here (Flask's threaded dev
+server and uvicorn on asgi:app) against that database, which should already
+hold data, e.g. from `python -m benchmarks.datagen` or a benchmark run. With
+--sync-url/--async-url the servers are expected to be running already; either
+one can be given alone.
+
+Each client is a thread on its own keep-alive connection, looping over a mix
+of planner, history and API requests for --duration seconds. Throughput and
+latency percentiles are printed per mode.
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+
+def request_mix(start, days):
+    """(method, path, weight) tuples; dates fall in [start, start + days)."""
+    def day():
+        return start + timedelta(days=random.randrange(days))
+
+    def month():
+        first = day()
+        return f"from={first}&to={first + timedelta(days=30)}"
+
+    return [
+        ('GET', lambda: f"/?date={day()}", 6),
+        ('GET', lambda: "/history", 1),
+        ('GET', lambda: f"/history?before={day()}", 1),
+        ('GET', lambda: f"/api/entries?{month()}", 2),
+        ('GET', lambda: "/api/search?q=review", 1),
+    ]
+
+
+def client_loop(base_url, mix, deadline, latencies, errors):
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    choices = [(method, path) for method, path, weight in mix for _ in range(weight)]
+    while time.monotonic() < deadline:
+        method, path = random.choice(choices)
+        started = time.perf_counter()
+        try:
+            conn.request(method, path())
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+            continue
+        if response.status >= 400:
+            errors.append(response.status)
+        else:
+            latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def run(name, base_url, mix, clients, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=client_loop, args=(base_url, mix, deadline, latencies, errors))
+               for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    print(f"{name:>5}: {len(latencies) / duration:8.1f} req/s  "
+          f"p50 {percentile(latencies, 0.50) * 1000:7.1f} ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+          f"errors {len(errors)}")
+
+
+def wait_until_up(base_url, timeout=30):
+    url = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(url.hostname, url.port, timeout=2)
+            conn.request('GET', '/history?limit=1')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{base_url} did not come up within {timeout}s")
+
+
+def start_servers(database_url, sync_port, async_port):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    quiet = {'cwd': root, 'env': env, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    servers = [
+        subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(sync_port),
+                          '--with-threads'], **quiet),
+        subprocess.Popen([sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(async_port),
+                          '--log-level', 'warning', '--no-access-log'], **quiet),
+    ]
+    return servers, f"http://127.0.0.1:{sync_port}", f"http://127.0.0.1:{async_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help="Start both servers against this database")
+    parser.add_argument('--sync-url', help="Already running Flask server")
+    parser.add_argument('--async-url', help="Already running ASGI server")
+    parser.add_argument('--sync-port', type=int, default=5055)
+    parser.add_argument('--async-port', type=int, default=8055)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2020, 1, 1),
+                        help="First date of the seeded data (default: the datagen start)")
+    parser.add_argument('--days', type=int, default=365, help="Spread of requested dates")
+    args = parser.parse_args(argv)
+
+    servers = []
+    targets = [('sync', args.sync_url), ('async', args.async_url)]
+    if args.database_url:
+        servers, sync_url, async_url = start_servers(args.database_url, args.sync_port, args.async_port)
+        targets = [('sync', sync_url), ('async', async_url)]
+    targets = [(name, url) for name, url in targets if url]
+    if not targets:
+        parser.error("give --database-url, or --sync-url and/or --async-url")
+
+    mix = request_mix(args.start, args.days)
+    try:
+        for name, url in targets:
+            wait_until_up(url)
+            run(name, url, mix, args.clients, args.duration)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""Bulk export and import of day entries as NDJSON or CSV.
+
+Exports read through a server-side (named) cursor and are written one line
+at a time, so memory stays flat however many years are exported. Imports
+are upserted in batches and committed per batch.
+
+    python entry_io.py export -o entries.ndjson [--from 2023-01-01] [--to 2023-12-31]
+    python entry_io.py import entries.csv
+
+Both act on one user's entries: --user, else TIMEBOXING_USER, else the
+default owner. Records carry no user, so an export can be imported into
+another account.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+
+import psycopg2
+
+from schedule_codec import decode, is_encoded
+from schedule_grid import DEFAULT_GRID, SLOT_FIELDS, is_slot_time, make_grid
+from timeboxing_db import DEFAULT_USER, ENTRY_COLUMNS, DayEntry, as_date, env_connect_kwargs, upsert_entries
+
+
+FORMATS = ('ndjson', 'csv')
+CSV_FIELDS = ['date', 'top_priorities', 'brain_dump', 'schedule', 'slot_minutes', 'day_start', 'day_end']
+
+EXPORT_ITERSIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+
+
+def format_for(filename, default='ndjson'):
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return default
+
+
+def normalize_schedule(schedule):
+    """Return the non-empty slots of `schedule` in the desktop `{time: {task, checked, color}}` shape.
+
+    Accepts any stored format (see schedule_codec) or a JSON string of one;
+    keys that are not slot times are dropped.
+    """
+    return {time: slot._asdict() for time, slot in decode(schedule).items()}
+
+
+def validate_schedule(schedule):
+    """Check the schedule of an imported or API record and return it parsed.
+
+    Every key must be a slot time, and every slot a task string or an object
+    whose task, checked and color have the right types. Raises ValueError
+    naming the first bad slot.
+    """
+    if isinstance(schedule, str):
+        schedule = json.loads(schedule) if schedule.strip() else None
+    if schedule is None:
+        return {}
+    if not isinstance(schedule, dict):
+        raise ValueError("schedule must be an object")
+    if is_encoded(schedule):
+        try:
+            slots = {time: slot._asdict() for time, slot in decode(schedule).items()}
+        except (IndexError, KeyError, TypeError) as e:
+            raise ValueError(f"Malformed encoded schedule: {e!r}") from e
+    else:
+        slots = schedule
+    for time, slot in slots.items():
+        if not is_slot_time(time):
+            raise ValueError(f"Schedule key {time!r} is not a time between 00:00 and 23:59")
+        if isinstance(slot, str):
+            continue
+        if not isinstance(slot, dict):
+            raise ValueError(f"Slot {time} must be a task string or an object")
+        for field, kind in SLOT_FIELDS.items():
+            if field in slot and not isinstance(slot[field], kind):
+                raise ValueError(f"Slot {time}: {field} must be a {kind.__name__}")
+    return schedule
+
+
+def iter_entries(conn, user_id, start=None, end=None, itersize=EXPORT_ITERSIZE):
+    """Yield `user_id`'s DayEntry rows ordered by date through a named cursor."""
+    conditions = ["user_id = %s"]
+    params = [user_id]
+    if start:
+        conditions.append("date >= %s")
+        params.append(as_date(start))
+    if end:
+        conditions.append("date <= %s")
+        params.append(as_date(end))
+    with conn.cursor(name='entry_export') as cursor:
+        cursor.itersize = itersize
+        cursor.execute(f"SELECT {ENTRY_COLUMNS} FROM timeboxing_entry WHERE {' AND '.join(conditions)} "
+                       f"ORDER BY date", params)
+        for row in cursor:
+            yield DayEntry(*row)
+
+
+def entry_record(entry):
+    """Plain-JSON form of a DayEntry, as written by exports and the API."""
+    return {
+        'date': entry.date.isoformat(),
+        'top_priorities': entry.top_priorities or '',
+        'brain_dump': entry.brain_dump or '',
+        'schedule': normalize_schedule(entry.schedule),
+        'slot_minutes': entry.slot_minutes or DEFAULT_GRID.slot_minutes,
+        'day_start': entry.day_start if entry.day_start is not None else DEFAULT_GRID.day_start,
+        'day_end': entry.day_end or DEFAULT_GRID.day_end,
+    }
+
+
+def iter_ndjson(entries):
+    for entry in entries:
+        yield json.dumps(entry_record(entry)) + '\n'
+
+
+def iter_csv(entries):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for entry in entries:
+        record = entry_record(entry)
+        record['schedule'] = json.dumps(record['schedule'])
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def serialize(entries, fmt):
+    """Yield text chunks of `entries` in `fmt` ('ndjson' or 'csv')."""
+    if fmt == 'csv':
+        return iter_csv(entries)
+    if fmt == 'ndjson':
+        return iter_ndjson(entries)
+    raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+
+
+def record_to_row(record):
+    """Turn an exported/API record back into an upsert row.
+
+    Raises ValueError (or KeyError/TypeError for a malformed record) if the
+    date, grid or schedule is invalid.
+    """
+    grid = make_grid(record.get('slot_minutes'), record.get('day_start'), record.get('day_end'))
+    return (as_date(record['date']), record.get('top_priorities') or '', record.get('brain_dump') or '',
+            normalize_schedule(validate_schedule(record.get('schedule'))), grid)
+
+
+def parse(lines, fmt):
+    """Yield `(date, top_priorities, brain_dump, schedule, grid)` from text lines."""
+    if fmt == 'csv':
+        for record in csv.DictReader(lines):
+            yield record_to_row(record)
+    elif fmt == 'ndjson':
+        for line in lines:
+            if line.strip():
+                yield record_to_row(json.loads(line))
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+
+
+def import_entries(conn, user_id, rows, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Upsert `rows` for `user_id` in batches, committing each; returns the number imported."""
+    count = 0
+    batch = []
+    with conn.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count += len(upsert_entries(cursor, user_id, batch))
+                conn.commit()
+                batch = []
+                if progress:
+                    progress(count)
+        if batch:
+            count += len(upsert_entries(cursor, user_id, batch))
+            conn.commit()
+            if progress:
+                progress(count)
+    return count
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export')
+    export_parser.add_argument('-o', '--output', help="file to write (default: stdout)")
+    export_parser.add_argument('--format', choices=FORMATS)
+    export_parser.add_argument('--from', dest='start')
+    export_parser.add_argument('--to', dest='end')
+    import_parser = commands.add_parser('import')
+    import_parser.add_argument('input', help="file to read ('-' for stdin)")
+    import_parser.add_argument('--format', choices=FORMATS)
+    import_parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    for command in (export_parser, import_parser):
+        command.add_argument('--user', help="owner of the entries (default: TIMEBOXING_USER)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    user_id = args.user or os.getenv('TIMEBOXING_USER', DEFAULT_USER)
+    conn = psycopg2.connect(**env_connect_kwargs())
+    try:
+        if args.command == 'export':
+            fmt = args.format or format_for(args.output)
+            out = open(args.output, 'w', newline='') if args.output else sys.stdout
+            try:
+                for chunk in serialize(iter_entries(conn, user_id, args.start, args.end), fmt):
+                    out.write(chunk)
+            finally:
+                if args.output:
+                    out.close()
+        else:
+            fmt = args.format or format_for(args.input)
+            infile = sys.stdin if args.input == '-' else open(args.input, newline='')
+            try:
+                count = import_entries(
+                    conn, user_id, parse(infile, fmt), args.batch_size,
+                    progress=lambda n: print(f"Imported {n} entries", file=sys.stderr),
+                )
+            finally:
+                if infile is not sys.stdin:
+                    infile.close()
+            print(f"Done: {count} entries imported", file=sys.stderr)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
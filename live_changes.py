@@ -0,0 +1,171 @@
+"""Live change notifications between clients through Postgres LISTEN/NOTIFY.
+
+Every write to timeboxing_entry fires a trigger (migration 12) that sends
+
+    {"user_id": "alice", "date": "2024-05-06", "revision": 7}
+
+on CHANNEL when its transaction commits. A client listens on a connection of
+its own, in autocommit mode so notifications are not held back by an open
+transaction, and refreshes just the days it has open at an older revision.
+Notifications are lost while a listener is disconnected, so after
+reconnecting a client resyncs instead of trusting that nothing changed.
+
+Run this module to print changes as they happen, e.g. while saving from
+another client:
+
+    python live_changes.py [--user alice]
+"""
+import json
+import queue
+import select
+import threading
+import time
+from collections import namedtuple
+
+import psycopg2
+
+from timeboxing_db import as_date
+
+
+CHANNEL = 'timeboxing_entry_changed'
+# How often an idle event stream sends a comment, so proxies keep it open and
+# the server notices clients that went away
+HEARTBEAT_SECONDS = 15
+
+Change = namedtuple('Change', 'user_id date revision')
+
+# Sent on a stream when changes may have been missed; clients reload what they show
+RESYNC = None
+
+SSE_HEARTBEAT = ": keep-alive\n\n"
+SSE_RESYNC = "event: resync\ndata: {}\n\n"
+
+
+def parse_change(payload):
+    data = json.loads(payload)
+    return Change(data['user_id'], as_date(data['date']), int(data['revision']))
+
+
+def listen(conn):
+    """Switch the psycopg2 connection `conn` to autocommit and LISTEN on CHANNEL."""
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+
+
+def drain(conn):
+    """Changes that arrived on a listening psycopg2 connection since the last call.
+
+    Raises psycopg2.Error if the connection was lost.
+    """
+    conn.poll()
+    changes = []
+    while conn.notifies:
+        notify = conn.notifies.pop(0)
+        try:
+            changes.append(parse_change(notify.payload))
+        except (ValueError, KeyError, TypeError):
+            print(f"Ignoring malformed change notification: {notify.payload!r}")
+    return changes
+
+
+def sse_event(change):
+    """`change` (or RESYNC) as a server-sent event."""
+    if change is RESYNC:
+        return SSE_RESYNC
+    data = json.dumps({'date': change.date.isoformat(), 'revision': change.revision})
+    return f"event: change\ndata: {data}\n\n"
+
+
+class ChangeHub:
+    """Fans the notifications of one listening connection out to per-user subscribers.
+
+    Each subscriber gets a queue of its user's Changes. A background thread
+    listens while anyone is subscribed and stops with the last one; if its
+    connection drops it reconnects with backoff and puts RESYNC on every
+    queue. `connect` returns a new psycopg2 connection.
+    """
+
+    def __init__(self, connect, retry_seconds=1, max_retry_seconds=60):
+        self.connect = connect
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._subscribers = {}  # queue -> user_id
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, user_id):
+        subscription = queue.SimpleQueue()
+        with self._lock:
+            self._subscribers[subscription] = user_id
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='change-hub', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.pop(subscription, None)
+
+    def publish(self, changes):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for subscription, user_id in subscribers:
+            for change in changes:
+                if change is RESYNC or change.user_id == user_id:
+                    subscription.put(change)
+
+    def _active(self):
+        with self._lock:
+            if self._thread is not threading.current_thread():
+                return False
+            if not self._subscribers:
+                self._thread = None
+                return False
+            return True
+
+    def _run(self):
+        failures = 0
+        while self._active():
+            try:
+                conn = self.connect()
+                try:
+                    listen(conn)
+                    if failures:
+                        self.publish([RESYNC])
+                    failures = 0
+                    while self._active():
+                        if select.select([conn], [], [], HEARTBEAT_SECONDS)[0]:
+                            self.publish(drain(conn))
+                finally:
+                    conn.close()
+            except psycopg2.Error as e:
+                delay = min(self.retry_seconds * 2 ** failures, self.max_retry_seconds)
+                failures += 1
+                print(f"Change listener disconnected ({e}); retrying in {delay}s")
+                time.sleep(delay)
+
+
+if __name__ == '__main__':
+    import argparse
+    from dotenv import load_dotenv
+    from timeboxing_db import env_connect_kwargs
+
+    parser = argparse.ArgumentParser(description="Print timeboxing entry changes as they are committed.")
+    parser.add_argument('--user', help="only show this user's changes")
+    args = parser.parse_args()
+
+    load_dotenv()
+    connection = psycopg2.connect(**env_connect_kwargs())
+    try:
+        listen(connection)
+        print(f"Listening on {CHANNEL}; Ctrl+C to stop")
+        while True:
+            if select.select([connection], [], [], HEARTBEAT_SECONDS)[0]:
+                for change in drain(connection):
+                    if args.user in (None, change.user_id):
+                        print(f"{change.user_id} {change.date} revision {change.revision}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connection.close()
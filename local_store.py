@@ -0,0 +1,429 @@
+"""Local SQLite copy of a user's entries, so the desktop app works offline.
+
+The desktop app loads and saves through LocalStore only, so neither
+startup nor the editor ever waits on Postgres. Each row keeps the server
+revision it is based on and a count of local edits not pushed yet.
+Synchronizer runs in the background: it pushes those edits with a
+revision check and pulls the rows changed on the server since its last
+pull. A day edited on both sides becomes a conflict and is kept aside
+(and out of the push) until the user picks a version.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date as Date, datetime, timedelta, timezone
+
+import schedule_codec
+from schedule_grid import grid_of
+from search import SEARCH_LIMIT, search_entries
+from timeboxing_db import (DEFAULT_USER, ENTRY_COLUMNS, MISSING, DayCache, DayEntry, RevisionConflict, as_date,
+                           fetch_entries_between, fetch_entries_changed_since, load_day, load_days, upsert_entry)
+
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser('~'), '.timeboxing', 'local.sqlite3')
+
+# Bump and extend _create_schema when the tables below change
+LOCAL_SCHEMA_VERSION = 2
+
+PUSH_BATCH_SIZE = 200
+PULL_PAGE_SIZE = 1000
+# updated_at is the writing transaction's start time, so a row can commit
+# with a timestamp older than one already pulled. Every pull re-reads this
+# much; rows whose revision we already have are skipped.
+PULL_OVERLAP = timedelta(minutes=1)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+SCHEMA = [
+    # Same column names as on Postgres, so search.py's SQLite path works here.
+    # revision is the server revision the row is based on (0: never pushed).
+    """
+    CREATE TABLE IF NOT EXISTS timeboxing_entry (
+        user_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        id INTEGER,
+        top_priorities TEXT,
+        brain_dump TEXT,
+        schedule TEXT,
+        slot_minutes INTEGER,
+        day_start INTEGER,
+        day_end INTEGER,
+        revision INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT,
+        local_edits INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, date)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS timeboxing_entry_pending_idx
+        ON timeboxing_entry (user_id, date) WHERE local_edits > 0
+    """,
+    # The server's copy of each day that was also edited here
+    """
+    CREATE TABLE IF NOT EXISTS sync_conflict (
+        user_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        id INTEGER,
+        top_priorities TEXT,
+        brain_dump TEXT,
+        schedule TEXT,
+        slot_minutes INTEGER,
+        day_start INTEGER,
+        day_end INTEGER,
+        revision INTEGER NOT NULL,
+        updated_at TEXT,
+        PRIMARY KEY (user_id, date)
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS sync_state (user_id TEXT PRIMARY KEY, pulled_until TEXT NOT NULL)",
+]
+
+SAVE_LOCAL_SQL = """
+    INSERT INTO timeboxing_entry (user_id, date, top_priorities, brain_dump, schedule, slot_minutes, day_start,
+                                  day_end, local_edits)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT (user_id, date) DO UPDATE
+    SET top_priorities = excluded.top_priorities,
+        brain_dump = excluded.brain_dump,
+        schedule = excluded.schedule,
+        slot_minutes = excluded.slot_minutes,
+        day_start = excluded.day_start,
+        day_end = excluded.day_end,
+        local_edits = timeboxing_entry.local_edits + 1
+"""
+
+# A server row replacing the local one; it has no local edits by definition
+REPLACE_LOCAL_SQL = f"""
+    INSERT OR REPLACE INTO timeboxing_entry (user_id, {ENTRY_COLUMNS}, local_edits)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+"""
+
+SELECT_PENDING_SQL = f"""
+    SELECT {ENTRY_COLUMNS}, local_edits FROM timeboxing_entry e
+    WHERE user_id = ? AND local_edits > 0
+      AND NOT EXISTS (SELECT 1 FROM sync_conflict c WHERE c.user_id = e.user_id AND c.date = e.date)
+    ORDER BY date
+    LIMIT ?
+"""
+
+Conflict = namedtuple('Conflict', 'local remote')
+SyncResult = namedtuple('SyncResult', 'pushed changed conflicts pending')
+
+
+def _row_params(entry):
+    schedule = entry.schedule
+    if schedule is not None and not isinstance(schedule, str):
+        schedule = schedule_codec.dumps(schedule)
+    return (entry.id, as_date(entry.date).isoformat(), entry.top_priorities, entry.brain_dump, schedule,
+            entry.slot_minutes, entry.day_start, entry.day_end, entry.revision or 0,
+            entry.updated_at.isoformat() if entry.updated_at else None)
+
+
+def _entry(row):
+    entry_id, date, top_priorities, brain_dump, schedule, slot_minutes, day_start, day_end, revision, updated_at = row
+    return DayEntry(entry_id, as_date(date), top_priorities, brain_dump, json.loads(schedule) if schedule else None,
+                    slot_minutes, day_start, day_end, revision,
+                    datetime.fromisoformat(updated_at) if updated_at else None)
+
+
+class LocalStore:
+    """A user's entries in a local SQLite file, behind the EntryRepository calls the desktop app makes.
+
+    Safe to share between threads; statements are serialized on one
+    connection.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, user_id=DEFAULT_USER, cache=None, prefetch_days=3):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.user_id = user_id
+        self.cache = cache if cache is not None else DayCache()
+        self.prefetch_days = prefetch_days
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.cursor() as cursor:
+            cursor.execute("PRAGMA user_version")
+            version = cursor.fetchone()[0]
+            if version >= LOCAL_SCHEMA_VERSION:
+                return
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            if version == 1:
+                # Version 1 stored pulled schedules with \uXXXX escapes, which search cannot match
+                for table in ('timeboxing_entry', 'sync_conflict'):
+                    cursor.execute(f"SELECT rowid, schedule FROM {table} WHERE schedule LIKE '%\\u%'")
+                    cursor.executemany(f"UPDATE {table} SET schedule = ? WHERE rowid = ?",
+                                       [(schedule_codec.dumps(json.loads(schedule)), rowid)
+                                        for rowid, schedule in cursor.fetchall()])
+            cursor.execute(f"PRAGMA user_version = {LOCAL_SCHEMA_VERSION}")
+
+    @contextmanager
+    def cursor(self):
+        # Commits on success, rolls back on error
+        with self._lock, self.conn:
+            cursor = self.conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def _get(self, cursor, table, date):
+        cursor.execute(f"SELECT {ENTRY_COLUMNS} FROM {table} WHERE user_id = ? AND date = ?",
+                       (self.user_id, as_date(date).isoformat()))
+        row = cursor.fetchone()
+        return _entry(row) if row else None
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        with self.cursor() as cursor:
+            return search_entries(cursor, self.user_id, query, limit)
+
+    def cached_entry(self, date):
+        return self.cache.get(date)
+
+    def load_entry(self, date):
+        return load_day(self.cache, date, self.load_range, self.prefetch_days)
+
+    def load_range(self, start, end):
+        with self.cursor() as cursor:
+            cursor.execute(f"SELECT {ENTRY_COLUMNS} FROM timeboxing_entry "
+                           f"WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date",
+                           (self.user_id, as_date(start).isoformat(), as_date(end).isoformat()))
+            return [_entry(row) for row in cursor.fetchall()]
+
+    def load_days(self, start, end):
+        return load_days(self.cache, as_date(start), as_date(end), self.load_range)
+
+    def save_changes(self, changes):
+        """Apply `{date: change}` slot deltas locally, as EntryRepository.save_changes does on Postgres.
+
+        Each saved day counts one more local edit for the next push.
+        """
+        saved = []
+        with self.cursor() as cursor:
+            for date, change in changes.items():
+                current = self._get(cursor, 'timeboxing_entry', date)
+                schedule = schedule_codec.merge_slots(current and current.schedule, change['slots'], change['replace'])
+                grid = change['grid']
+                cursor.execute(SAVE_LOCAL_SQL, (
+                    self.user_id, as_date(date).isoformat(), change['top_priorities'], change['brain_dump'],
+                    schedule_codec.dumps(schedule), grid.slot_minutes, grid.day_start, grid.day_end))
+                saved.append(self._get(cursor, 'timeboxing_entry', date))
+        for entry in saved:
+            cached = self.cache.get(entry.date)
+            if cached is MISSING or cached is None:
+                self.cache.put(entry.date, entry)
+        return saved
+
+    def pending(self, limit=PUSH_BATCH_SIZE):
+        """`(entry, local_edits)` for days with unpushed edits, leaving out unresolved conflicts."""
+        with self.cursor() as cursor:
+            cursor.execute(SELECT_PENDING_SQL, (self.user_id, limit))
+            return [(_entry(row[:-1]), row[-1]) for row in cursor.fetchall()]
+
+    def pending_count(self):
+        with self.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM timeboxing_entry WHERE user_id = ? AND local_edits > 0",
+                           (self.user_id,))
+            return cursor.fetchone()[0]
+
+    def mark_pushed(self, pushed):
+        """Record `(stored_entry, edits)` pairs returned by the server for pushed days.
+
+        Edits made while the push was running stay pending.
+        """
+        with self.cursor() as cursor:
+            cursor.executemany(
+                "UPDATE timeboxing_entry SET id = ?, revision = ?, updated_at = ?, "
+                "local_edits = MAX(local_edits - ?, 0) WHERE user_id = ? AND date = ?",
+                [(entry.id, entry.revision, entry.updated_at.isoformat() if entry.updated_at else None, edits,
+                  self.user_id, entry.date.isoformat()) for entry, edits in pushed])
+        for entry, _edits in pushed:
+            cached = self.cache.get(entry.date)
+            if cached is not MISSING and cached is not None:
+                self.cache.put(entry.date, cached._replace(
+                    id=entry.id, revision=entry.revision, updated_at=entry.updated_at))
+
+    def apply_remote(self, entries):
+        """Take server rows newer than the local ones.
+
+        Returns `(changed, conflicts)` date lists: days replaced locally, and
+        days that were newer on the server but also have local edits.
+        """
+        changed, conflicts = [], []
+        with self.cursor() as cursor:
+            for remote in entries:
+                cursor.execute("SELECT revision, local_edits FROM timeboxing_entry WHERE user_id = ? AND date = ?",
+                               (self.user_id, remote.date.isoformat()))
+                local = cursor.fetchone()
+                if local is not None and remote.revision <= local[0]:
+                    # Already have it, e.g. our own push coming back
+                    continue
+                if local is not None and local[1] > 0:
+                    cursor.execute(f"INSERT OR REPLACE INTO sync_conflict (user_id, {ENTRY_COLUMNS}) "
+                                   f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (self.user_id, *_row_params(remote)))
+                    conflicts.append(remote.date)
+                    continue
+                cursor.execute(REPLACE_LOCAL_SQL, (self.user_id, *_row_params(remote)))
+                changed.append(remote)
+        for entry in changed:
+            self.cache.put(entry.date, entry)
+        return [entry.date for entry in changed], conflicts
+
+    def newer_than_local(self, changes):
+        """The live_changes.Change items announcing a revision this store does not have yet."""
+        newer = []
+        with self.cursor() as cursor:
+            for change in changes:
+                cursor.execute("SELECT revision FROM timeboxing_entry WHERE user_id = ? AND date = ?",
+                               (self.user_id, change.date.isoformat()))
+                row = cursor.fetchone()
+                if row is None or row[0] < change.revision:
+                    newer.append(change)
+        return newer
+
+    def conflict_dates(self):
+        with self.cursor() as cursor:
+            cursor.execute("SELECT date FROM sync_conflict WHERE user_id = ? ORDER BY date", (self.user_id,))
+            return [as_date(row[0]) for row in cursor.fetchall()]
+
+    def conflicts(self):
+        with self.cursor() as cursor:
+            cursor.execute("SELECT date FROM sync_conflict WHERE user_id = ? ORDER BY date", (self.user_id,))
+            dates = [row[0] for row in cursor.fetchall()]
+            return [Conflict(self._get(cursor, 'timeboxing_entry', date), self._get(cursor, 'sync_conflict', date))
+                    for date in dates]
+
+    def resolve(self, date, keep_local):
+        """Settle a conflict on `date`: keep the local version (pushed next sync) or take the server's."""
+        with self.cursor() as cursor:
+            remote = self._get(cursor, 'sync_conflict', date)
+            if remote is None:
+                return self._get(cursor, 'timeboxing_entry', date)
+            if keep_local:
+                # Rebase on the server's revision so the next push overwrites it
+                cursor.execute("UPDATE timeboxing_entry SET id = ?, revision = ?, updated_at = ? "
+                               "WHERE user_id = ? AND date = ?",
+                               (remote.id, remote.revision, _row_params(remote)[-1], self.user_id,
+                                remote.date.isoformat()))
+            else:
+                cursor.execute(REPLACE_LOCAL_SQL, (self.user_id, *_row_params(remote)))
+            cursor.execute("DELETE FROM sync_conflict WHERE user_id = ? AND date = ?",
+                           (self.user_id, remote.date.isoformat()))
+            entry = self._get(cursor, 'timeboxing_entry', date)
+        self.cache.put(entry.date, entry)
+        return entry
+
+    def pulled_until(self):
+        with self.cursor() as cursor:
+            cursor.execute("SELECT pulled_until FROM sync_state WHERE user_id = ?", (self.user_id,))
+            row = cursor.fetchone()
+            return datetime.fromisoformat(row[0]) if row else None
+
+    def set_pulled_until(self, timestamp):
+        with self.cursor() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO sync_state (user_id, pulled_until) VALUES (?, ?)",
+                           (self.user_id, timestamp.isoformat()))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class Synchronizer:
+    """Pushes a LocalStore's edits to Postgres and pulls the server's changes into it.
+
+    `connect()` must return an EntryRepository for the same user. It is
+    first called by the first sync, on whichever thread runs it, so an
+    unreachable server never blocks whoever built the Synchronizer.
+    """
+
+    def __init__(self, store, connect, batch_size=PUSH_BATCH_SIZE):
+        self.store = store
+        self.connect = connect
+        self.batch_size = batch_size
+        self.repository = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Push, then pull. Returns a SyncResult; raises if the server cannot be reached.
+
+        `conflicts` lists every unresolved conflict, not just the new ones.
+        """
+        with self._lock:
+            if self.repository is None:
+                self.repository = self.connect()
+            pushed, _conflicts = self.push()
+            changed, _conflicts = self.pull()
+            return SyncResult(pushed, changed, self.store.conflict_dates(), self.store.pending_count())
+
+    def run_on_server(self, func, *args, **kwargs):
+        """Call `func(cursor, user_id, *args, **kwargs)` in one server transaction, between a push and a pull.
+
+        For server-side bulk writes such as applying a schedule template:
+        pushing first lets them build on this computer's edits, and the pull
+        brings their results into the store. Returns `(result, SyncResult)`.
+        """
+        with self._lock:
+            if self.repository is None:
+                self.repository = self.connect()
+            pushed, _conflicts = self.push()
+            with self.repository.cursor() as cursor:
+                result = func(cursor, self.store.user_id, *args, **kwargs)
+            changed, _conflicts = self.pull()
+            return result, SyncResult(pushed, changed, self.store.conflict_dates(), self.store.pending_count())
+
+    def push(self):
+        """Write pending days in batches of one transaction each; returns `(pushed, conflict_dates)`."""
+        user_id = self.store.user_id
+        pushed, conflicts = 0, []
+        while True:
+            batch = self.store.pending(self.batch_size)
+            if not batch:
+                break
+            stored, remote = [], []
+            with self.repository.cursor() as cursor:
+                for entry, edits in batch:
+                    try:
+                        stored.append((upsert_entry(cursor, user_id, entry.date, entry.top_priorities,
+                                                    entry.brain_dump, entry.schedule, grid_of(entry),
+                                                    expected_revision=entry.revision), edits))
+                    except RevisionConflict:
+                        remote.extend(fetch_entries_between(cursor, user_id, entry.date, entry.date))
+            self.store.mark_pushed(stored)
+            # Newer on the server, so these come back as conflicts and leave the queue
+            conflicts.extend(self.store.apply_remote(remote)[1])
+            pushed += len(stored)
+        return pushed, conflicts
+
+    def pull(self):
+        """Apply rows changed on the server since the last pull; returns `(changed, conflicts)` dates."""
+        last = self.store.pulled_until()
+        since = last - PULL_OVERLAP if last else EPOCH
+        after_date = Date.min
+        changed, conflicts = [], []
+        while True:
+            with self.repository.cursor() as cursor:
+                rows = fetch_entries_changed_since(cursor, self.store.user_id, since, after_date, PULL_PAGE_SIZE)
+            if not rows:
+                break
+            page_changed, page_conflicts = self.store.apply_remote(rows)
+            changed.extend(page_changed)
+            conflicts.extend(page_conflicts)
+            since, after_date = rows[-1].updated_at, rows[-1].date
+            # The overlap can make a page end before the last pull did
+            self.store.set_pulled_until(max(since, last) if last else since)
+            if len(rows) < PULL_PAGE_SIZE:
+                break
+        return changed, conflicts
+
+    def close(self):
+        if self.repository is not None:
+            self.repository.close()
@@ -0,0 +1,197 @@
+"""Latency histograms and counters in the Prometheus text format.
+
+This module has no Flask or Qt dependency. app.py times requests, template
+renders and SQL through it and serves `REGISTRY.render()` at /metrics; the
+desktop app times its workers and GUI-thread handlers. Either can also
+append every observation to a JSON-lines log (METRICS_LOG).
+
+Statements slower than SLOW_QUERY_MS (default 250) are printed and logged.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', 250)) / 1000
+SLOW_QUERY_MAX_CHARS = 500
+
+
+def _label_text(labelnames, values, extra=()):
+    pairs = [*zip(labelnames, values), *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != float('inf') else "+Inf"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            for key, value in series:
+                lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, key, value):
+        yield f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+        self.registry.log(self.name, value, labels)
+
+    def time(self, **labels):
+        """Observe the duration of a `with` block, or of every call when used as a decorator."""
+        return _Timer(self, labels)
+
+    def _render_series(self, key, series):
+        counts, total, count = series
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+            cumulative += bucket_count
+            yield f"{self.name}_bucket{_label_text(self.labelnames, key, [('le', _number(bound))])} {cumulative}"
+        labels = _label_text(self.labelnames, key)
+        yield f"{self.name}_sum{labels} {_number(total)}"
+        yield f"{self.name}_count{labels} {count}"
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._log_file = None
+        self._log_lock = threading.Lock()
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"{metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def log_to(self, path):
+        """Append each observation (and slow query) to `path` as one JSON object per line."""
+        with self._log_lock:
+            if self._log_file:
+                self._log_file.close()
+            self._log_file = open(path, 'a', encoding='utf-8', buffering=1) if path else None
+
+    def log(self, event, value, fields):
+        if self._log_file is None:
+            return
+        line = json.dumps({'ts': round(time.time(), 6), 'event': event, 'value': round(value, 6), **fields},
+                          default=str)
+        with self._log_lock:
+            if self._log_file:
+                self._log_file.write(line + "\n")
+
+
+REGISTRY = Registry()
+
+QUERY_SECONDS = REGISTRY.histogram(
+    'timeboxing_db_query_seconds', "SQL statement execution time.", ['statement'])
+SLOW_QUERIES = REGISTRY.counter(
+    'timeboxing_db_slow_queries_total', "Statements that took longer than SLOW_QUERY_MS.", ['statement'])
+
+
+def statement_kind(statement):
+    """First keyword of a statement (SELECT, INSERT, WITH...), used as a low-cardinality label."""
+    if isinstance(statement, bytes):
+        statement = statement[:64].decode('utf-8', 'replace')
+    words = statement.split(None, 1)
+    return words[0].upper() if words else 'EMPTY'
+
+
+def record_query(statement, seconds):
+    kind = statement_kind(statement)
+    QUERY_SECONDS.observe(seconds, statement=kind)
+    if seconds < SLOW_QUERY_SECONDS:
+        return
+    SLOW_QUERIES.inc(statement=kind)
+    if isinstance(statement, bytes):
+        statement = statement.decode('utf-8', 'replace')
+    text = " ".join(statement.split())
+    if len(text) > SLOW_QUERY_MAX_CHARS:
+        text = text[:SLOW_QUERY_MAX_CHARS] + "..."
+    print(f"Slow query ({seconds * 1000:.0f} ms): {text}")
+    REGISTRY.log('slow_query', seconds, {'statement': text})
@@ -0,0 +1,671 @@
+"""Versioned schema migrations shared by the web and desktop apps.
+
+Startup calls `migrate(conn)`. When the schema is current that is a single
+`SELECT` against `schema_version`; otherwise the missing steps run in one
+transaction under an advisory lock, so two processes starting together do
+not both apply them.
+
+Large shared deployments can also opt in to range-partitioning entries by
+year, and should re-run it yearly so the coming year gets its partition:
+
+    python migrations.py --partition-by-year
+"""
+from datetime import date
+
+import psycopg2
+import psycopg2.errors
+
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every process
+MIGRATION_LOCK_KEY = 7354021
+
+CURRENT_VERSION_SQL = "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+
+# (version, description, statements). Append new steps; never edit applied ones.
+MIGRATIONS = [
+    (1, "create timeboxing_entry", [
+        """
+        CREATE TABLE IF NOT EXISTS timeboxing_entry (
+            id SERIAL PRIMARY KEY,
+            date DATE NOT NULL,
+            top_priorities TEXT,
+            brain_dump TEXT,
+            schedule JSONB
+        )
+        """,
+    ]),
+    (2, "unique index on date", [
+        # Databases created by either app may already have one
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_index i
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                WHERE i.indrelid = 'timeboxing_entry'::regclass
+                  AND i.indisunique AND i.indnatts = 1 AND a.attname = 'date'
+            ) THEN
+                ALTER TABLE timeboxing_entry ADD CONSTRAINT unique_date UNIQUE (date);
+            END IF;
+        END $$
+        """,
+    ]),
+    (3, "per-entry slot grid", [
+        """
+        ALTER TABLE timeboxing_entry
+            ADD COLUMN IF NOT EXISTS slot_minutes SMALLINT DEFAULT 30,
+            ADD COLUMN IF NOT EXISTS day_start SMALLINT DEFAULT 5,
+            ADD COLUMN IF NOT EXISTS day_end SMALLINT DEFAULT 24
+        """,
+    ]),
+    (4, "entry revision and updated_at", [
+        """
+        ALTER TABLE timeboxing_entry
+            ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1,
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        """,
+        # A trigger rather than the upsert itself, so every write path bumps it
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_entry_bump_revision() RETURNS trigger AS $$
+        BEGIN
+            NEW.revision := OLD.revision + 1;
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER timeboxing_entry_revision
+            BEFORE UPDATE ON timeboxing_entry
+            FOR EACH ROW EXECUTE PROCEDURE timeboxing_entry_bump_revision()
+        """,
+    ]),
+    (5, "schedule as jsonb", [
+        # Tables created by the web app's create_all() used plain json
+        """
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'timeboxing_entry' AND column_name = 'schedule') = 'json' THEN
+                ALTER TABLE timeboxing_entry ALTER COLUMN schedule TYPE JSONB USING schedule::jsonb;
+            END IF;
+        END $$
+        """,
+    ]),
+    (6, "daily summary for analytics", [
+        """
+        CREATE TABLE IF NOT EXISTS timeboxing_daily_summary (
+            date DATE PRIMARY KEY,
+            planned_slots INTEGER NOT NULL,
+            completed_slots INTEGER NOT NULL,
+            planned_minutes INTEGER NOT NULL,
+            completed_minutes INTEGER NOT NULL,
+            task_minutes JSONB NOT NULL
+        )
+        """,
+        # Understands both the legacy string slots and the desktop dict slots
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_summarize(schedule JSONB, slot_minutes INTEGER)
+        RETURNS TABLE (planned_slots INTEGER, completed_slots INTEGER, planned_minutes INTEGER,
+                       completed_minutes INTEGER, task_minutes JSONB) AS $$
+            WITH planned AS (
+                SELECT * FROM (
+                    SELECT CASE jsonb_typeof(value) WHEN 'string' THEN value #>> '{}' ELSE value ->> 'task' END AS task,
+                           COALESCE((value ->> 'checked')::boolean, false) AS checked
+                    FROM jsonb_each(COALESCE(schedule, '{}'::jsonb))
+                ) slots
+                WHERE COALESCE(task, '') <> ''
+            )
+            SELECT count(*)::int,
+                   (count(*) FILTER (WHERE checked))::int,
+                   (count(*) * slot_minutes)::int,
+                   ((count(*) FILTER (WHERE checked)) * slot_minutes)::int,
+                   COALESCE((SELECT jsonb_object_agg(task, n * slot_minutes)
+                             FROM (SELECT task, count(*) AS n FROM planned GROUP BY task) per_task),
+                            '{}'::jsonb)
+            FROM planned
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_refresh_summary() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO timeboxing_daily_summary
+            SELECT NEW.date, s.* FROM timeboxing_summarize(NEW.schedule, COALESCE(NEW.slot_minutes, 30)) s
+            ON CONFLICT (date) DO UPDATE
+            SET planned_slots = EXCLUDED.planned_slots,
+                completed_slots = EXCLUDED.completed_slots,
+                planned_minutes = EXCLUDED.planned_minutes,
+                completed_minutes = EXCLUDED.completed_minutes,
+                task_minutes = EXCLUDED.task_minutes;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER timeboxing_entry_summary
+            AFTER INSERT OR UPDATE OF schedule, slot_minutes ON timeboxing_entry
+            FOR EACH ROW EXECUTE PROCEDURE timeboxing_refresh_summary()
+        """,
+        """
+        INSERT INTO timeboxing_daily_summary
+        SELECT e.date, s.*
+        FROM timeboxing_entry e
+        CROSS JOIN LATERAL timeboxing_summarize(e.schedule, COALESCE(e.slot_minutes, 30)) s
+        ON CONFLICT (date) DO NOTHING
+        """,
+    ]),
+    (7, "full-text search", [
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_schedule_text(schedule JSONB) RETURNS TEXT AS $$
+            SELECT string_agg(task, ' ') FROM (
+                SELECT CASE jsonb_typeof(value) WHEN 'string' THEN value #>> '{}' ELSE value ->> 'task' END AS task
+                FROM jsonb_each(COALESCE(schedule, '{}'::jsonb))
+            ) slots
+            WHERE COALESCE(task, '') <> ''
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+        """
+        ALTER TABLE timeboxing_entry ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', COALESCE(top_priorities, '')), 'A') ||
+                setweight(to_tsvector('english', COALESCE(timeboxing_schedule_text(schedule), '')), 'A') ||
+                setweight(to_tsvector('english', COALESCE(brain_dump, '')), 'B')
+            ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS timeboxing_entry_search_idx ON timeboxing_entry USING GIN (search_vector)",
+        """
+        CREATE INDEX IF NOT EXISTS timeboxing_entry_schedule_idx
+            ON timeboxing_entry USING GIN (schedule jsonb_path_ops)
+        """,
+    ]),
+    (8, "per-user entries", [
+        # Existing rows belong to timeboxing_db.DEFAULT_USER
+        "ALTER TABLE timeboxing_entry ADD COLUMN IF NOT EXISTS user_id TEXT NOT NULL DEFAULT 'default'",
+        # Whichever unique index on date alone exists: unique_date from step 2,
+        # or the one create_all() made from the old model
+        """
+        DO $$
+        DECLARE
+            found RECORD;
+        BEGIN
+            FOR found IN
+                SELECT c.relname AS index_name, con.conname
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+                WHERE i.indrelid = 'timeboxing_entry'::regclass
+                  AND i.indisunique AND NOT i.indisprimary AND i.indnatts = 1 AND a.attname = 'date'
+            LOOP
+                IF found.conname IS NOT NULL THEN
+                    EXECUTE format('ALTER TABLE timeboxing_entry DROP CONSTRAINT %I', found.conname);
+                ELSE
+                    EXECUTE format('DROP INDEX %I', found.index_name);
+                END IF;
+            END LOOP;
+        END $$
+        """,
+        # Also serves every per-user lookup and date-ordered history scan
+        "ALTER TABLE timeboxing_entry ADD CONSTRAINT timeboxing_entry_user_date_key UNIQUE (user_id, date)",
+        "ALTER TABLE timeboxing_daily_summary ADD COLUMN IF NOT EXISTS user_id TEXT NOT NULL DEFAULT 'default'",
+        "ALTER TABLE timeboxing_daily_summary DROP CONSTRAINT timeboxing_daily_summary_pkey",
+        "ALTER TABLE timeboxing_daily_summary ADD PRIMARY KEY (user_id, date)",
+        # Now also follows entries that are moved to another user or day, or deleted
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_refresh_summary() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE'
+               OR (TG_OP = 'UPDATE' AND (OLD.user_id, OLD.date) IS DISTINCT FROM (NEW.user_id, NEW.date)) THEN
+                DELETE FROM timeboxing_daily_summary WHERE user_id = OLD.user_id AND date = OLD.date;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN NULL;
+            END IF;
+            INSERT INTO timeboxing_daily_summary
+                (user_id, date, planned_slots, completed_slots, planned_minutes, completed_minutes, task_minutes)
+            SELECT NEW.user_id, NEW.date, s.* FROM timeboxing_summarize(NEW.schedule, COALESCE(NEW.slot_minutes, 30)) s
+            ON CONFLICT (user_id, date) DO UPDATE
+            SET planned_slots = EXCLUDED.planned_slots,
+                completed_slots = EXCLUDED.completed_slots,
+                planned_minutes = EXCLUDED.planned_minutes,
+                completed_minutes = EXCLUDED.completed_minutes,
+                task_minutes = EXCLUDED.task_minutes;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER timeboxing_entry_summary ON timeboxing_entry",
+        """
+        CREATE TRIGGER timeboxing_entry_summary
+            AFTER INSERT OR DELETE OR UPDATE OF user_id, date, schedule, slot_minutes ON timeboxing_entry
+            FOR EACH ROW EXECUTE PROCEDURE timeboxing_refresh_summary()
+        """,
+    ]),
+    (9, "index for pulling changes by updated_at", [
+        # The desktop sync asks for "this user's rows changed since T"
+        "CREATE INDEX IF NOT EXISTS timeboxing_entry_user_updated_idx ON timeboxing_entry (user_id, updated_at)",
+    ]),
+    (10, "compact schedule encoding", [
+        # One row per non-empty slot of a schedule stored in either format
+        # (see schedule_codec): version 2 objects, or the older "HH:MM"-keyed
+        # maps that are converted as they are next written. Bit n of the hex
+        # mask "c" is slot n's checked flag.
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_schedule_slots(schedule JSONB)
+        RETURNS TABLE (minute INTEGER, task TEXT, checked BOOLEAN) AS $$
+            SELECT m.value::int,
+                   schedule -> 't' ->> COALESCE((schedule -> 'i' ->> (m.n - 1)::int)::int, (m.n - 1)::int),
+                   (((position(substr(COALESCE(schedule ->> 'c', ''),
+                                      length(COALESCE(schedule ->> 'c', '')) - (m.n - 1)::int / 4, 1)
+                               IN '0123456789abcdef') - 1) >> ((m.n - 1)::int % 4)) & 1) = 1
+            FROM jsonb_array_elements_text(CASE WHEN schedule ? 'v' THEN schedule -> 'm' ELSE '[]' END)
+                 WITH ORDINALITY AS m (value, n)
+            UNION ALL
+            SELECT split_part(key, ':', 1)::int * 60 + split_part(key, ':', 2)::int,
+                   CASE jsonb_typeof(value) WHEN 'string' THEN value #>> '{}' ELSE value ->> 'task' END,
+                   COALESCE((value ->> 'checked')::boolean, false)
+            FROM jsonb_each(CASE WHEN schedule ? 'v' THEN '{}' ELSE COALESCE(schedule, '{}') END)
+            WHERE key ~ '^[0-9]{2}:[0-9]{2}$'
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_summarize(schedule JSONB, slot_minutes INTEGER)
+        RETURNS TABLE (planned_slots INTEGER, completed_slots INTEGER, planned_minutes INTEGER,
+                       completed_minutes INTEGER, task_minutes JSONB) AS $$
+            WITH planned AS (
+                SELECT task, checked FROM timeboxing_schedule_slots(schedule) WHERE COALESCE(task, '') <> ''
+            )
+            SELECT count(*)::int,
+                   (count(*) FILTER (WHERE checked))::int,
+                   (count(*) * slot_minutes)::int,
+                   ((count(*) FILTER (WHERE checked)) * slot_minutes)::int,
+                   COALESCE((SELECT jsonb_object_agg(task, n * slot_minutes)
+                             FROM (SELECT task, count(*) AS n FROM planned GROUP BY task) per_task),
+                            '{}'::jsonb)
+            FROM planned
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+        # Same text for a row in either format, so stored search vectors stay valid
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_schedule_text(schedule JSONB) RETURNS TEXT AS $$
+            SELECT string_agg(task, ' ') FROM timeboxing_schedule_slots(schedule) WHERE COALESCE(task, '') <> ''
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+        # Its "HH:MM" keys are gone from encoded rows, and nothing queries it
+        "DROP INDEX IF EXISTS timeboxing_entry_schedule_idx",
+    ]),
+    (11, "schedule templates", [
+        """
+        CREATE TABLE IF NOT EXISTS timeboxing_template (
+            id SERIAL PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            schedule JSONB NOT NULL,
+            slot_minutes SMALLINT NOT NULL,
+            day_start SMALLINT NOT NULL,
+            day_end SMALLINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            CONSTRAINT timeboxing_template_user_name_key UNIQUE (user_id, name)
+        )
+        """,
+        # Same decoder, now with each slot's colour so schedules can be
+        # rebuilt in SQL. The output columns change, hence drop and create;
+        # its callers all name the columns they use.
+        "DROP FUNCTION timeboxing_schedule_slots(JSONB)",
+        """
+        CREATE FUNCTION timeboxing_schedule_slots(schedule JSONB)
+        RETURNS TABLE (minute INTEGER, task TEXT, checked BOOLEAN, color TEXT) AS $$
+            SELECT m.value::int,
+                   schedule -> 't' ->> COALESCE((schedule -> 'i' ->> (m.n - 1)::int)::int, (m.n - 1)::int),
+                   (((position(substr(COALESCE(schedule ->> 'c', ''),
+                                      length(COALESCE(schedule ->> 'c', '')) - (m.n - 1)::int / 4, 1)
+                               IN '0123456789abcdef') - 1) >> ((m.n - 1)::int % 4)) & 1) = 1,
+                   COALESCE(schedule -> 'k' ->> (NULLIF((schedule -> 'p' ->> (m.n - 1)::int)::int, 0) - 1),
+                            '#ffffff')
+            FROM jsonb_array_elements_text(CASE WHEN schedule ? 'v' THEN schedule -> 'm' ELSE '[]' END)
+                 WITH ORDINALITY AS m (value, n)
+            UNION ALL
+            SELECT split_part(key, ':', 1)::int * 60 + split_part(key, ':', 2)::int,
+                   CASE jsonb_typeof(value) WHEN 'string' THEN value #>> '{}' ELSE value ->> 'task' END,
+                   COALESCE((value ->> 'checked')::boolean, false),
+                   CASE jsonb_typeof(value) WHEN 'object' THEN COALESCE(value ->> 'color', '#ffffff')
+                                            ELSE '#ffffff' END
+            FROM jsonb_each(CASE WHEN schedule ? 'v' THEN '{}' ELSE COALESCE(schedule, '{}') END)
+            WHERE key ~ '^[0-9]{2}:[0-9]{2}$'
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+        # The SQL side of schedule_codec.encode(), for slots given in
+        # start-time order
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_encode_schedule(minutes INTEGER[], tasks TEXT[], checked BOOLEAN[],
+                                                              colors TEXT[])
+        RETURNS JSONB AS $$
+        DECLARE
+            slot_count INTEGER := COALESCE(array_length(minutes, 1), 0);
+            task_list TEXT[] := '{}';
+            task_ids INTEGER[] := '{}';
+            color_list TEXT[] := '{}';
+            color_ids INTEGER[] := '{}';
+            nibbles INTEGER[] := '{}';
+            mask TEXT := '';
+            found_at INTEGER;
+            result JSONB := '{"v": 2}';
+        BEGIN
+            FOR n IN 1 .. slot_count LOOP
+                found_at := array_position(task_list, tasks[n]);
+                IF found_at IS NULL THEN
+                    task_list := task_list || tasks[n];
+                    found_at := cardinality(task_list);
+                END IF;
+                task_ids := task_ids || (found_at - 1);
+
+                IF colors[n] = '#ffffff' THEN
+                    color_ids := color_ids || 0;
+                ELSE
+                    found_at := array_position(color_list, colors[n]);
+                    IF found_at IS NULL THEN
+                        color_list := color_list || colors[n];
+                        found_at := cardinality(color_list);
+                    END IF;
+                    color_ids := color_ids || found_at;
+                END IF;
+
+                IF (n - 1) % 4 = 0 THEN
+                    nibbles := nibbles || 0;
+                END IF;
+                IF checked[n] THEN
+                    nibbles[(n - 1) / 4 + 1] := nibbles[(n - 1) / 4 + 1] | (1 << ((n - 1) % 4));
+                END IF;
+            END LOOP;
+
+            IF slot_count > 0 THEN
+                result := result || jsonb_build_object('m', to_jsonb(minutes), 't', to_jsonb(task_list));
+            END IF;
+            IF cardinality(task_list) < slot_count THEN
+                result := result || jsonb_build_object('i', to_jsonb(task_ids));
+            END IF;
+            FOR g IN REVERSE cardinality(nibbles) .. 1 LOOP
+                mask := mask || substr('0123456789abcdef', nibbles[g] + 1, 1);
+            END LOOP;
+            mask := ltrim(mask, '0');
+            IF mask <> '' THEN
+                result := result || jsonb_build_object('c', mask);
+            END IF;
+            IF cardinality(color_list) > 0 THEN
+                result := result || jsonb_build_object('k', to_jsonb(color_list), 'p', to_jsonb(color_ids));
+            END IF;
+            RETURN result;
+        END
+        $$ LANGUAGE plpgsql IMMUTABLE
+        """,
+        # `base` with `filler`'s slots filled in wherever `base` has an empty one
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_merge_schedules(base JSONB, filler JSONB) RETURNS JSONB AS $$
+            SELECT timeboxing_encode_schedule(array_agg(minute ORDER BY minute), array_agg(task ORDER BY minute),
+                                              array_agg(checked ORDER BY minute), array_agg(color ORDER BY minute))
+            FROM (
+                SELECT DISTINCT ON (minute) minute, task, checked, color
+                FROM (
+                    SELECT minute, COALESCE(task, '') AS task, checked, color, 0 AS layer
+                    FROM timeboxing_schedule_slots(base)
+                    UNION ALL
+                    SELECT minute, COALESCE(task, ''), checked, color, 1 FROM timeboxing_schedule_slots(filler)
+                ) layered
+                WHERE task <> '' OR checked OR color <> '#ffffff'
+                ORDER BY minute, layer
+            ) merged
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+    ]),
+    (12, "notify clients of entry changes", [
+        # Delivered on commit, so listeners never see a write that rolled back
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_notify_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('timeboxing_entry_changed', json_build_object(
+                'user_id', NEW.user_id, 'date', NEW.date, 'revision', NEW.revision)::text);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER timeboxing_entry_notify
+            AFTER INSERT OR UPDATE ON timeboxing_entry
+            FOR EACH ROW EXECUTE PROCEDURE timeboxing_notify_change()
+        """,
+    ]),
+    (13, "skip slot times outside the day", [
+        # schedule_codec.encode() once stored keys like "24:30" as minute
+        # 1470; read past them like the Python decoder does
+        """
+        CREATE OR REPLACE FUNCTION timeboxing_schedule_slots(schedule JSONB)
+        RETURNS TABLE (minute INTEGER, task TEXT, checked BOOLEAN, color TEXT) AS $$
+            SELECT m.value::int,
+                   schedule -> 't' ->> COALESCE((schedule -> 'i' ->> (m.n - 1)::int)::int, (m.n - 1)::int),
+                   (((position(substr(COALESCE(schedule ->> 'c', ''),
+                                      length(COALESCE(schedule ->> 'c', '')) - (m.n - 1)::int / 4, 1)
+                               IN '0123456789abcdef') - 1) >> ((m.n - 1)::int % 4)) & 1) = 1,
+                   COALESCE(schedule -> 'k' ->> (NULLIF((schedule -> 'p' ->> (m.n - 1)::int)::int, 0) - 1),
+                            '#ffffff')
+            FROM jsonb_array_elements_text(CASE WHEN schedule ? 'v' THEN schedule -> 'm' ELSE '[]' END)
+                 WITH ORDINALITY AS m (value, n)
+            WHERE m.value::int BETWEEN 0 AND 1439
+            UNION ALL
+            SELECT split_part(key, ':', 1)::int * 60 + split_part(key, ':', 2)::int,
+                   CASE jsonb_typeof(value) WHEN 'string' THEN value #>> '{}' ELSE value ->> 'task' END,
+                   COALESCE((value ->> 'checked')::boolean, false),
+                   CASE jsonb_typeof(value) WHEN 'object' THEN COALESCE(value ->> 'color', '#ffffff')
+                                            ELSE '#ffffff' END
+            FROM jsonb_each(CASE WHEN schedule ? 'v' THEN '{}' ELSE COALESCE(schedule, '{}') END)
+            WHERE key ~ '^([01][0-9]|2[0-3]):[0-5][0-9]$'
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Return the applied schema version, 0 if migrations never ran."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(CURRENT_VERSION_SQL)
+            version = cursor.fetchone()[0]
+        conn.commit()
+        return version
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return 0
+
+
+def migrate(conn):
+    """Apply any pending migrations on the DB-API connection `conn`.
+
+    Returns the schema version afterwards.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return LATEST_VERSION
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            # Re-read under the lock; another process may have just migrated
+            cursor.execute(CURRENT_VERSION_SQL)
+            version = cursor.fetchone()[0]
+            for step, description, statements in MIGRATIONS:
+                if step <= version:
+                    continue
+                print(f"Applying migration {step}: {description}")
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (step, description),
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return LATEST_VERSION
+
+
+PARTITION_DEFAULT = 'timeboxing_entry_default'
+
+
+def year_partition(year):
+    return f"timeboxing_entry_y{year}"
+
+
+def _copy_columns(cursor, table):
+    """Quoted, comma-separated columns of `table` that can be inserted (not generated)."""
+    cursor.execute("""
+        SELECT quote_ident(column_name) FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (table,))
+    return ", ".join(name for name, in cursor.fetchall())
+
+
+def _convert_to_partitioned(cursor, years):
+    """Rebuild timeboxing_entry as a table partitioned by RANGE (date).
+
+    Constraints, indexes and triggers are read from the catalog and
+    re-created on the new table, so steps added to MIGRATIONS later carry
+    over without changes here. Postgres requires the partition key in every
+    unique index, so the primary key becomes (id, date).
+    """
+    cursor.execute("LOCK TABLE timeboxing_entry IN ACCESS EXCLUSIVE MODE")
+    cursor.execute("""
+        SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'timeboxing_entry'::regclass AND contype IN ('p', 'u')
+    """)
+    constraints = cursor.fetchall()
+    cursor.execute("""
+        SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+        WHERE i.indrelid = 'timeboxing_entry'::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """)
+    indexes = [definition for definition, in cursor.fetchall()]
+    cursor.execute("""
+        SELECT pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = 'timeboxing_entry'::regclass AND NOT tgisinternal
+    """)
+    triggers = [definition for definition, in cursor.fetchall()]
+    columns = _copy_columns(cursor, 'timeboxing_entry')
+
+    cursor.execute("""
+        CREATE TABLE timeboxing_entry_partitioned
+            (LIKE timeboxing_entry INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (date)
+    """)
+    for year in years:
+        cursor.execute(f"CREATE TABLE {year_partition(year)} PARTITION OF timeboxing_entry_partitioned "
+                       f"FOR VALUES FROM (%s) TO (%s)", (date(year, 1, 1), date(year + 1, 1, 1)))
+    # Catches days outside the yearly partitions instead of failing the write
+    cursor.execute(f"CREATE TABLE {PARTITION_DEFAULT} PARTITION OF timeboxing_entry_partitioned DEFAULT")
+    cursor.execute(f"INSERT INTO timeboxing_entry_partitioned ({columns}) SELECT {columns} FROM timeboxing_entry")
+    cursor.execute("SELECT pg_get_serial_sequence('timeboxing_entry', 'id')")
+    sequence, = cursor.fetchone()
+    if sequence:
+        # Keep the id sequence alive when the old table is dropped
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY timeboxing_entry_partitioned.id")
+    cursor.execute("DROP TABLE timeboxing_entry")
+    cursor.execute("ALTER TABLE timeboxing_entry_partitioned RENAME TO timeboxing_entry")
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = "PRIMARY KEY (id, date)"
+        cursor.execute(f'ALTER TABLE timeboxing_entry ADD CONSTRAINT "{name}" {definition}')
+    for statement in indexes + triggers:
+        cursor.execute(statement)
+
+
+def _add_year_partition(cursor, year, columns):
+    """Attach a partition for `year`, moving its rows out of the default partition."""
+    name = year_partition(year)
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    cursor.execute(f"CREATE TABLE {name} "
+                   f"(LIKE timeboxing_entry INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)")
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {PARTITION_DEFAULT} WHERE date >= %s AND date < %s RETURNING {columns}
+        )
+        INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+    """, (start, end))
+    cursor.execute(f"ALTER TABLE timeboxing_entry ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+                   (start, end))
+    # The DELETE fired the default partition's summary trigger, which dropped
+    # these days' summaries; the new table had no triggers yet to put them back
+    cursor.execute(f"""
+        INSERT INTO timeboxing_daily_summary
+            (user_id, date, planned_slots, completed_slots, planned_minutes, completed_minutes, task_minutes)
+        SELECT e.user_id, e.date, s.* FROM {name} e
+        CROSS JOIN LATERAL timeboxing_summarize(e.schedule, COALESCE(e.slot_minutes, 30)) s
+        ON CONFLICT (user_id, date) DO NOTHING
+    """)
+
+
+def partition_by_year(conn, years_ahead=1):
+    """Range-partition timeboxing_entry by year, or add missing years if it already is.
+
+    Every year from the first entry through `years_ahead` past the current
+    one gets its own partition. Per-user lookups then touch one partition
+    and history scans only the years they reach. The first run copies the
+    whole table under an exclusive lock. Returns the years added.
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+            cursor.execute("SELECT EXTRACT(YEAR FROM min(date))::int, EXTRACT(YEAR FROM max(date))::int "
+                           "FROM timeboxing_entry")
+            first, last = cursor.fetchone()
+            this_year = date.today().year
+            wanted = range(min(first or this_year, this_year), max(last or this_year, this_year + years_ahead) + 1)
+
+            cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'timeboxing_entry'::regclass")
+            if not cursor.fetchone()[0]:
+                print("Partitioning timeboxing_entry by year")
+                _convert_to_partitioned(cursor, wanted)
+                added = list(wanted)
+            else:
+                columns = _copy_columns(cursor, 'timeboxing_entry')
+                added = []
+                for year in wanted:
+                    cursor.execute("SELECT to_regclass(%s)", (year_partition(year),))
+                    if cursor.fetchone()[0] is None:
+                        _add_year_partition(cursor, year, columns)
+                        added.append(year)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return added
+
+
+if __name__ == '__main__':
+    import argparse
+    from dotenv import load_dotenv
+    from timeboxing_db import env_connect_kwargs
+
+    parser = argparse.ArgumentParser(description="Bring the timeboxing schema up to date.")
+    parser.add_argument('--partition-by-year', action='store_true',
+                        help="partition entries by year (or add the partitions for new years)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    connection = psycopg2.connect(**env_connect_kwargs())
+    try:
+        print(f"Schema is at version {migrate(connection)}")
+        if args.partition_by_year:
+            added = partition_by_year(connection)
+            print(f"Added partitions for {', '.join(map(str, added))}" if added else "Partitions are up to date")
+    finally:
+        connection.close()
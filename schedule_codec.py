@@ -0,0 +1,164 @@
+"""Compact, versioned encoding of a day's schedule, shared by both apps.
+
+Version 2 stores only slots that have a task, a tick or a colour, in
+start-time order, as one small JSON object:
+
+    {"v": 2, "m": [540, 570], "t": ["Deep work", "Email"], "c": "2", "k": ["#ffcc00"], "p": [1, 0]}
+
+    m   slot start times, in minutes after midnight
+    t   the day's distinct task strings
+    i   index into t for each slot; left out when slot n uses t[n]
+    c   checked flags as a hex bitmask, bit n for slot n; left out when none are
+    k   the day's distinct colours other than the default white
+    p   colour of each slot, 0 for white and n for k[n - 1]; left out when all are white
+
+Rows written before this, as `{"HH:MM": "task"}` or `{"HH:MM": {task,
+checked, color}}`, are still decoded, and are stored in the new form the
+next time they are written. The SQL side reads both shapes through
+timeboxing_schedule_slots() (migrations 10, 11 and 13).
+
+Slot times must lie within the day: encode() rejects "24:30" and the like,
+and decode() skips such slots in rows stored before that check.
+"""
+import json
+import re
+from collections import namedtuple
+
+from schedule_grid import DEFAULT_COLOR, normalize_slot
+
+
+FORMAT_VERSION = 2
+
+Slot = namedtuple('Slot', 'task checked color')
+EMPTY_SLOT = Slot('', False, DEFAULT_COLOR)
+
+MINUTES_PER_DAY = 24 * 60
+
+# minute of the day -> "HH:MM", and back
+_TIMES = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(MINUTES_PER_DAY)]
+_MINUTES = {time: minute for minute, time in enumerate(_TIMES)}
+
+# Keys shaped like a time are slots; any other keys (form fields) are ignored
+_TIME_KEY_RE = re.compile(r'^\d{2}:\d{2}$')
+
+
+def _parse(stored):
+    if isinstance(stored, (str, bytes)):
+        try:
+            stored = json.loads(stored)
+        except json.JSONDecodeError:
+            return {}
+    return stored if isinstance(stored, dict) else {}
+
+
+def is_encoded(stored):
+    return isinstance(stored, dict) and 'v' in stored
+
+
+def decode(stored):
+    """Return `{"HH:MM": Slot}` for the non-empty slots of a stored schedule in any format.
+
+    Also accepts a JSON string, None, or an already decoded mapping.
+    """
+    stored = _parse(stored)
+    if 'v' not in stored:
+        slots = {}
+        for time, data in stored.items():
+            if time in _MINUTES:
+                slot = Slot(*normalize_slot(data))
+                if slot != EMPTY_SLOT:
+                    slots[time] = slot
+        return slots
+    if stored['v'] != FORMAT_VERSION:
+        raise ValueError(f"Unknown schedule encoding version {stored['v']!r}")
+
+    minutes = stored.get('m', ())
+    tasks = stored.get('t', ())
+    task_ids = stored.get('i') or range(len(minutes))
+    checked = int(stored.get('c', '0'), 16)
+    if 'p' not in stored:
+        return {_TIMES[minute]: Slot(tasks[task], bool(checked >> n & 1), DEFAULT_COLOR)
+                for n, (minute, task) in enumerate(zip(minutes, task_ids)) if 0 <= minute < MINUTES_PER_DAY}
+    colors = (DEFAULT_COLOR, *stored.get('k', ()))
+    return {_TIMES[minute]: Slot(tasks[task], bool(checked >> n & 1), colors[color])
+            for n, (minute, task, color) in enumerate(zip(minutes, task_ids, stored['p']))
+            if 0 <= minute < MINUTES_PER_DAY}
+
+
+def decode_days(entries):
+    """`{date: {"HH:MM": Slot}}` for a range of day entries, as the week and month views show them.
+
+    Days without an entry (None) are left out. Task and colour strings are
+    shared across the days, so a month of recurring tasks holds each one once.
+    """
+    strings = {}
+    days = {}
+    for entry in entries:
+        if entry is None:
+            continue
+        days[entry.date] = {
+            time: Slot(strings.setdefault(slot.task, slot.task), slot.checked,
+                       strings.setdefault(slot.color, slot.color))
+            for time, slot in decode(entry.schedule).items()
+        }
+    return days
+
+
+def encode(schedule):
+    """Return the version-2 form of a schedule given in any format (decoded, stored or legacy).
+
+    Raises ValueError for a slot time outside 00:00-23:59.
+    """
+    schedule = _parse(schedule)
+    if 'v' in schedule:
+        return schedule
+
+    minutes, task_ids, color_ids = [], [], []
+    tasks, colors = {}, {}
+    checked = 0
+    for time in sorted(schedule):
+        minute = _MINUTES.get(time)
+        if minute is None:
+            if _TIME_KEY_RE.match(time):
+                raise ValueError(f"Slot time {time!r} is not within the day")
+            continue
+        task, done, color = normalize_slot(schedule[time])
+        if not task and not done and color == DEFAULT_COLOR:
+            continue
+        if done:
+            checked |= 1 << len(minutes)
+        minutes.append(minute)
+        task_ids.append(tasks.setdefault(task, len(tasks)))
+        color_ids.append(0 if color == DEFAULT_COLOR else colors.setdefault(color, len(colors) + 1))
+
+    encoded = {'v': FORMAT_VERSION}
+    if minutes:
+        encoded['m'] = minutes
+        encoded['t'] = list(tasks)
+    if len(tasks) < len(minutes):
+        encoded['i'] = task_ids
+    if checked:
+        encoded['c'] = format(checked, 'x')
+    if colors:
+        encoded['k'] = list(colors)
+        encoded['p'] = color_ids
+    return encoded
+
+
+def dumps(schedule):
+    """Encode and serialize for a JSON/JSONB column."""
+    return json.dumps(encode(schedule), ensure_ascii=False, separators=(',', ':'))
+
+
+def merge_slots(stored, slots, replace=False):
+    """Encoded schedule with `slots` (`{time: slot}`) written over `stored`, or instead of it with `replace`."""
+    merged = {} if replace else decode(stored)
+    merged.update(slots)
+    return encode(merged)
+
+
+def patch_slot(stored, time, changes):
+    """Encoded schedule with some of task/checked/color changed in the slot at `time`."""
+    slots = decode(stored)
+    slots[time] = slots.get(time, EMPTY_SLOT)._replace(**changes)
+    return encode(slots)
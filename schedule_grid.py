@@ -0,0 +1,108 @@
+"""Slot grid shared by the web and desktop planners.
+
+A grid is the slot length in minutes plus the first and last hour of the
+day it covers. It is stored with each entry so a day keeps the layout it
+was planned in.
+"""
+import re
+from collections import namedtuple
+
+
+SLOT_MINUTE_CHOICES = (5, 10, 15, 20, 30, 60)
+DEFAULT_COLOR = '#ffffff'
+# Fields of a slot in the desktop/API shape, and their types
+SLOT_FIELDS = {'task': str, 'checked': bool, 'color': str}
+
+SLOT_TIME_RE = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+
+SlotGrid = namedtuple('SlotGrid', 'slot_minutes day_start day_end')
+
+DEFAULT_GRID = SlotGrid(30, 5, 24)
+
+
+def make_grid(slot_minutes=None, day_start=None, day_end=None, default=DEFAULT_GRID):
+    """Build a validated grid, falling back to `default` for missing values."""
+    slot_minutes = int(slot_minutes) if slot_minutes not in (None, '') else default.slot_minutes
+    day_start = int(day_start) if day_start not in (None, '') else default.day_start
+    day_end = int(day_end) if day_end not in (None, '') else default.day_end
+    if slot_minutes not in SLOT_MINUTE_CHOICES:
+        raise ValueError(f"slot_minutes must be one of {SLOT_MINUTE_CHOICES}, got {slot_minutes}")
+    if not 0 <= day_start < day_end <= 24:
+        raise ValueError(f"Invalid day range {day_start}-{day_end}")
+    return SlotGrid(slot_minutes, day_start, day_end)
+
+
+def grid_from_mapping(values, default=DEFAULT_GRID):
+    """Read a grid from a dict-like such as `request.form` or `request.args`."""
+    return make_grid(values.get('slot_minutes'), values.get('day_start'),
+                     values.get('day_end'), default=default)
+
+
+def grid_of(entry, default=DEFAULT_GRID):
+    if entry is None or entry.slot_minutes is None:
+        return default
+    return SlotGrid(entry.slot_minutes, entry.day_start, entry.day_end)
+
+
+def slot_minutes_of_hour(grid):
+    return list(range(0, 60, grid.slot_minutes))
+
+
+def slot_times(grid):
+    return [f"{hour:02d}:{minute:02d}"
+            for hour in range(grid.day_start, grid.day_end)
+            for minute in slot_minutes_of_hour(grid)]
+
+
+def is_slot_time(key):
+    return bool(SLOT_TIME_RE.match(key))
+
+
+def fits_grid(time, grid):
+    """Whether the slot time `time` starts one of `grid`'s slots."""
+    minutes = _minutes(time)
+    return grid.day_start * 60 <= minutes < grid.day_end * 60 and minutes % grid.slot_minutes == 0
+
+
+def normalize_slot(data):
+    """Return `(task, checked, color)` for any stored slot shape.
+
+    Handles the legacy web format (a plain task string), the desktop
+    format (`{task, checked, color}`) and decoded `schedule_codec.Slot`
+    tuples; anything else is an empty slot.
+    """
+    if isinstance(data, tuple):
+        return data
+    if isinstance(data, str):
+        return data, False, DEFAULT_COLOR
+    if isinstance(data, dict):
+        return data.get('task', ''), bool(data.get('checked', False)), data.get('color', DEFAULT_COLOR)
+    return '', False, DEFAULT_COLOR
+
+
+def _minutes(time):
+    hours, minutes = time.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def regrid_schedule(schedule, grid):
+    """Map `schedule` onto `grid`.
+
+    Each stored slot lands in the grid slot that contains its start time;
+    when several old slots fall into one new slot the first non-empty one
+    wins. Slots outside the grid's day range are dropped.
+    """
+    start = grid.day_start * 60
+    end = grid.day_end * 60
+    result = {}
+    for time in sorted(schedule):
+        if not is_slot_time(time):
+            continue
+        minutes = _minutes(time)
+        if not start <= minutes < end:
+            continue
+        aligned = minutes - minutes % grid.slot_minutes
+        key = f"{aligned // 60:02d}:{aligned % 60:02d}"
+        if key not in result or not normalize_slot(result[key])[0]:
+            result[key] = schedule[time]
+    return result
@@ -0,0 +1,208 @@
+"""Qt model/view pieces for the desktop schedule grid.
+
+Only the rows a QTableView actually shows are painted, and an editor combo
+exists only for the cell being edited, so fine grids stay cheap.
+"""
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QComboBox, QStyledItemDelegate
+
+from schedule_codec import EMPTY_SLOT, Slot, decode
+from schedule_grid import DEFAULT_COLOR, DEFAULT_GRID, grid_of, regrid_schedule, slot_times
+
+
+class ScheduleModel(QAbstractTableModel):
+    DONE, TIME, TASK, COLOR = range(4)
+    HEADERS = ('Done', 'Time', 'Task', 'Color')
+
+    def __init__(self, grid=DEFAULT_GRID, parent=None):
+        super().__init__(parent)
+        self.grid = grid
+        self.times = slot_times(grid)
+        self.tasks = [''] * len(self.times)
+        self.checked = [False] * len(self.times)
+        self.colors = [DEFAULT_COLOR] * len(self.times)
+        self.dirty_rows = set()
+        self.replace_all = False
+
+    def load(self, grid, schedule):
+        """Replace the whole day with `schedule`, in any stored format, laid out on `grid`."""
+        self.beginResetModel()
+        self.grid = grid
+        self.times = slot_times(grid)
+        stored = regrid_schedule(decode(schedule), grid)
+        slots = [stored.get(time, EMPTY_SLOT) for time in self.times]
+        self.tasks = [task for task, _, _ in slots]
+        self.checked = [checked for _, checked, _ in slots]
+        self.colors = [color for _, _, color in slots]
+        self.dirty_rows = set()
+        self.replace_all = False
+        self.endResetModel()
+
+    def set_grid(self, grid):
+        if grid != self.grid:
+            self.load(grid, self.to_schedule())
+            # Slot keys changed, so the stored schedule has to be rewritten
+            self.replace_all = True
+
+    def _slot(self, row):
+        return Slot(self.tasks[row], self.checked[row], self.colors[row])
+
+    def take_changes(self):
+        """Return `(slots, replace)` edited since the last call and reset tracking.
+
+        `slots` maps times to full Slot tuples; with `replace` it is the whole
+        day and should overwrite what is stored.
+        """
+        if self.replace_all:
+            changes = self.to_schedule(), True
+        else:
+            changes = {self.times[row]: self._slot(row) for row in sorted(self.dirty_rows)}, False
+        self.dirty_rows = set()
+        self.replace_all = False
+        return changes
+
+    def to_schedule(self):
+        return {time: self._slot(row) for row, time in enumerate(self.times)}
+
+    def task_map(self):
+        return dict(zip(self.times, self.tasks))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.times)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.DONE:
+            flags |= Qt.ItemIsUserCheckable
+        elif index.column() == self.TASK:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if column == self.DONE and role == Qt.CheckStateRole:
+            return Qt.Checked if self.checked[row] else Qt.Unchecked
+        if column == self.TIME and role == Qt.DisplayRole:
+            return self.times[row]
+        if column == self.TASK and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.tasks[row]
+        if column in (self.TASK, self.COLOR) and role == Qt.BackgroundRole:
+            return QColor(self.colors[row])
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid():
+            return False
+        row, column = index.row(), index.column()
+        if column == self.DONE and role == Qt.CheckStateRole:
+            self.checked[row] = value == Qt.Checked
+        elif column == self.TASK and role == Qt.EditRole:
+            if self.tasks[row] == value:
+                return False
+            self.tasks[row] = value
+        elif column == self.COLOR and role == Qt.EditRole:
+            self.colors[row] = value
+            self.dirty_rows.add(row)
+            index = self.index(row, self.TASK)
+            self.dataChanged.emit(index, self.index(row, self.COLOR))
+            return True
+        else:
+            return False
+        self.dirty_rows.add(row)
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class RangeModel(QAbstractTableModel):
+    """Read-only overview of several days for the week and month views.
+
+    Columns are days and rows whole hours covering every shown day's grid;
+    a cell lists the tasks that start in that hour. Cell text is built once
+    in load(), so painting stays cheap.
+    """
+
+    def __init__(self, default_grid=DEFAULT_GRID, parent=None):
+        super().__init__(parent)
+        self.default_grid = default_grid
+        self.dates = []
+        self.hours = []
+        self.cells = {}
+
+    def load(self, days, slots):
+        """Show `days` (`(date, entry or None)` pairs) with their decoded `slots` (`{date: {time: Slot}}`)."""
+        self.beginResetModel()
+        self.dates = [day for day, _ in days]
+        grids = [grid_of(entry, self.default_grid) for _, entry in days if entry] or [self.default_grid]
+        first = min(grid.day_start for grid in grids)
+        self.hours = list(range(first, max(grid.day_end for grid in grids)))
+        self.cells = {}
+        for column, day in enumerate(self.dates):
+            for time, slot in sorted(slots.get(day, {}).items()):
+                row = int(time[:2]) - first
+                if 0 <= row < len(self.hours):
+                    self.cells.setdefault((row, column), []).append((time, slot))
+        self.endResetModel()
+
+    def date_at(self, column):
+        return self.dates[column]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.hours)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.dates)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.dates[section].strftime('%a %d')
+        return f"{self.hours[section]:02d}:00"
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        slots = self.cells.get((index.row(), index.column()))
+        if not slots:
+            return None
+        if role == Qt.DisplayRole:
+            return "\n".join(("✓ " if slot.checked else "") + slot.task for _, slot in slots)
+        if role == Qt.ToolTipRole:
+            return "\n".join(f"{time} {slot.task}" for time, slot in slots)
+        if role == Qt.BackgroundRole:
+            colors = [slot.color for _, slot in slots if slot.color != DEFAULT_COLOR]
+            return QColor(colors[0]) if colors else None
+        return None
+
+
+class TaskDelegate(QStyledItemDelegate):
+    """Editable combo over the shared task list, created only while editing."""
+
+    def __init__(self, task_model, parent=None):
+        super().__init__(parent)
+        self.task_model = task_model
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.setEditable(True)
+        combo.setModel(self.task_model)
+        combo.setInsertPolicy(QComboBox.NoInsert)
+        return combo
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentIndex(-1)
+        editor.setEditText(index.data(Qt.EditRole) or '')
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
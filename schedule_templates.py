@@ -0,0 +1,150 @@
+"""Named schedule templates and recurring application onto days.
+
+A template is a day's schedule and slot grid saved under a name, stored in
+the compact encoding like entries (see schedule_codec). Applying one over a
+recurrence (a date range, optionally limited to some weekdays and to every
+Nth day) writes all target days in a single INSERT ... SELECT ... ON
+CONFLICT statement: the dates are generated in SQL, so planning a quarter is
+one round trip whatever its length.
+
+Days without an entry get the template's schedule and grid. Days that have
+one get them too, replacing their slots, unless `merge` is set, in which
+case they keep their own slots and grid and only take the template's slots
+where theirs are empty (timeboxing_merge_schedules, migration 11).
+Priorities and brain dumps are never touched.
+"""
+from collections import namedtuple
+
+import schedule_codec
+from schedule_grid import DEFAULT_GRID
+from timeboxing_db import ENTRY_COLUMNS, DayEntry, as_date
+
+
+MAX_NAME_LENGTH = 100
+MAX_APPLY_DAYS = 366
+
+Template = namedtuple('Template', 'id name schedule slot_minutes day_start day_end updated_at')
+
+# weekdays: None for every day, else Monday=0 .. Sunday=6; every: step in days from start
+Recurrence = namedtuple('Recurrence', 'start end weekdays every')
+
+TEMPLATE_COLUMNS = "id, name, schedule, slot_minutes, day_start, day_end, updated_at"
+
+UPSERT_TEMPLATE_SQL = f"""
+    INSERT INTO timeboxing_template (user_id, name, schedule, slot_minutes, day_start, day_end)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (user_id, name) DO UPDATE
+    SET schedule = EXCLUDED.schedule,
+        slot_minutes = EXCLUDED.slot_minutes,
+        day_start = EXCLUDED.day_start,
+        day_end = EXCLUDED.day_end,
+        updated_at = now()
+    RETURNING {TEMPLATE_COLUMNS}
+"""
+
+SELECT_TEMPLATES_SQL = f"SELECT {TEMPLATE_COLUMNS} FROM timeboxing_template WHERE user_id = %s ORDER BY name"
+
+SELECT_TEMPLATE_SQL = f"SELECT {TEMPLATE_COLUMNS} FROM timeboxing_template WHERE user_id = %s AND name = %s"
+
+DELETE_TEMPLATE_SQL = "DELETE FROM timeboxing_template WHERE user_id = %s AND name = %s RETURNING id"
+
+APPLY_TEMPLATE_SQL = f"""
+    INSERT INTO timeboxing_entry AS e (user_id, date, schedule, slot_minutes, day_start, day_end)
+    SELECT t.user_id, d.day::date, t.schedule, t.slot_minutes, t.day_start, t.day_end
+    FROM timeboxing_template t
+    CROSS JOIN generate_series(%(start)s::date, %(end)s::date, make_interval(days => %(every)s)) AS d (day)
+    WHERE t.user_id = %(user_id)s AND t.name = %(name)s
+      AND (%(weekdays)s::int[] IS NULL OR EXTRACT(ISODOW FROM d.day)::int - 1 = ANY (%(weekdays)s::int[]))
+    ON CONFLICT (user_id, date) DO UPDATE
+    SET schedule = CASE WHEN %(merge)s THEN timeboxing_merge_schedules(e.schedule, EXCLUDED.schedule)
+                        ELSE EXCLUDED.schedule END,
+        slot_minutes = CASE WHEN %(merge)s THEN COALESCE(e.slot_minutes, EXCLUDED.slot_minutes)
+                            ELSE EXCLUDED.slot_minutes END,
+        day_start = CASE WHEN %(merge)s THEN COALESCE(e.day_start, EXCLUDED.day_start)
+                         ELSE EXCLUDED.day_start END,
+        day_end = CASE WHEN %(merge)s THEN COALESCE(e.day_end, EXCLUDED.day_end)
+                       ELSE EXCLUDED.day_end END
+    RETURNING {ENTRY_COLUMNS}
+"""
+
+
+class TemplateNotFound(LookupError):
+    """No template of that name for the user."""
+
+
+def clean_name(name):
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("Template name must not be empty")
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f"Template name must be at most {MAX_NAME_LENGTH} characters")
+    return name
+
+
+def make_recurrence(start, end=None, weekdays=None, every=1):
+    """Build a validated recurrence; `end` defaults to `start` and `weekdays` to every day.
+
+    `weekdays` may be given as numbers (Monday=0) or their strings, as they
+    come from a form.
+    """
+    if start in (None, ''):
+        raise ValueError("A start date is required")
+    start = as_date(start)
+    end = as_date(end) if end not in (None, '') else start
+    every = int(every) if every not in (None, '') else 1
+    if not weekdays:
+        weekdays = None
+    else:
+        weekdays = sorted({int(day) for day in weekdays})
+        if not all(0 <= day <= 6 for day in weekdays):
+            raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+    if end < start:
+        raise ValueError("The range must not end before it starts")
+    if (end - start).days >= MAX_APPLY_DAYS:
+        raise ValueError(f"The range must be at most {MAX_APPLY_DAYS} days")
+    if every < 1:
+        raise ValueError("every must be at least 1")
+    return Recurrence(start, end, weekdays, every)
+
+
+def save_template(cursor, user_id, name, schedule, grid=None):
+    """Create or replace `user_id`'s template `name` and return it."""
+    grid = grid or DEFAULT_GRID
+    cursor.execute(UPSERT_TEMPLATE_SQL, (user_id, clean_name(name), schedule_codec.dumps(schedule),
+                                         grid.slot_minutes, grid.day_start, grid.day_end))
+    return Template(*cursor.fetchone())
+
+
+def fetch_templates(cursor, user_id):
+    cursor.execute(SELECT_TEMPLATES_SQL, (user_id,))
+    return [Template(*row) for row in cursor.fetchall()]
+
+
+def fetch_template(cursor, user_id, name):
+    cursor.execute(SELECT_TEMPLATE_SQL, (user_id, name))
+    row = cursor.fetchone()
+    if row is None:
+        raise TemplateNotFound(f"No template named {name!r}")
+    return Template(*row)
+
+
+def delete_template(cursor, user_id, name):
+    cursor.execute(DELETE_TEMPLATE_SQL, (user_id, name))
+    if cursor.fetchone() is None:
+        raise TemplateNotFound(f"No template named {name!r}")
+
+
+def apply_template(cursor, user_id, name, recurrence, merge=False):
+    """Write template `name` onto every day of `recurrence` and return the stored entries.
+
+    Raises TemplateNotFound if there is no such template.
+    """
+    cursor.execute(APPLY_TEMPLATE_SQL, {
+        'user_id': user_id, 'name': name, 'start': recurrence.start, 'end': recurrence.end,
+        'weekdays': recurrence.weekdays, 'every': recurrence.every, 'merge': bool(merge),
+    })
+    entries = [DayEntry(*row) for row in cursor.fetchall()]
+    if not entries:
+        # Nothing written: either no day matched or the template is missing
+        fetch_template(cursor, user_id, name)
+    return entries
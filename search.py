@@ -0,0 +1,95 @@
+"""Full-text search over priorities, brain dumps and slot tasks.
+
+On Postgres this uses the generated `search_vector` column and its GIN
+index (migration 7) and lets `ts_headline` build the snippets. SQLite has
+no tsvector, so there we fall back to LIKE filtering with ranking and
+snippets done in Python.
+"""
+import html
+import re
+import sqlite3
+from collections import namedtuple
+
+from schedule_codec import decode
+
+
+SEARCH_LIMIT = 50
+SNIPPET_RADIUS = 60
+
+# Snippets come back with private-use characters around each match, so
+# callers can escape the text first and then add their own highlighting
+_START, _STOP = '\ue000', '\ue001'
+
+SearchResult = namedtuple('SearchResult', 'date rank snippet')
+
+SEARCH_SQL = f"""
+    SELECT date, rank,
+           ts_headline('english',
+                       concat_ws(' … ', top_priorities, brain_dump, timeboxing_schedule_text(schedule)),
+                       query, 'StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=20, MinWords=5')
+    FROM (
+        SELECT date, top_priorities, brain_dump, schedule, query,
+               ts_rank(search_vector, query) AS rank
+        FROM timeboxing_entry, websearch_to_tsquery('english', %s) AS query
+        WHERE user_id = %s AND search_vector @@ query
+        ORDER BY rank DESC, date DESC
+        LIMIT %s
+    ) best
+    ORDER BY rank DESC, date DESC
+"""
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags."""
+    return html.escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def plain(snippet):
+    return snippet.replace(_START, '').replace(_STOP, '')
+
+
+def schedule_text(schedule):
+    return ' '.join(slot.task for slot in decode(schedule).values() if slot.task)
+
+
+def search_entries(cursor, user_id, query, limit=SEARCH_LIMIT):
+    """Return up to `limit` of `user_id`'s entries matching `query`, best match first.
+
+    Snippets carry match markers; pass them through `highlight` or `plain`.
+    """
+    if not query.strip():
+        return []
+    if isinstance(cursor, sqlite3.Cursor):
+        return _search_sqlite(cursor, user_id, query, limit)
+    cursor.execute(SEARCH_SQL, (query, user_id, limit))
+    return [SearchResult(*row) for row in cursor.fetchall()]
+
+
+def _search_sqlite(cursor, user_id, query, limit):
+    terms = [term.lower() for term in re.findall(r'\w+', query)]
+    if not terms:
+        return []
+    condition = " AND ".join(
+        "(top_priorities LIKE ? OR brain_dump LIKE ? OR schedule LIKE ?)" for _ in terms)
+    params = [user_id] + [f"%{term}%" for term in terms for _ in range(3)]
+    cursor.execute(f"SELECT date, top_priorities, brain_dump, schedule FROM timeboxing_entry "
+                   f"WHERE user_id = ? AND {condition}", params)
+
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    results = []
+    for date, top_priorities, brain_dump, schedule in cursor.fetchall():
+        # The LIKE on raw JSON can match keys or colors; check the real text
+        text = ' … '.join(part for part in (top_priorities, brain_dump, schedule_text(schedule)) if part)
+        lowered = text.lower()
+        if not all(term in lowered for term in terms):
+            continue
+        # Priorities and tasks count double, like the 'A' weight on Postgres
+        weighted = f"{top_priorities or ''} {schedule_text(schedule)}".lower()
+        rank = sum(lowered.count(term) + weighted.count(term) for term in terms)
+        match = pattern.search(text)
+        start = max(match.start() - SNIPPET_RADIUS, 0)
+        snippet = pattern.sub(lambda m: f"{_START}{m.group(0)}{_STOP}",
+                              text[start:match.end() + SNIPPET_RADIUS])
+        results.append(SearchResult(date, float(rank), snippet))
+    results.sort(key=lambda result: (result.rank, str(result.date)), reverse=True)
+    return results[:limit]
@@ -0,0 +1,46 @@
+"""Fixtures for the tests that need Postgres.
+
+Set TEST_DATABASE_URL (a postgresql:// URI) to a disposable database; the
+tests migrate and write to it. Without it those tests are skipped. Each
+test works as its own user, so runs do not see each other's days.
+"""
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+from migrations import migrate
+
+
+@pytest.fixture(scope='session')
+def database_url():
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip("Set TEST_DATABASE_URL to run the tests that need Postgres")
+    conn = psycopg2.connect(url)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+    return url
+
+
+@pytest.fixture
+def user_id():
+    return f"test-{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture(scope='session')
+def web(database_url):
+    # Flask-SQLAlchemy builds its engine from the config at import time
+    os.environ['DATABASE_URL'] = database_url
+    import app as web_app
+    return web_app
+
+
+@pytest.fixture
+def client(web, user_id):
+    client = web.app.test_client()
+    client.environ_base['REMOTE_USER'] = user_id
+    return client
@@ -0,0 +1,97 @@
+from datetime import time
+
+import pytest
+
+from alerts import END_SOON, SECONDS_PER_DAY, START, AlertEngine, AlertEvent, seconds_since_midnight
+
+
+def at(clock):
+    hours, minutes = clock.split(':')
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+def test_seconds_since_midnight():
+    assert seconds_since_midnight(time(0, 0)) == 0
+    assert seconds_since_midnight(time(9, 30, 15)) == at('09:30') + 15
+    assert seconds_since_midnight(time(23, 59, 59)) == SECONDS_PER_DAY - 1
+
+
+def test_consecutive_slots_of_a_task_alert_as_one_block():
+    engine = AlertEngine(start_lead_minutes=0, end_lead_minutes=5, slot_minutes=30)
+    engine.rebuild({'09:00': 'Focus', '09:30': 'Focus', '10:00': 'Email', '11:00': 'Focus', '12:00': '  '})
+    assert engine.events == [
+        AlertEvent(at('09:00'), START, 'Focus'),
+        AlertEvent(at('09:55'), END_SOON, 'Focus'),
+        AlertEvent(at('10:00'), START, 'Email'),
+        AlertEvent(at('10:25'), END_SOON, 'Email'),
+        AlertEvent(at('11:00'), START, 'Focus'),
+        AlertEvent(at('11:25'), END_SOON, 'Focus'),
+    ]
+
+
+def test_lead_times_and_slot_length():
+    engine = AlertEngine(start_lead_minutes=10, end_lead_minutes=20, slot_minutes=15)
+    engine.rebuild({'00:05': 'Early', '08:00': 'Short'})
+    # Start alerts never go before midnight, end alerts never before the start
+    assert engine.events == [
+        AlertEvent(0, START, 'Early'),
+        AlertEvent(at('00:05'), END_SOON, 'Early'),
+        AlertEvent(at('07:50'), START, 'Short'),
+        AlertEvent(at('08:00'), END_SOON, 'Short'),
+    ]
+
+
+def test_pop_due_fires_each_event_once():
+    engine = AlertEngine(slot_minutes=30)
+    engine.rebuild({'09:00': 'A', '10:00': 'B'}, now=at('08:00'))
+    assert engine.pop_due(at('08:59')) == []
+    assert engine.pop_due(at('09:00')) == [AlertEvent(at('09:00'), START, 'A')]
+    assert engine.pop_due(at('09:01')) == []
+    assert [event.task for event in engine.pop_due(at('10:00'))] == ['A', 'B']
+
+
+def test_rebuild_skips_past_events():
+    engine = AlertEngine(slot_minutes=30)
+    engine.rebuild({'09:00': 'A', '10:00': 'B'}, now=at('09:30'))
+    assert engine.next_event() == AlertEvent(at('10:00'), START, 'B')
+    assert [event.task for event in engine.pop_due(at('10:00'))] == ['B']
+
+
+def test_disabled_kinds_are_skipped():
+    engine = AlertEngine(slot_minutes=30, enabled=(END_SOON,))
+    engine.rebuild({'09:00': 'A'})
+    assert engine.next_event().kind == END_SOON
+    assert [event.kind for event in engine.pop_due(at('12:00'))] == [END_SOON]
+
+
+def test_seconds_until_next():
+    engine = AlertEngine(slot_minutes=30)
+    engine.rebuild({'09:00': 'A'}, now=at('08:00'))
+    assert engine.seconds_until_next(at('08:00')) == 3600
+    engine.pop_due(at('23:00'))
+    assert engine.seconds_until_next(at('23:00')) == 3600
+
+
+def test_new_day_starts_over():
+    engine = AlertEngine(slot_minutes=30)
+    engine.rebuild({'09:00': 'A'})
+    assert len(engine.pop_due(at('23:00'))) == 2
+    assert engine.pop_due(at('09:00')) == [AlertEvent(at('09:00'), START, 'A')]
+
+
+def test_desktop_app_feeds_the_engine_plain_seconds(tmp_path, monkeypatch):
+    # The app reads the clock as a QTime; the engine must only ever see seconds
+    monkeypatch.setenv('QT_QPA_PLATFORM', 'offscreen')
+    monkeypatch.setenv('LOCAL_STORE', str(tmp_path / 'store.sqlite'))
+    monkeypatch.setenv('DB_HOST', str(tmp_path))  # No server: the app stays offline
+    timeboxing_app = pytest.importorskip('timeboxing_app', exc_type=ImportError)
+    app = timeboxing_app.QApplication.instance() or timeboxing_app.QApplication([])
+    window = timeboxing_app.TimeboxingApp()
+    try:
+        window.alert_engine.enabled = {START, END_SOON}
+        window.rebuild_alerts()
+        window.check_alerts()
+        assert window.alert_timer.isActive()
+    finally:
+        window.close()
+        app.processEvents()
@@ -0,0 +1,154 @@
+import json
+
+import pytest
+
+from schedule_grid import fits_grid, is_slot_time, make_grid
+
+
+DAY = '2031-05-06'
+
+
+def patch(client, slot, **body):
+    return client.patch(f'/api/entries/{DAY}/slots/{slot}', json=body)
+
+
+def get_day(client):
+    return client.get(f'/api/entries?from={DAY}&to={DAY}').get_json()['entries']
+
+
+@pytest.mark.parametrize('key, valid', [
+    ('00:00', True), ('09:30', True), ('23:59', True),
+    ('24:00', False), ('25:00', False), ('09:60', False), ('9:30', False), ('date', False),
+])
+def test_is_slot_time(key, valid):
+    assert is_slot_time(key) is valid
+
+
+def test_fits_grid():
+    grid = make_grid(15, 8, 18)
+    assert fits_grid('08:00', grid) and fits_grid('17:45', grid)
+    assert not fits_grid('09:07', grid)
+    assert not fits_grid('07:45', grid) and not fits_grid('18:00', grid)
+
+
+def test_patch_creates_and_updates_slot(client):
+    response = patch(client, '09:00', task='Standup')
+    assert response.status_code == 200
+    assert response.get_json()['revision'] == 1
+    assert response.get_json()['schedule']['09:00']['task'] == 'Standup'
+
+    response = patch(client, '09:00', checked=True, revision=1)
+    assert response.status_code == 200
+    slot = response.get_json()['schedule']['09:00']
+    assert (slot['task'], slot['checked'], response.get_json()['revision']) == ('Standup', True, 2)
+
+
+def test_patch_with_stale_revision_conflicts(client):
+    assert patch(client, '09:00', task='Mine').status_code == 200
+    assert patch(client, '09:00', task='Theirs', revision=1).status_code == 200
+
+    response = patch(client, '09:00', task='Stale', revision=1)
+    assert response.status_code == 409
+    [entry] = get_day(client)
+    assert (entry['schedule']['09:00']['task'], entry['revision']) == ('Theirs', 2)
+
+
+@pytest.mark.parametrize('slot', ['25:00', '24:30', '09:60'])
+def test_patch_rejects_times_outside_the_day(client, slot):
+    assert patch(client, slot, task='Late').status_code == 404
+    assert get_day(client) == []
+
+
+@pytest.mark.parametrize('slot', ['09:07', '04:30'])
+def test_patch_rejects_slots_off_the_grid(client, slot):
+    # Default grid: 30-minute slots from 05:00
+    response = patch(client, slot, task='Off grid')
+    assert response.status_code == 400
+    assert get_day(client) == []
+
+
+def test_patch_follows_the_entrys_own_grid(client):
+    client.post('/api/entries:batch', json={'entries': [
+        {'date': DAY, 'schedule': {}, 'slot_minutes': 15, 'day_start': 8, 'day_end': 18},
+    ]})
+    assert patch(client, '09:15', task='Quarter').status_code == 200
+    assert patch(client, '09:20', task='Off').status_code == 400
+
+
+@pytest.mark.parametrize('revision', ['1', 1.5, True, [1]])
+def test_patch_rejects_non_integer_revision(client, revision):
+    assert patch(client, '09:00', task='x', revision=revision).status_code == 400
+    assert get_day(client) == []
+
+
+@pytest.mark.parametrize('body', [{}, {'task': 5}, {'checked': 'yes'}, {'unknown': 'x'}])
+def test_patch_rejects_bad_fields(client, body):
+    assert patch(client, '09:00', **body).status_code == 400
+
+
+@pytest.mark.parametrize('schedule', [{'24:30': 'late'}, {'09:00': {'task': 5}}])
+def test_batch_upsert_rejects_bad_schedules(client, schedule):
+    response = client.post('/api/entries:batch', json={'entries': [{'date': DAY, 'schedule': schedule}]})
+    assert response.status_code == 400
+    assert get_day(client) == []
+
+
+def test_import_rejects_bad_schedules(client):
+    line = '{"date": "%s", "schedule": {"24:30": "late"}}\n' % DAY
+    response = client.post('/import?format=ndjson', data=line.encode())
+    assert response.status_code == 400
+    assert get_day(client) == []
+    assert client.get(f'/?date={DAY}').status_code == 200
+
+
+@pytest.mark.parametrize('query', ['period=fortnight', 'from=2031-13-01', 'to=soon'])
+def test_stats_rejects_bad_parameters(client, query):
+    assert client.get(f'/stats?{query}').status_code == 400
+    assert client.get(f'/api/stats?{query}').status_code == 400
+
+
+@pytest.mark.parametrize('before', ['bad', '2031-02-30'])
+def test_history_rejects_bad_cursor(client, before):
+    assert client.get(f'/history?before={before}').status_code == 400
+
+
+def test_history_pages_before_cursor(client):
+    assert patch(client, '09:00', task='Standup').status_code == 200
+    assert DAY in client.get('/history?before=2031-05-07').get_data(as_text=True)
+    assert DAY not in client.get(f'/history?before={DAY}').get_data(as_text=True)
+
+
+@pytest.mark.parametrize('grid', [{'slot_minutes': '7'}, {'slot_minutes': 'x'}, {'day_start': '18', 'day_end': '8'}])
+def test_planner_rejects_bad_grids(client, grid):
+    form = {'date': DAY, 'top_priorities': '', 'brain_dump': '', '09:00': 'Standup', **grid}
+    assert client.post('/', data=form).status_code == 400
+    assert get_day(client) == []
+    assert client.get('/', query_string={'date': DAY, **grid}).status_code == 400
+
+
+@pytest.mark.parametrize('query', ['from=bad', 'to=2031-02-30', 'from=2031-05-01&to=soon'])
+def test_export_rejects_bad_dates(client, query):
+    assert client.get(f'/export?{query}').status_code == 400
+
+
+def test_export_between_dates(client):
+    assert patch(client, '09:00', task='Standup').status_code == 200
+    response = client.get(f'/export?from={DAY}&to={DAY}')
+    assert response.status_code == 200
+    assert [line['date'] for line in map(json.loads, response.get_data(as_text=True).splitlines())] == [DAY]
+
+
+@pytest.mark.parametrize('day', ['garbage', '2031-02-30'])
+def test_planner_rejects_bad_dates(client, day):
+    assert client.get('/', query_string={'date': day}).status_code == 400
+    form = {'date': day, 'top_priorities': '', 'brain_dump': '', '09:00': 'Standup'}
+    assert client.post('/', data=form).status_code == 400
+
+
+@pytest.mark.parametrize('limit, found', [('-1', 1), ('0', 1), ('500', 2), ('abc', 2)])
+def test_search_clamps_limit(client, limit, found):
+    assert patch(client, '09:00', task='Standup').status_code == 200
+    client.patch('/api/entries/2031-05-07/slots/09:00', json={'task': 'Standup'})
+    response = client.get('/api/search', query_string={'q': 'standup', 'limit': limit})
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == found
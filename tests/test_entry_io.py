@@ -0,0 +1,67 @@
+import json
+from datetime import date
+
+import pytest
+
+import entry_io
+import schedule_codec
+
+
+def record(schedule, **fields):
+    return {'date': '2031-05-06', 'schedule': schedule, **fields}
+
+
+@pytest.mark.parametrize('schedule', [
+    None,
+    '',
+    {},
+    {'09:00': 'Legacy task'},
+    {'09:00': {'task': 'Desk', 'checked': True, 'color': '#ffcc00'}, '23:30': {'task': 'Late'}},
+    json.dumps({'09:00': {'task': 'From CSV'}}),
+    schedule_codec.encode({'09:00': 'Encoded'}),
+])
+def test_record_to_row_accepts_valid_schedules(schedule):
+    day, top_priorities, brain_dump, slots, grid = entry_io.record_to_row(record(schedule))
+    assert day == date(2031, 5, 6)
+    assert slots == entry_io.normalize_schedule(entry_io.validate_schedule(schedule))
+    assert all(isinstance(slot['task'], str) for slot in slots.values())
+
+
+@pytest.mark.parametrize('schedule', [
+    {'24:30': 'late'},
+    {'25:00': {'task': 'x'}},
+    {'09:60': 'x'},
+    {'date': 'x'},
+    {'09:00': {'task': 5}},
+    {'09:00': {'task': 'x', 'checked': 'yes'}},
+    {'09:00': {'task': 'x', 'color': 0}},
+    {'09:00': 5},
+    ['09:00'],
+    'not json',
+    {'v': 2, 'm': [540], 't': []},
+    {'v': 2, 'm': [540], 't': [5]},
+])
+def test_record_to_row_rejects_bad_schedules(schedule):
+    with pytest.raises(ValueError):
+        entry_io.record_to_row(record(schedule))
+
+
+def test_record_to_row_rejects_bad_grid_and_date():
+    with pytest.raises(ValueError):
+        entry_io.record_to_row(record({}, slot_minutes=7))
+    with pytest.raises(ValueError):
+        entry_io.record_to_row({'date': '2031-13-01'})
+    with pytest.raises(KeyError):
+        entry_io.record_to_row({'schedule': {}})
+
+
+def test_parse_round_trips_exported_records():
+    entry = {'date': '2031-05-06', 'top_priorities': 'p', 'brain_dump': 'b',
+             'schedule': {'09:00': {'task': 'x', 'checked': False, 'color': '#ffffff'}},
+             'slot_minutes': 15, 'day_start': 6, 'day_end': 20}
+    [ndjson_row] = entry_io.parse([json.dumps(entry) + '\n'], 'ndjson')
+    csv_lines = ['date,top_priorities,brain_dump,schedule,slot_minutes,day_start,day_end\n',
+                 '2031-05-06,p,b,"{""09:00"": {""task"": ""x""}}",15,6,20\n']
+    [csv_row] = entry_io.parse(csv_lines, 'csv')
+    assert ndjson_row == csv_row
+    assert ndjson_row[3] == entry['schedule']
@@ -0,0 +1,138 @@
+from datetime import date
+
+import pytest
+
+from local_store import LocalStore, Synchronizer
+from schedule_codec import Slot, decode
+from schedule_grid import DEFAULT_GRID
+from timeboxing_db import EntryRepository, fetch_entries_between
+
+
+DAY = date(2031, 6, 2)
+
+
+def change(task, top_priorities=''):
+    return {DAY: {'top_priorities': top_priorities, 'brain_dump': '', 'slots': {'09:00': Slot(task, False, '#ffffff')},
+                  'grid': DEFAULT_GRID, 'replace': False}}
+
+
+def task_of(entry):
+    return decode(entry.schedule)['09:00'].task
+
+
+@pytest.fixture
+def computer(database_url, user_id, tmp_path):
+    """Builds a LocalStore and its Synchronizer, as one desktop install of the test user."""
+    opened = []
+
+    def build(name):
+        store = LocalStore(str(tmp_path / f'{name}.sqlite3'), user_id=user_id)
+        sync = Synchronizer(store, lambda: EntryRepository(dsn=database_url, user_id=user_id))
+        opened.append((store, sync))
+        return store, sync
+
+    yield build
+    for store, sync in opened:
+        sync.close()
+        store.close()
+
+
+def server_entry(sync):
+    with sync.repository.cursor() as cursor:
+        [entry] = fetch_entries_between(cursor, sync.store.user_id, DAY, DAY)
+    return entry
+
+
+def test_saves_offline_until_pushed(tmp_path):
+    store = LocalStore(str(tmp_path / 'local.sqlite3'), user_id='offline')
+    try:
+        [saved] = store.save_changes(change('Draft'))
+        store.save_changes(change('Draft 2'))
+        assert (task_of(saved), saved.revision) == ('Draft', 0)
+        assert store.pending_count() == 1
+        [(entry, edits)] = store.pending()
+        assert (task_of(entry), edits) == ('Draft 2', 2)
+    finally:
+        store.close()
+
+
+def test_push_then_pull_on_another_computer(computer):
+    laptop, laptop_sync = computer('laptop')
+    laptop.save_changes(change('Write report'))
+    result = laptop_sync.sync()
+    assert (result.pushed, result.conflicts, result.pending) == (1, [], 0)
+    assert laptop.load_range(DAY, DAY)[0].revision == 1
+    assert task_of(server_entry(laptop_sync)) == 'Write report'
+
+    desktop, desktop_sync = computer('desktop')
+    result = desktop_sync.sync()
+    assert (result.pushed, result.changed) == (0, [DAY])
+    assert task_of(desktop.load_entry(DAY)) == 'Write report'
+    # Nothing new the second time
+    assert desktop_sync.sync().changed == []
+
+
+def test_edits_on_both_sides_conflict(computer):
+    laptop, laptop_sync = computer('laptop')
+    desktop, desktop_sync = computer('desktop')
+    laptop.save_changes(change('Base'))
+    laptop_sync.sync()
+    desktop_sync.sync()
+
+    laptop.save_changes(change('From laptop'))
+    desktop.save_changes(change('From desktop'))
+    assert laptop_sync.sync().pushed == 1
+    result = desktop_sync.sync()
+    assert (result.pushed, result.conflicts, result.pending) == (0, [DAY], 1)
+    # The conflict is kept out of the push until it is resolved
+    assert desktop.pending() == []
+    [conflict] = desktop.conflicts()
+    assert (task_of(conflict.local), task_of(conflict.remote)) == ('From desktop', 'From laptop')
+    assert task_of(server_entry(desktop_sync)) == 'From laptop'
+
+
+@pytest.mark.parametrize('keep_local, winner', [(True, 'From desktop'), (False, 'From laptop')])
+def test_resolving_a_conflict(computer, keep_local, winner):
+    laptop, laptop_sync = computer('laptop')
+    desktop, desktop_sync = computer('desktop')
+    laptop.save_changes(change('Base'))
+    laptop_sync.sync()
+    desktop_sync.sync()
+    laptop.save_changes(change('From laptop'))
+    desktop.save_changes(change('From desktop'))
+    laptop_sync.sync()
+    desktop_sync.sync()
+
+    assert task_of(desktop.resolve(DAY, keep_local)) == winner
+    result = desktop_sync.sync()
+    assert (result.pushed, result.conflicts, result.pending) == (int(keep_local), [], 0)
+    assert task_of(server_entry(desktop_sync)) == winner
+    laptop_sync.sync()
+    assert task_of(laptop.load_range(DAY, DAY)[0]) == winner
+
+
+def test_pulled_days_are_searchable(computer):
+    laptop, laptop_sync = computer('laptop')
+    laptop.save_changes(change('Café planning'))
+    laptop_sync.sync()
+
+    desktop, desktop_sync = computer('desktop')
+    desktop_sync.sync()
+    assert [result.date for result in desktop.search('café')] == [DAY.isoformat()]
+
+
+def test_upgrade_unescapes_pulled_schedules(tmp_path):
+    path = str(tmp_path / 'local.sqlite3')
+    store = LocalStore(path, user_id='offline')
+    with store.cursor() as cursor:
+        cursor.execute("INSERT INTO timeboxing_entry (user_id, date, schedule, revision) VALUES (?, ?, ?, 1)",
+                       ('offline', DAY.isoformat(), '{"v":2,"m":[540],"t":["Caf\\u00e9 planning"]}'))
+        cursor.execute("PRAGMA user_version = 1")
+    store.close()
+
+    store = LocalStore(path, user_id='offline')
+    try:
+        assert [result.date for result in store.search('café')] == [DAY.isoformat()]
+        assert task_of(store.load_entry(DAY)) == 'Café planning'
+    finally:
+        store.close()
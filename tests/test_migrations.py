@@ -0,0 +1,53 @@
+import uuid
+from datetime import date
+
+import psycopg2
+import pytest
+from psycopg2.extensions import make_dsn
+
+from migrations import migrate, partition_by_year
+from timeboxing_db import upsert_entry
+
+
+@pytest.fixture
+def scratch(database_url):
+    """A connection to a new database of its own, dropped afterwards."""
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(database_url)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE {name}")
+    conn = psycopg2.connect(make_dsn(database_url, dbname=name))
+    try:
+        migrate(conn)
+        yield conn
+    finally:
+        conn.close()
+        with admin.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE {name}")
+        admin.close()
+
+
+def summaries(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT date, planned_slots FROM timeboxing_daily_summary ORDER BY date")
+        return cursor.fetchall()
+
+
+def test_new_year_partition_keeps_summaries(scratch):
+    this_year = date.today().year
+    assert partition_by_year(scratch) == [this_year, this_year + 1]
+
+    # Past the partitions, so these land in the default one
+    later = [date(this_year + 3, 3, 1), date(this_year + 3, 9, 1)]
+    with scratch.cursor() as cursor:
+        for day in later:
+            upsert_entry(cursor, 'alice', day, '', '', {'09:00': 'Plan', '09:30': 'Plan'})
+    scratch.commit()
+    assert summaries(scratch) == [(day, 2) for day in later]
+
+    assert partition_by_year(scratch, years_ahead=3) == [this_year + 2, this_year + 3]
+    assert summaries(scratch) == [(day, 2) for day in later]
+    with scratch.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM timeboxing_entry_y{this_year + 3}")
+        assert cursor.fetchone()[0] == 2
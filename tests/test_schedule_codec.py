@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import schedule_codec
+from schedule_codec import Slot
+
+
+DESKTOP_DAY = {
+    '09:00': {'task': 'Deep work', 'checked': True, 'color': '#ffcc00'},
+    '09:30': {'task': 'Deep work', 'checked': False, 'color': '#ffcc00'},
+    '10:00': {'task': 'Email', 'checked': False, 'color': '#ffffff'},
+    '23:59': {'task': 'Sleep', 'checked': False, 'color': '#123456'},
+}
+
+
+@pytest.mark.parametrize('schedule', [
+    {},
+    {'09:00': 'Standup', '09:30': 'Standup', '12:00': 'Lunch'},
+    DESKTOP_DAY,
+    {'00:00': {'task': '', 'checked': True, 'color': '#ffffff'}},
+])
+def test_round_trip(schedule):
+    stored = schedule_codec.dumps(schedule)
+    decoded = schedule_codec.decode(stored)
+    assert decoded == schedule_codec.decode(schedule)
+    assert schedule_codec.encode(decoded) == json.loads(stored)
+
+
+def test_encode_shares_repeated_tasks_and_colors():
+    encoded = schedule_codec.encode(DESKTOP_DAY)
+    assert encoded['m'] == [540, 570, 600, 1439]
+    assert encoded['t'] == ['Deep work', 'Email', 'Sleep']
+    assert encoded['i'] == [0, 0, 1, 2]
+    assert encoded['c'] == '1'
+    assert encoded['k'] == ['#ffcc00', '#123456']
+    assert encoded['p'] == [1, 1, 0, 2]
+
+
+def test_encode_ignores_empty_slots_and_other_keys():
+    encoded = schedule_codec.encode({'09:00': '', 'date': '2024-01-01', 'top_priorities': 'x', '10:00': 'Task'})
+    assert encoded == {'v': 2, 'm': [600], 't': ['Task']}
+
+
+@pytest.mark.parametrize('time', ['24:00', '24:30', '25:00', '99:99', '09:60'])
+def test_encode_rejects_times_outside_the_day(time):
+    with pytest.raises(ValueError):
+        schedule_codec.encode({'09:00': 'Fine', time: 'Late'})
+
+
+def test_decode_skips_out_of_range_minutes():
+    # As stored by the encoder before it checked slot times
+    stored = {'v': 2, 'm': [540, 1470, 1500], 't': ['A', 'B', 'C'], 'c': '5', 'k': ['#ff0000'], 'p': [0, 1, 1]}
+    assert schedule_codec.decode(stored) == {'09:00': Slot('A', True, '#ffffff')}
+    del stored['k'], stored['p']
+    assert schedule_codec.decode(json.dumps(stored)) == {'09:00': Slot('A', True, '#ffffff')}
+
+
+def test_decode_skips_legacy_keys_outside_the_day():
+    assert schedule_codec.decode({'09:00': 'A', '24:30': 'B', '07:75': 'C'}) == {'09:00': Slot('A', False, '#ffffff')}
+
+
+@pytest.mark.parametrize('stored', [None, '', 'not json', '[]', {}])
+def test_decode_of_nothing_is_empty(stored):
+    assert schedule_codec.decode(stored) == {}
+
+
+def test_decode_rejects_unknown_version():
+    with pytest.raises(ValueError):
+        schedule_codec.decode({'v': 3})
+
+
+def test_patch_and_merge_slots():
+    stored = schedule_codec.encode({'09:00': 'A'})
+    patched = schedule_codec.patch_slot(stored, '10:00', {'task': 'B', 'checked': True})
+    assert schedule_codec.decode(patched) == {'09:00': Slot('A', False, '#ffffff'),
+                                              '10:00': Slot('B', True, '#ffffff')}
+    merged = schedule_codec.merge_slots(patched, {'09:00': Slot('C', False, '#ffffff')})
+    assert schedule_codec.decode(merged)['09:00'].task == 'C'
+    replaced = schedule_codec.merge_slots(patched, {'11:00': 'D'}, replace=True)
+    assert schedule_codec.decode(replaced) == {'11:00': Slot('D', False, '#ffffff')}
@@ -1,16 +1,30 @@
 import sys
-import json
 import psycopg2
-from PyQt5.QtCore import QThread, pyqtSignal
+from collections import Counter
+from PyQt5.QtCore import QObject, QRunnable, QSocketNotifier, QStringListModel, QThreadPool, pyqtSignal
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QLineEdit, QTextEdit, QDateEdit, QPushButton, QScrollArea, QMessageBox)
 from PyQt5.QtCore import Qt, QDate
 from PyQt5.QtCore import QTimer
-from PyQt5.QtWidgets import QCheckBox, QComboBox, QColorDialog
+from PyQt5.QtWidgets import QCheckBox, QComboBox, QColorDialog, QSpinBox, QTableView, QHeaderView, QAbstractItemView
+from PyQt5.QtWidgets import QListWidget, QListWidgetItem
+from PyQt5.QtWidgets import QDialog, QDialogButtonBox, QFormLayout, QInputDialog
 from PyQt5.QtGui import QColor
 
 from dotenv import load_dotenv
 import os
+import metrics
+from migrations import migrate
+from timeboxing_db import (DEFAULT_USER, MISSING, VIEWS, DayCache, DayEntry, EntryRepository, as_date,
+                           env_connect_kwargs, timed_cursor_class, view_range)
+from local_store import DEFAULT_STORE_PATH, LocalStore, Synchronizer
+from live_changes import drain, listen
+from schedule_grid import SLOT_MINUTE_CHOICES, grid_of, make_grid
+from schedule_codec import decode_days
+from schedule_model import RangeModel, ScheduleModel, TaskDelegate
+from schedule_templates import apply_template, fetch_templates, make_recurrence, save_template
+from search import plain
+from alerts import END_SOON, START, AlertEngine
 from PyQt5.QtMultimedia import QSound
 from PyQt5.QtCore import QTime
 
@@ -19,25 +33,409 @@ from PyQt5.QtCore import QTime
 
 load_dotenv()
 
-class DatabaseWorker(QThread):
-    finished = pyqtSignal(object)
-    error = pyqtSignal(str)
+# METRICS_LOG=path appends every timing below as a JSON line
+metrics.REGISTRY.log_to(os.getenv('METRICS_LOG'))
+WORKER_SECONDS = metrics.REGISTRY.histogram(
+    'timeboxing_worker_seconds', "Time a DatabaseWorker spends in its function.", ['task'])
+UI_SECONDS = metrics.REGISTRY.histogram(
+    'timeboxing_ui_seconds', "Time spent in GUI-thread handlers.", ['handler'])
 
-    def __init__(self, func, *args, **kwargs):
+class WorkerSignals(QObject):
+    finished = pyqtSignal(object, object)
+    error = pyqtSignal(object, str)
+
+
+class DatabaseWorker(QRunnable):
+    def __init__(self, key, func, *args, **kwargs):
         super().__init__()
+        self.key = key
         self.func = func
         self.args = args
         self.kwargs = kwargs
-        print("TimeboxingApp initialized")
+        self.signals = WorkerSignals()
 
     def run(self):
         try:
-            result = self.func(*self.args, **self.kwargs)
-            self.finished.emit(result)
+            with WORKER_SECONDS.time(task=getattr(self.func, '__name__', 'worker')):
+                result = self.func(*self.args, **self.kwargs)
+            self.signals.finished.emit(self.key, result)
         except Exception as e:
-            self.error.emit(str(e))
+            self.signals.error.emit(self.key, str(e))
+
+
+class TaskListModel(QStringListModel):
+    """Deduplicated task names taken from the lines of several text sources.
+
+    `update_source` diffs the new lines against the previous ones and only
+    inserts or removes the rows whose reference count changed.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lines = {}
+        self.counts = Counter()
+        self.tasks = []
+
+    def update_source(self, source, text):
+        old = self.lines.get(source, [])
+        new = [line.strip() for line in text.split('\n')]
+        self.lines[source] = new
+
+        # Trim the unchanged head and tail; what is left is the edit
+        start = 0
+        limit = min(len(old), len(new))
+        while start < limit and old[start] == new[start]:
+            start += 1
+        old_end, new_end = len(old), len(new)
+        while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+
+        for task in new[start:new_end]:
+            if task:
+                self.counts[task] += 1
+                if self.counts[task] == 1:
+                    self._append_task(task)
+        for task in old[start:old_end]:
+            if task:
+                self.counts[task] -= 1
+                if self.counts[task] == 0:
+                    del self.counts[task]
+                    self._remove_task(task)
+
+    def _append_task(self, task):
+        row = len(self.tasks)
+        self.insertRows(row, 1)
+        self.setData(self.index(row), task)
+        self.tasks.append(task)
+
+    def _remove_task(self, task):
+        row = self.tasks.index(task)
+        self.removeRows(row, 1)
+        del self.tasks[row]
+
+
+def merge_changes(older, newer):
+    """Coalesce two queued slot deltas for the same date into one."""
+    if newer['replace']:
+        return newer
+    return dict(newer, slots={**older['slots'], **newer['slots']}, replace=older['replace'])
+
+
+class AutosaveQueue(QObject):
+    """Write-behind queue of per-day slot deltas.
+
+    Edits are coalesced per date and flushed after `debounce_ms` of quiet on
+    the worker pool. Failed flushes are put back and retried with
+    exponential backoff.
+    """
+    state_changed = pyqtSignal(str)
+    flushed = pyqtSignal()
+
+    def __init__(self, repository, start_worker, before_flush=None,
+                 debounce_ms=1500, max_backoff_ms=60000, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.start_worker = start_worker
+        self.before_flush = before_flush
+        self.debounce_ms = debounce_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.pending = {}
+        self.in_flight = {}
+        self.attempt = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def touch(self):
+        self.state_changed.emit("Unsaved changes")
+        if self.attempt == 0:
+            self.timer.start(self.debounce_ms)
+
+    def enqueue(self, date, top_priorities, brain_dump, slots, grid, replace=False):
+        change = {'top_priorities': top_priorities, 'brain_dump': brain_dump,
+                  'slots': slots, 'grid': grid, 'replace': replace}
+        if date in self.pending:
+            change = merge_changes(self.pending[date], change)
+        self.pending[date] = change
+
+    def flush(self):
+        self.timer.stop()
+        if self.before_flush:
+            self.before_flush()
+        if self.in_flight or not self.pending:
+            # A running flush picks up whatever is left when it finishes
+            return
+        self.in_flight, self.pending = self.pending, {}
+        worker = DatabaseWorker(None, self.repository.save_changes, self.in_flight)
+        worker.signals.finished.connect(self.on_flush_finished)
+        worker.signals.error.connect(self.on_flush_error)
+        self.state_changed.emit("Saving...")
+        self.start_worker(worker)
+
+    def on_flush_finished(self, _key, _rows):
+        self.in_flight = {}
+        self.attempt = 0
+        self.flushed.emit()
+        if self.pending:
+            self.touch()
+        else:
+            self.state_changed.emit("All changes saved")
 
+    def is_idle(self):
+        return not self.pending and not self.in_flight
 
+    def on_flush_error(self, _key, error_message):
+        print(f"Save error: {error_message}")
+        for date, change in self.in_flight.items():
+            self.pending[date] = merge_changes(change, self.pending[date]) if date in self.pending else change
+        self.in_flight = {}
+        delay = min(self.debounce_ms * 2 ** self.attempt, self.max_backoff_ms)
+        self.attempt += 1
+        self.state_changed.emit(f"Save failed, retrying in {delay // 1000}s")
+        self.timer.start(delay)
+
+    @UI_SECONDS.time(handler='flush_blocking')
+    def flush_blocking(self):
+        """Write everything outstanding on the calling thread (used on close)."""
+        self.timer.stop()
+        if self.before_flush:
+            self.before_flush()
+        changes = dict(self.in_flight)
+        for date, change in self.pending.items():
+            changes[date] = merge_changes(changes[date], change) if date in changes else change
+        if changes:
+            self.repository.save_changes(changes)
+        self.pending = {}
+        self.in_flight = {}
+
+
+class SyncQueue(QObject):
+    """Runs Synchronizer.sync on the worker pool.
+
+    Syncs every `interval_ms`, `kick_delay_ms` after local saves, and at
+    once when the server announces a change (sync_soon). It waits while
+    `is_idle()` is false, so a pull never lands on a day whose edits are
+    still on their way to the local store, and backs off exponentially while
+    the server is unreachable.
+    """
+    state_changed = pyqtSignal(str)
+    entries_changed = pyqtSignal(list)
+    conflicts_found = pyqtSignal(list)
+    synced = pyqtSignal()
+
+    def __init__(self, synchronizer, start_worker, is_idle=None, interval_ms=30000, kick_delay_ms=1000,
+                 retry_ms=5000, max_backoff_ms=300000, parent=None):
+        super().__init__(parent)
+        self.synchronizer = synchronizer
+        self.start_worker = start_worker
+        self.is_idle = is_idle
+        self.interval_ms = interval_ms
+        self.kick_delay_ms = kick_delay_ms
+        self.retry_ms = retry_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.running = False
+        self.rerun = False
+        self.attempt = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.sync)
+
+    def kick(self):
+        if not self.running and self.attempt == 0:
+            self.timer.start(self.kick_delay_ms)
+
+    def sync_soon(self):
+        # The running sync may have pulled before the change was committed
+        if self.running:
+            self.rerun = True
+        else:
+            self.timer.start(0)
+
+    def sync(self):
+        self.timer.stop()
+        if self.running:
+            return
+        if self.is_idle and not self.is_idle():
+            self.timer.start(self.kick_delay_ms)
+            return
+        self.running = True
+        worker = DatabaseWorker(None, self.synchronizer.sync)
+        worker.signals.finished.connect(self.on_sync_finished)
+        worker.signals.error.connect(self.on_sync_error)
+        self.start_worker(worker)
+
+    @UI_SECONDS.time(handler='on_sync_finished')
+    def on_sync_finished(self, _key, result):
+        self.running = False
+        self.attempt = 0
+        self.report(result)
+        self.synced.emit()
+        self.timer.start(0 if self.rerun else self.interval_ms)
+        self.rerun = False
+
+    def report(self, result):
+        if result.changed:
+            self.entries_changed.emit(result.changed)
+        if result.conflicts:
+            self.conflicts_found.emit(result.conflicts)
+        self.state_changed.emit(f"{result.pending} days waiting to sync" if result.pending else "Synced")
+
+    def run_on_server(self, key, on_finished, on_error, func, *args, **kwargs):
+        """Run `func` through Synchronizer.run_on_server on the pool.
+
+        `on_finished(key, result)` gets func's result; the sync part is
+        reported like a regular sync.
+        """
+        worker = DatabaseWorker(key, self.synchronizer.run_on_server, func, *args, **kwargs)
+        worker.signals.finished.connect(lambda _key, outcome: self.report(outcome[1]))
+        worker.signals.finished.connect(lambda key, outcome: on_finished(key, outcome[0]))
+        worker.signals.error.connect(on_error)
+        self.start_worker(worker)
+
+    def on_sync_error(self, _key, error_message):
+        print(f"Sync error: {error_message}")
+        self.running = False
+        self.rerun = False
+        delay = min(self.retry_ms * 2 ** self.attempt, self.max_backoff_ms)
+        self.attempt += 1
+        pending = self.synchronizer.store.pending_count()
+        self.state_changed.emit(f"Offline, {pending} days not synced; retrying in {delay // 1000}s")
+        self.timer.start(delay)
+
+    def stop(self):
+        self.timer.stop()
+
+
+class ChangeListener(QObject):
+    """Reports the user's entries changed on the server, as Postgres announces them.
+
+    LISTENs on a dedicated connection (see live_changes), opened on the
+    worker pool. Its socket is watched by a QSocketNotifier, so the GUI
+    thread only wakes when a notification arrives and nothing polls. A lost
+    connection is dropped; start() opens a new one, and the caller syncs
+    after that to catch what was missed meanwhile.
+    """
+    changed = pyqtSignal(list)
+
+    def __init__(self, connect, user_id, start_worker, parent=None):
+        super().__init__(parent)
+        self.connect = connect
+        self.user_id = user_id
+        self.start_worker = start_worker
+        self.conn = None
+        self.notifier = None
+        self.connecting = False
+        self.active = False
+
+    def start(self):
+        self.active = True
+        if self.conn is not None or self.connecting:
+            return
+        self.connecting = True
+        worker = DatabaseWorker(None, self._open)
+        worker.signals.finished.connect(self.on_connected)
+        worker.signals.error.connect(self.on_connect_error)
+        self.start_worker(worker)
+
+    def _open(self):
+        conn = self.connect()
+        try:
+            listen(conn)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def on_connected(self, _key, conn):
+        self.connecting = False
+        if not self.active:
+            # Stopped while connecting
+            conn.close()
+            return
+        self.conn = conn
+        self.notifier = QSocketNotifier(conn.fileno(), QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.on_readable)
+
+    def on_connect_error(self, _key, error_message):
+        self.connecting = False
+        print(f"Change listener could not connect: {error_message}")
+
+    @UI_SECONDS.time(handler='on_change_notified')
+    def on_readable(self, _socket):
+        try:
+            changes = drain(self.conn)
+        except psycopg2.Error as e:
+            print(f"Change listener disconnected: {e}")
+            self.stop()
+            return
+        changes = [change for change in changes if change.user_id == self.user_id]
+        if changes:
+            self.changed.emit(changes)
+
+    def stop(self):
+        self.active = False
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.notifier.deleteLater()
+            self.notifier = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class ApplyTemplateDialog(QDialog):
+    """Pick a template and the days to apply it to."""
+
+    WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+    def __init__(self, names, start, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Apply template")
+        form = QFormLayout(self)
+        self.name_combo = QComboBox()
+        self.name_combo.addItems(names)
+        form.addRow("Template:", self.name_combo)
+        first = QDate(start.year, start.month, start.day)
+        self.from_edit = QDateEdit(first)
+        self.from_edit.setCalendarPopup(True)
+        form.addRow("From:", self.from_edit)
+        self.to_edit = QDateEdit(first.addDays(6))
+        self.to_edit.setCalendarPopup(True)
+        form.addRow("To:", self.to_edit)
+        weekdays = QHBoxLayout()
+        self.weekday_boxes = []
+        for index, name in enumerate(self.WEEKDAY_NAMES):
+            box = QCheckBox(name)
+            box.setChecked(index < 5)
+            weekdays.addWidget(box)
+            self.weekday_boxes.append(box)
+        form.addRow("On:", weekdays)
+        self.every_spin = QSpinBox()
+        self.every_spin.setRange(1, 365)
+        self.every_spin.setSuffix(" day(s)")
+        form.addRow("Every:", self.every_spin)
+        self.merge_checkbox = QCheckBox("Keep slots the days already have")
+        self.merge_checkbox.setChecked(True)
+        form.addRow(self.merge_checkbox)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        form.addRow(buttons)
+
+    def name(self):
+        return self.name_combo.currentText()
+
+    def merge(self):
+        return self.merge_checkbox.isChecked()
+
+    def recurrence(self):
+        """The chosen days; raises ValueError if they make no sense."""
+        weekdays = [index for index, box in enumerate(self.weekday_boxes) if box.isChecked()]
+        if not weekdays:
+            raise ValueError("Pick at least one weekday")
+        return make_recurrence(self.from_edit.date().toPyDate(), self.to_edit.date().toPyDate(),
+                               weekdays, self.every_spin.value())
 
 
 class TimeboxingApp(QMainWindow):
@@ -46,10 +444,28 @@ class TimeboxingApp(QMainWindow):
         self.setWindowTitle("Timeboxing Daily Planner")
         self.setGeometry(100, 100, 1000, 800)
         self.setStyleSheet("background-color: #f0f4f8;")
-        self.worker_threads = []
+        self.thread_pool = QThreadPool(self)
+        self.pending_load = None
+        self.pending_range_load = None
+        self.active_workers = set()
+        self.resolving_conflicts = False
+        self.deferred_conflicts = set()
+        self.displayed_date = None
+        self.dirty = False
+        self.loading = False
+        self.default_grid = make_grid(os.getenv('SLOT_MINUTES'), os.getenv('DAY_START_HOUR'),
+                                      os.getenv('DAY_END_HOUR'))
+        self.alert_engine = AlertEngine(
+            start_lead_minutes=int(os.getenv('ALERT_START_LEAD_MINUTES', 0)),
+            end_lead_minutes=int(os.getenv('ALERT_END_LEAD_MINUTES', 5)),
+            enabled=(),  # Turned on by the alert checkboxes
+        )
         self.alert_timer = QTimer(self)
+        self.alert_timer.setSingleShot(True)
         self.alert_timer.timeout.connect(self.check_alerts)
-        self.alert_timer.start(60000)  # Check every minute
+        self.alert_rebuild_timer = QTimer(self)
+        self.alert_rebuild_timer.setSingleShot(True)
+        self.alert_rebuild_timer.timeout.connect(self.rebuild_alerts)
         self.init_db()
         self.init_ui()
         
@@ -61,18 +477,27 @@ class TimeboxingApp(QMainWindow):
 
 
     def check_alerts(self):
-        current_time = QTime.currentTime()
-        current_time_str = current_time.toString("HH:mm")
-        
-        for time, task_combo in self.schedule_inputs.items():
-            task = task_combo.currentText()
-            if task:
-                if time == current_time_str:
-                    if self.start_alert_checkbox.isChecked():
-                        self.show_alert(f"Start task: {task}")
-                elif self.time_diff(time, current_time_str) == 1:
-                    if self.end_alert_checkbox.isChecked():
-                        self.show_alert(f"End task soon: {task}")
+        now = QTime.currentTime().msecsSinceStartOfDay() // 1000
+        for event in self.alert_engine.pop_due(now):
+            if event.kind == START:
+                self.show_alert(f"Start task: {event.task}")
+            else:
+                self.show_alert(f"End task soon: {event.task}")
+        self.arm_alert_timer()
+
+    @UI_SECONDS.time(handler='rebuild_alerts')
+    def rebuild_alerts(self):
+        self.alert_engine.slot_length = self.schedule_model.grid.slot_minutes * 60
+        self.alert_engine.rebuild(self.schedule_model.task_map(),
+                                  QTime.currentTime().msecsSinceStartOfDay() // 1000)
+        self.arm_alert_timer()
+
+    def arm_alert_timer(self):
+        if not self.alert_engine.enabled:
+            self.alert_timer.stop()
+            return
+        now = QTime.currentTime().msecsSinceStartOfDay() // 1000
+        self.alert_timer.start(self.alert_engine.seconds_until_next(now) * 1000)
 
 
 
@@ -80,11 +505,6 @@ class TimeboxingApp(QMainWindow):
         QSound.play("path/to/your/sound/file.wav")  # Play a sound
         QMessageBox.information(self, "Task Alert", message)
 
-    def time_diff(self, time1, time2):
-        t1 = QTime.fromString(time1, "HH:mm")
-        t2 = QTime.fromString(time2, "HH:mm")
-        return t1.secsTo(t2) // 60  # Return difference in minutes
-
 
     def change_font_size(self, size_text):
         size_map = {'Small': 8, 'Medium': 10, 'Large': 12}
@@ -101,37 +521,105 @@ class TimeboxingApp(QMainWindow):
         # Update specific widgets that might need adjustments
         self.top_priorities.setStyleSheet(f"font-size: {size}pt; background-color: white; border: 1px solid #ddd; border-radius: 4px;")
         self.brain_dump.setStyleSheet(f"font-size: {size}pt; background-color: white; border: 1px solid #ddd; border-radius: 4px;")
-        
-        for combo in self.schedule_inputs.values():
-            combo.setStyleSheet(f"font-size: {size}pt;")
+        self.schedule_view.verticalHeader().setDefaultSectionSize(size * 3)
         
         # Refresh the layout
         self.update()
 
 
 
-    def closeEvent(self, event):
-        try:
-            if self.conn:
-                self.conn.close()
-            print("Database connection closed.")
-        except Exception as e:
-            print(f"Error closing database connection: {e}")
-        event.accept()
-
-
     def init_db(self):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            host=os.getenv('DB_HOST')
+        # Loads and saves only touch the local store; Postgres is reached by
+        # the sync worker alone, so a slow or missing server never blocks the UI
+        self.repository = LocalStore(
+            os.getenv('LOCAL_STORE', DEFAULT_STORE_PATH),
+            user_id=os.getenv('TIMEBOXING_USER', DEFAULT_USER),
+            cache=DayCache(int(os.getenv('DAY_CACHE_SIZE', 256))),
+            prefetch_days=int(os.getenv('PREFETCH_DAYS', 3)),
         )
-        self.conn.set_session(autocommit=True)  # This will auto-commit transactions
-        self.cursor = self.conn.cursor()
-        self.check_table_structure()
-        self.add_unique_constraint()
-        
+        self.autosave = AutosaveQueue(self.repository, self.start_worker,
+                                      before_flush=self.capture_pending_edits, parent=self)
+        self.sync = SyncQueue(Synchronizer(self.repository, self.connect_server), self.start_worker,
+                              is_idle=lambda: self.autosave.is_idle() and not self.dirty,
+                              interval_ms=int(os.getenv('SYNC_INTERVAL_MS', 30000)), parent=self)
+        self.autosave.flushed.connect(self.sync.kick)
+        self.sync.entries_changed.connect(self.on_remote_changes)
+        self.sync.conflicts_found.connect(self.resolve_conflicts)
+        # Listening starts after the first successful sync, and restarts after
+        # later ones if the connection was lost
+        self.change_listener = ChangeListener(self.connect_listener, self.repository.user_id, self.start_worker,
+                                              parent=self)
+        self.change_listener.changed.connect(self.on_server_changes)
+        self.sync.synced.connect(self.change_listener.start)
+        self.sync.kick()
+
+    def connect_server(self):
+        """Open the Postgres side of the sync; runs on the sync worker's thread."""
+        repository = EntryRepository(
+            minconn=1,
+            maxconn=1,
+            user_id=self.repository.user_id,
+            cursor_factory=timed_cursor_class(metrics.record_query),
+            connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            **env_connect_kwargs()
+        )
+        try:
+            with repository.connection() as conn:
+                migrate(conn)
+        except Exception:
+            repository.close()
+            raise
+        return repository
+
+    def connect_listener(self):
+        return psycopg2.connect(connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', 5)), **env_connect_kwargs())
+
+    def on_server_changes(self, changes):
+        # Our own pushes are announced too; they are already in the local store
+        if self.repository.newer_than_local(changes):
+            self.sync.sync_soon()
+
+    def on_remote_changes(self, dates):
+        """Show a day that another device changed, unless it is being edited here."""
+        if self.current_view() != 'day':
+            start, end = view_range(self.current_date(), self.current_view())
+            if any(start <= day <= end for day in dates):
+                self.load_range_view()
+            return
+        date = self.displayed_date
+        if date is None or self.dirty or date in self.autosave.pending or date in self.autosave.in_flight:
+            return
+        if as_date(date) in dates:
+            self.load_entry(date)
+
+    def resolve_conflicts(self, _dates):
+        # The dialogs run their own event loop; a sync finishing meanwhile
+        # must not stack a second round of them
+        if self.resolving_conflicts:
+            return
+        self.resolving_conflicts = True
+        try:
+            for conflict in self.repository.conflicts():
+                date = conflict.remote.date.isoformat()
+                if date in self.deferred_conflicts:
+                    continue
+                box = QMessageBox(QMessageBox.Question, "Sync conflict",
+                                  f"{date} was changed on this computer and on another device since the last sync.",
+                                  parent=self)
+                keep = box.addButton("Keep this computer's version", QMessageBox.AcceptRole)
+                theirs = box.addButton("Use the other version", QMessageBox.DestructiveRole)
+                # Escape lands here too; the next session asks again
+                box.addButton("Decide later", QMessageBox.RejectRole)
+                box.exec_()
+                if box.clickedButton() not in (keep, theirs):
+                    self.deferred_conflicts.add(date)
+                    continue
+                self.repository.resolve(date, keep_local=box.clickedButton() is keep)
+                if date == self.displayed_date and not self.dirty:
+                    self.load_entry(date)
+        finally:
+            self.resolving_conflicts = False
+        self.sync.kick()
 
     def init_ui(self):
         main_widget = QWidget()
@@ -161,9 +649,24 @@ class TimeboxingApp(QMainWindow):
         self.date_edit.dateChanged.connect(self.on_date_changed)
         date_layout.addWidget(date_label)
         date_layout.addWidget(self.date_edit)
+        self.view_combo = QComboBox()
+        self.view_combo.addItems([view.capitalize() for view in VIEWS])
+        self.view_combo.currentIndexChanged.connect(self.on_view_changed)
+        date_layout.addWidget(self.view_combo)
         date_layout.addStretch()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search past days...")
+        self.search_input.returnPressed.connect(self.run_search)
+        date_layout.addWidget(self.search_input)
         main_layout.addLayout(date_layout)
 
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(150)
+        self.search_results.hide()
+        self.search_results.itemActivated.connect(self.open_search_result)
+        self.search_results.itemClicked.connect(self.open_search_result)
+        main_layout.addWidget(self.search_results)
+
 
         # Main content area
         content_layout = QHBoxLayout()
@@ -173,9 +676,16 @@ class TimeboxingApp(QMainWindow):
         
         # Top Priorities
         left_column.addWidget(QLabel("Top Priorities:"))
+        # One task list shared by every slot combo, refreshed shortly after typing stops
+        self.task_model = TaskListModel(self)
+        self.task_options_timer = QTimer(self)
+        self.task_options_timer.setSingleShot(True)
+        self.task_options_timer.timeout.connect(self.update_task_options)
+
         self.top_priorities = QTextEdit()
         self.top_priorities.setStyleSheet("background-color: white; border: 1px solid #ddd; border-radius: 4px;")
-        self.top_priorities.textChanged.connect(self.update_task_options)
+        self.top_priorities.textChanged.connect(self.schedule_task_options_update)
+        self.top_priorities.textChanged.connect(self.mark_dirty)
 
         left_column.addWidget(self.top_priorities)
 
@@ -183,7 +693,8 @@ class TimeboxingApp(QMainWindow):
         left_column.addWidget(QLabel("Brain-Dump:"))
         self.brain_dump = QTextEdit()
         self.brain_dump.setStyleSheet("background-color: white; border: 1px solid #ddd; border-radius: 4px;")
-        self.brain_dump.textChanged.connect(self.update_task_options)
+        self.brain_dump.textChanged.connect(self.schedule_task_options_update)
+        self.brain_dump.textChanged.connect(self.mark_dirty)
         left_column.addWidget(self.brain_dump)
 
 
@@ -209,6 +720,8 @@ class TimeboxingApp(QMainWindow):
 
         self.start_alert_checkbox = QCheckBox("Start Task")
         self.end_alert_checkbox = QCheckBox("End Task")
+        self.start_alert_checkbox.toggled.connect(self.update_alerts)
+        self.end_alert_checkbox.toggled.connect(self.update_alerts)
         alert_layout.addWidget(self.start_alert_checkbox)
         alert_layout.addWidget(self.end_alert_checkbox)
 
@@ -223,290 +736,404 @@ class TimeboxingApp(QMainWindow):
         right_column = QVBoxLayout()
         right_column.addWidget(QLabel("Schedule:"))
         
-        schedule_widget = QWidget()
-        self.schedule_layout = QVBoxLayout(schedule_widget)
-        
-        self.schedule_inputs = {}
-        self.schedule_checkboxes = {}
-        self.schedule_colors = {}
-        for hour in range(5, 24):
-            for minute in ['00', '30']:
-                time = f"{hour:02d}:{minute}"
-                hour_layout = QHBoxLayout()
-                
-                checkbox = QCheckBox()
-                hour_layout.addWidget(checkbox)
-                
-                hour_layout.addWidget(QLabel(time))
-                
-                task_combo = QComboBox()
-                task_combo.setEditable(True)
-                hour_layout.addWidget(task_combo)
-                
-                color_button = QPushButton("Color")
-                color_button.clicked.connect(lambda _, t=time: self.choose_color(t))
-                hour_layout.addWidget(color_button)
-                
-                self.schedule_layout.addLayout(hour_layout)
-                self.schedule_inputs[time] = task_combo
-                self.schedule_checkboxes[time] = checkbox
-                self.schedule_colors[time] = QColor(255, 255, 255)  # Default white
-
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setWidget(schedule_widget)
-        right_column.addWidget(scroll_area)
+        # Slot granularity and day range for the displayed day
+        grid_layout = QHBoxLayout()
+        grid_layout.addWidget(QLabel("Slot:"))
+        self.slot_minutes_combo = QComboBox()
+        self.slot_minutes_combo.addItems([f"{choice} min" for choice in SLOT_MINUTE_CHOICES])
+        grid_layout.addWidget(self.slot_minutes_combo)
+        grid_layout.addWidget(QLabel("From:"))
+        self.day_start_spin = QSpinBox()
+        self.day_start_spin.setRange(0, 23)
+        grid_layout.addWidget(self.day_start_spin)
+        grid_layout.addWidget(QLabel("To:"))
+        self.day_end_spin = QSpinBox()
+        self.day_end_spin.setRange(1, 24)
+        grid_layout.addWidget(self.day_end_spin)
+        grid_layout.addStretch()
+        right_column.addLayout(grid_layout)
+
+        self.schedule_model = ScheduleModel(self.default_grid, self)
+        self.schedule_model.dataChanged.connect(self.mark_dirty)
+        self.schedule_model.dataChanged.connect(lambda *_: self.alert_rebuild_timer.start(500))
+        self.schedule_view = QTableView()
+        self.schedule_view.setModel(self.schedule_model)
+        self.schedule_view.setItemDelegateForColumn(ScheduleModel.TASK, TaskDelegate(self.task_model, self))
+        self.schedule_view.setEditTriggers(QAbstractItemView.AllEditTriggers)
+        self.schedule_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.schedule_view.verticalHeader().hide()
+        # Fixed row heights let the view skip measuring off-screen rows
+        self.schedule_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        header = self.schedule_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(ScheduleModel.TASK, QHeaderView.Stretch)
+        self.schedule_view.doubleClicked.connect(self.on_schedule_double_clicked)
+        right_column.addWidget(self.schedule_view)
+        self.show_grid(self.default_grid)
+        self.slot_minutes_combo.currentIndexChanged.connect(self.on_grid_changed)
+        self.day_start_spin.valueChanged.connect(self.on_grid_changed)
+        self.day_end_spin.valueChanged.connect(self.on_grid_changed)
 
         # Add right column to content layout
         content_layout.addLayout(right_column, 1)
 
-        main_layout.addLayout(content_layout)
+        self.day_widget = QWidget()
+        self.day_widget.setLayout(content_layout)
+        main_layout.addWidget(self.day_widget)
+
+        # Week and month overview, shown instead of the day editor
+        self.range_model = RangeModel(self.default_grid, self)
+        self.range_view = QTableView()
+        self.range_view.setModel(self.range_model)
+        self.range_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.range_view.setWordWrap(True)
+        self.range_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.range_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.range_view.doubleClicked.connect(self.open_range_day)
+        self.range_view.hide()
+        main_layout.addWidget(self.range_view)
+
         # Save button
         save_button = QPushButton("Save")
         save_button.setStyleSheet("background-color: #3498db; color: white; padding: 10px 20px; border: none; border-radius: 4px;")
         save_button.clicked.connect(self.save_entry)
-        main_layout.addWidget(save_button, alignment=Qt.AlignCenter)
+        save_template_button = QPushButton("Save as template…")
+        save_template_button.clicked.connect(self.save_as_template)
+        apply_template_button = QPushButton("Apply template…")
+        apply_template_button.clicked.connect(self.choose_template)
+        self.save_state_label = QLabel("")
+        self.save_state_label.setStyleSheet("color: #7f8c8d;")
+        self.autosave.state_changed.connect(self.save_state_label.setText)
+        self.sync_state_label = QLabel("")
+        self.sync_state_label.setStyleSheet("color: #7f8c8d;")
+        self.sync.state_changed.connect(self.sync_state_label.setText)
+        save_layout = QHBoxLayout()
+        save_layout.addStretch()
+        save_layout.addWidget(save_button)
+        save_layout.addWidget(save_template_button)
+        save_layout.addWidget(apply_template_button)
+        save_layout.addWidget(self.save_state_label)
+        save_layout.addWidget(self.sync_state_label)
+        save_layout.addStretch()
+        main_layout.addLayout(save_layout)
         self.change_font_size('Medium')
 
         
 
 
 
-    def choose_color(self, time):
+    def run_search(self):
+        query = self.search_input.text().strip()
+        if not query:
+            self.search_results.hide()
+            return
+        worker = DatabaseWorker(query, self.repository.search, query)
+        worker.signals.finished.connect(self.on_search_finished)
+        worker.signals.error.connect(lambda _, message: QMessageBox.warning(self, "Search", message))
+        self.start_worker(worker)
+
+    @UI_SECONDS.time(handler='on_search_finished')
+    def on_search_finished(self, query, results):
+        if query != self.search_input.text().strip():
+            return
+        self.search_results.clear()
+        if not results:
+            self.search_results.addItem("No matching days")
+        for result in results:
+            item = QListWidgetItem(f"{result.date}  {plain(result.snippet)}")
+            item.setData(Qt.UserRole, str(result.date))
+            self.search_results.addItem(item)
+        self.search_results.show()
+
+    def open_search_result(self, item):
+        date = item.data(Qt.UserRole)
+        if date:
+            self.date_edit.setDate(QDate.fromString(date, "yyyy-MM-dd"))
+
+    def choose_color(self, row):
         color = QColorDialog.getColor()
         if color.isValid():
-            self.schedule_colors[time] = color
-            self.update_schedule_colors()
-
-
-
-    def update_schedule_colors(self):
-        for time, combo in self.schedule_inputs.items():
-            combo.setStyleSheet(f"background-color: {self.schedule_colors[time].name()};")
-
-    def update_task_options(self):
-        top_priorities = self.top_priorities.toPlainText().split('\n')
-        brain_dump = self.brain_dump.toPlainText().split('\n')
-        all_tasks = top_priorities + brain_dump
-        all_tasks = [task.strip() for task in all_tasks if task.strip()]
-        
-        for combo in self.schedule_inputs.values():
-            current_text = combo.currentText()
-            combo.clear()
-            combo.addItems(all_tasks)
-            combo.setCurrentText(current_text)
-
-
-
-    def check_table_structure(self):
-        self.cursor.execute("""
-            SELECT column_name, data_type 
-            FROM information_schema.columns 
-            WHERE table_name = 'timeboxing_entry'
-        """)
-        columns = self.cursor.fetchall()
-        print("Existing table structure:")
-        for column in columns:
-            print(f"{column[0]}: {column[1]}")
-        
-        if not columns:
-            print("Table 'timeboxing_entry' does not exist. Creating it now.")
-            self.cursor.execute('''
-                CREATE TABLE timeboxing_entry (
-                    id SERIAL PRIMARY KEY,
-                    date DATE UNIQUE NOT NULL,
-                    top_priorities TEXT,
-                    brain_dump TEXT,
-                    schedule JSONB
-                )
-            ''')
-            self.conn.commit()
-            print("Table created successfully.")
-
-
-    def add_unique_constraint(self):
+            self.schedule_model.setData(self.schedule_model.index(row, ScheduleModel.COLOR), color.name())
+
+    def on_schedule_double_clicked(self, index):
+        if index.column() == ScheduleModel.COLOR:
+            self.choose_color(index.row())
+
+    @UI_SECONDS.time(handler='show_grid')
+    def show_grid(self, grid):
+        """Reflect `grid` in the slot/range controls without triggering a regrid."""
+        for widget in (self.slot_minutes_combo, self.day_start_spin, self.day_end_spin):
+            widget.blockSignals(True)
+        self.slot_minutes_combo.setCurrentIndex(SLOT_MINUTE_CHOICES.index(grid.slot_minutes))
+        self.day_start_spin.setValue(grid.day_start)
+        self.day_end_spin.setValue(grid.day_end)
+        for widget in (self.slot_minutes_combo, self.day_start_spin, self.day_end_spin):
+            widget.blockSignals(False)
+
+    def on_grid_changed(self, *_):
         try:
-            self.cursor.execute("""
-                ALTER TABLE timeboxing_entry
-                ADD CONSTRAINT unique_date UNIQUE (date);
-            """)
-            self.conn.commit()
-            print("Unique constraint added to date column.")
-        except psycopg2.errors.DuplicateTable:
-            print("Unique constraint already exists on date column.")
-        except Exception as e:
-            print(f"Error adding unique constraint: {e}")
-
+            grid = make_grid(SLOT_MINUTE_CHOICES[self.slot_minutes_combo.currentIndex()],
+                             self.day_start_spin.value(), self.day_end_spin.value())
+        except ValueError:
+            self.show_grid(self.schedule_model.grid)
+            return
+        self.schedule_model.set_grid(grid)
+        self.mark_dirty()
+        self.rebuild_alerts()
+
+    def schedule_task_options_update(self):
+        self.task_options_timer.start(250)
+
+    @UI_SECONDS.time(handler='update_task_options')
+    def update_task_options(self):
+        self.task_options_timer.stop()
+        self.task_model.update_source('top_priorities', self.top_priorities.toPlainText())
+        self.task_model.update_source('brain_dump', self.brain_dump.toPlainText())
 
     def save_entry(self):
-        print("Starting save_entry")
-        date = self.date_edit.date().toString("yyyy-MM-dd")
-        top_priorities = self.top_priorities.toPlainText()
-        brain_dump = self.brain_dump.toPlainText()
-        schedule = {
-            time: {
-                'task': input.currentText(),
-                'checked': self.schedule_checkboxes[time].isChecked(),
-                'color': self.schedule_colors[time].name()
-            } for time, input in self.schedule_inputs.items()
-        }
-        schedule_json = json.dumps(schedule)
-
-        try:
-            result = self._save_entry(date, top_priorities, brain_dump, schedule_json)
-            self.on_save_finished(result)
-        except Exception as e:
-            self.on_save_error(str(e))
-        
+        self.mark_dirty()
+        self.autosave.flush()
         self.update_alerts()
-        print("Finished save_entry")
-
-    def update_alerts(self):
-        if self.start_alert_checkbox.isChecked() or self.end_alert_checkbox.isChecked():
-            self.alert_timer.start(60000)  # Check every minute
-        else:
-            self.alert_timer.stop()
-
-    def _save_entry(self, date, top_priorities, brain_dump, schedule):
-        try:
-            self.conn.rollback()
-            
-            self.cursor.execute("SELECT id FROM timeboxing_entry WHERE date = %s", (date,))
-            existing_entry = self.cursor.fetchone()
-
-            if existing_entry:
-                self.cursor.execute('''
-                    UPDATE timeboxing_entry
-                    SET top_priorities = %s, brain_dump = %s, schedule = %s
-                    WHERE date = %s
-                ''', (top_priorities, brain_dump, schedule, date))
-            else:
-                self.cursor.execute('''
-                    INSERT INTO timeboxing_entry (date, top_priorities, brain_dump, schedule)
-                    VALUES (%s, %s, %s, %s)
-                ''', (date, top_priorities, brain_dump, schedule))
-
-            self.conn.commit()
-            return "Entry saved successfully!"
-        except Exception as e:
-            self.conn.rollback()
-            raise e
 
-    def on_save_finished(self, message):
-        print("Starting on_save_finished")
-        QMessageBox.information(self, "Success", message)
-        print("Finished on_save_finished")
-
-    def on_save_error(self, error_message):
-        print(f"Save error: {error_message}")
-        QMessageBox.critical(self, "Error", f"Failed to save entry: {error_message}")
-        if self.sender() in self.worker_threads:
-            self.worker_threads.remove(self.sender())
-
-    
+    def save_as_template(self):
+        if self.displayed_date is None:
+            QMessageBox.information(self, "Templates", "Open a single day to save it as a template.")
+            return
+        name, ok = QInputDialog.getText(self, "Save as template", "Template name:")
+        if not ok or not name.strip():
+            return
+        # Templates live on the server, so every device can apply them
+        self.sync.run_on_server(name, self.on_template_saved, self.on_template_error, save_template, name,
+                                self.schedule_model.to_schedule(), self.schedule_model.grid)
+
+    def on_template_saved(self, _name, template):
+        self.save_state_label.setText(f"Saved template “{template.name}”")
+
+    def on_template_error(self, _key, error_message):
+        QMessageBox.warning(self, "Templates", f"The server could not be reached or refused: {error_message}")
+
+    def choose_template(self):
+        self.sync.run_on_server(None, self.show_apply_template, self.on_template_error, fetch_templates)
+
+    def show_apply_template(self, _key, templates):
+        if not templates:
+            QMessageBox.information(self, "Templates", "There are no templates yet. Save a day as one first.")
+            return
+        dialog = ApplyTemplateDialog([template.name for template in templates], as_date(self.current_date()), self)
+        while dialog.exec_() == QDialog.Accepted:
+            try:
+                recurrence = dialog.recurrence()
+            except ValueError as e:
+                QMessageBox.warning(self, "Apply template", str(e))
+                continue
+            self.apply_template(dialog.name(), recurrence, dialog.merge())
+            return
+
+    def apply_template(self, name, recurrence, merge):
+        # Local edits go to the store first, so the push before the apply carries them
+        self.capture_pending_edits()
+        if not self.autosave.is_idle():
+            self.autosave.flush()
+            QTimer.singleShot(200, lambda: self.apply_template(name, recurrence, merge))
+            return
+        self.sync.run_on_server(name, self.on_template_applied, self.on_template_error, apply_template, name,
+                                recurrence, merge=merge)
+
+    def on_template_applied(self, name, entries):
+        self.save_state_label.setText(f"Applied “{name}” to {len(entries)} days")
+
+    def mark_dirty(self, *_):
+        if self.loading or self.displayed_date is None:
+            return
+        self.dirty = True
+        self.autosave.touch()
+
+    @UI_SECONDS.time(handler='capture_pending_edits')
+    def capture_pending_edits(self):
+        """Snapshot the widgets into the autosave queue if they were edited."""
+        if not self.dirty or self.displayed_date is None:
+            return
+        top_priorities = self.top_priorities.toPlainText()
+        brain_dump = self.brain_dump.toPlainText()
+        grid = self.schedule_model.grid
+        slots, replace = self.schedule_model.take_changes()
+        self.autosave.enqueue(self.displayed_date, top_priorities, brain_dump, slots, grid, replace)
+        # Keep the local state readable until the write lands
+        cached = self.repository.cached_entry(self.displayed_date)
+        if cached is MISSING or cached is None:
+            cached = DayEntry(None, as_date(self.displayed_date), None, None, None, None, None, None)
+        self.repository.cache.put(self.displayed_date, cached._replace(
+            top_priorities=top_priorities, brain_dump=brain_dump, schedule=self.schedule_model.to_schedule(),
+            slot_minutes=grid.slot_minutes, day_start=grid.day_start, day_end=grid.day_end))
+        self.dirty = False
+
+    def update_alerts(self, *_):
+        enabled = set()
+        if self.start_alert_checkbox.isChecked():
+            enabled.add(START)
+        if self.end_alert_checkbox.isChecked():
+            enabled.add(END_SOON)
+        self.alert_engine.enabled = enabled
+        self.arm_alert_timer()
 
     def load_entry(self, date=None):
         if date is None:
             date = self.date_edit.date().toString("yyyy-MM-dd")
         elif isinstance(date, QDate):
             date = date.toString("yyyy-MM-dd")
-        
-        worker = DatabaseWorker(self._load_entry, date)
-        worker.finished.connect(self.on_load_finished)
-        worker.error.connect(self.on_load_error)
-        worker.start()
-        self.worker_threads.append(worker)
+
+        # Days with unsaved edits are in the cache too (see capture_pending_edits)
+        cached = self.repository.cached_entry(date)
+        if cached is not MISSING:
+            self.on_load_finished(date, cached)
+            return
+
+        # A load still waiting in the queue is for a date the user has
+        # already scrolled past; drop it instead of running it.
+        if self.pending_load is not None and self.thread_pool.tryTake(self.pending_load):
+            self.active_workers.discard(self.pending_load)
+
+        worker = DatabaseWorker(date, self._load_entry, date)
+        worker.signals.finished.connect(self.on_load_finished)
+        worker.signals.error.connect(self.on_load_error)
+        self.start_worker(worker)
+        self.pending_load = worker
+
+    def start_worker(self, worker):
+        # Keep our own reference until the worker reports back, so Python
+        # does not collect a runnable the pool is still executing.
+        worker.setAutoDelete(False)
+        worker.signals.finished.connect(lambda *_, w=worker: self.active_workers.discard(w))
+        worker.signals.error.connect(lambda *_, w=worker: self.active_workers.discard(w))
+        self.active_workers.add(worker)
+        self.thread_pool.start(worker)
 
 
     def on_date_changed(self, new_date):
+        self.capture_pending_edits()
+        self.displayed_date = None
+        if self.current_view() != 'day':
+            self.load_range_view()
+            return
         date_str = new_date.toString("yyyy-MM-dd")
         self.load_entry(date_str)
 
+    def current_view(self):
+        return VIEWS[self.view_combo.currentIndex()]
+
+    def on_view_changed(self, _index):
+        self.capture_pending_edits()
+        day = self.current_view() == 'day'
+        self.day_widget.setVisible(day)
+        self.range_view.setVisible(not day)
+        if day:
+            self.load_entry()
+        else:
+            # Edits stay queued and cached; nothing is being edited meanwhile
+            self.displayed_date = None
+            self.load_range_view()
+
+    def load_range_view(self):
+        """Load the week or month around the chosen date with one range query."""
+        view = self.current_view()
+        start, end = view_range(self.current_date(), view)
+        if self.pending_range_load is not None and self.thread_pool.tryTake(self.pending_range_load):
+            self.active_workers.discard(self.pending_range_load)
+        worker = DatabaseWorker((view, start), self._load_days, start, end)
+        worker.signals.finished.connect(self.on_range_loaded)
+        worker.signals.error.connect(self.on_range_load_error)
+        self.start_worker(worker)
+        self.pending_range_load = worker
+
+    def _load_days(self, start, end):
+        # Decoded here, off the GUI thread
+        days = self.repository.load_days(start, end)
+        return days, decode_days(entry for _, entry in days)
+
+    def range_key(self):
+        view = self.current_view()
+        return view, view_range(self.current_date(), view)[0]
+
+    @UI_SECONDS.time(handler='on_range_loaded')
+    def on_range_loaded(self, key, result):
+        if key != self.range_key():
+            return
+        days, slots = result
+        self.range_model.load(days, slots)
+        header = self.range_view.horizontalHeader()
+        # A month does not fit stretched; let it scroll sideways instead
+        header.setSectionResizeMode(QHeaderView.Stretch if key[0] == 'week' else QHeaderView.Interactive)
+
+    def on_range_load_error(self, key, error_message):
+        if key == self.range_key():
+            QMessageBox.critical(self, "Error", f"Failed to load {key[0]}: {error_message}")
+
+    def open_range_day(self, index):
+        date = self.range_model.date_at(index.column())
+        self.date_edit.blockSignals(True)
+        self.date_edit.setDate(QDate(date.year, date.month, date.day))
+        self.date_edit.blockSignals(False)
+        self.view_combo.setCurrentIndex(VIEWS.index('day'))
+
     def _load_entry(self, date):
         try:
-            self.conn.rollback()
-            
-            self.cursor.execute("SELECT * FROM timeboxing_entry WHERE date = %s", (date,))
-            entry = self.cursor.fetchone()
-
-            if entry:
-                id, date, top_priorities, brain_dump, schedule = entry
-                # Ensure schedule is a JSON string
-                if isinstance(schedule, dict):
-                    schedule = json.dumps(schedule)
-                return (id, date, top_priorities, brain_dump, schedule)
-            return None  # Return None if no entry is found
+            # Schedules come back already parsed; on_load_finished takes dicts
+            return self.repository.load_entry(date)
         except Exception as e:
             print(f"Error in _load_entry: {e}")  # Print the error for debugging
             return None  # Return None on any error
 
-    def on_load_finished(self, entry):
+    def current_date(self):
+        return self.date_edit.date().toString("yyyy-MM-dd")
+
+    @UI_SECONDS.time(handler='on_load_finished')
+    def on_load_finished(self, date, entry):
+        if date != self.current_date():
+            # Stale result for a date the user has already left
+            return
+        self.loading = True
         if entry:
-            _, date, top_priorities, brain_dump, schedule = entry
-            self.top_priorities.setPlainText(top_priorities)
-            self.brain_dump.setPlainText(brain_dump)
-            
-            if isinstance(schedule, str):
-                try:
-                    schedule_dict = json.loads(schedule)
-                except json.JSONDecodeError:
-                    schedule_dict = {}
-            elif isinstance(schedule, dict):
-                schedule_dict = schedule
-            else:
-                schedule_dict = {}
-            
-            for time, data in schedule_dict.items():
-                if time in self.schedule_inputs:
-                    if isinstance(data, str):
-                        # Old format: just a string task
-                        self.schedule_inputs[time].setCurrentText(data)
-                        self.schedule_checkboxes[time].setChecked(False)
-                        self.schedule_colors[time] = QColor(255, 255, 255)
-                    elif isinstance(data, dict):
-                        # New format: dictionary with task, checked, and color
-                        self.schedule_inputs[time].setCurrentText(data.get('task', ''))
-                        self.schedule_checkboxes[time].setChecked(data.get('checked', False))
-                        self.schedule_colors[time] = QColor(data.get('color', '#FFFFFF'))
-                    else:
-                        # Unexpected format, set to default values
-                        self.schedule_inputs[time].setCurrentText('')
-                        self.schedule_checkboxes[time].setChecked(False)
-                        self.schedule_colors[time] = QColor(255, 255, 255)
-            
-            self.update_schedule_colors()
+            self.top_priorities.setPlainText(entry.top_priorities or "")
+            self.brain_dump.setPlainText(entry.brain_dump or "")
+            grid = grid_of(entry, self.default_grid)
+            self.schedule_model.load(grid, entry.schedule)
         else:
             # Clear all fields if no entry is found
             self.top_priorities.clear()
             self.brain_dump.clear()
-            for input in self.schedule_inputs.values():
-                input.setCurrentText("")
-            for checkbox in self.schedule_checkboxes.values():
-                checkbox.setChecked(False)
-            for time in self.schedule_colors:
-                self.schedule_colors[time] = QColor(255, 255, 255)
-            self.update_schedule_colors()
+            grid = self.default_grid
+            self.schedule_model.load(grid, {})
+        self.show_grid(grid)
         
         self.update_task_options()
-        
-        if self.sender() in self.worker_threads:
-            self.worker_threads.remove(self.sender())
-
-    def on_load_error(self, error_message):
+        self.rebuild_alerts()
+        self.loading = False
+        self.displayed_date = date
+        self.dirty = False
+
+    def on_load_error(self, date, error_message):
+        if date != self.current_date():
+            return
         QMessageBox.critical(self, "Error", f"Failed to load entry: {error_message}")
-        if self.sender() in self.worker_threads:
-            self.worker_threads.remove(self.sender())
 
 
 
     def closeEvent(self, event):
-        # Wait for all worker threads to finish
-        for worker in self.worker_threads:
-            worker.wait()
+        # Unpushed edits stay in the local store for the next session
+        self.sync.stop()
+        self.change_listener.stop()
+        # Drop queued loads and wait for running ones to finish
+        self.thread_pool.clear()
+        self.thread_pool.waitForDone()
+
+        try:
+            self.autosave.flush_blocking()
+        except Exception as e:
+            print(f"Error saving pending changes: {e}")
         
         try:
-            if self.conn:
-                self.conn.close()
+            self.sync.synchronizer.close()
+            self.repository.close()
             print("Database connection closed.")
         except Exception as e:
             print(f"Error closing database connection: {e}")
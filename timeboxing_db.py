@@ -0,0 +1,439 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import date as Date, datetime, timedelta
+
+from psycopg2.extensions import cursor as PgCursor
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+import schedule_codec
+from schedule_grid import DEFAULT_GRID, fits_grid, grid_of
+from search import search_entries
+
+
+# Owner of the rows written before entries were per-user (see migration 8)
+DEFAULT_USER = 'default'
+
+ENTRY_COLUMNS = ("id, date, top_priorities, brain_dump, schedule, slot_minutes, day_start, day_end, "
+                 "revision, updated_at")
+
+# revision/updated_at are maintained by a trigger; entries not read back from
+# the database (e.g. queued autosaves) leave them as None.
+DayEntry = namedtuple('DayEntry', 'id date top_priorities brain_dump schedule slot_minutes day_start day_end '
+                                  'revision updated_at', defaults=(None, None))
+
+# Every statement is scoped to one user through the (user_id, date) unique index
+_UPSERT_SQL = f"""
+    INSERT INTO timeboxing_entry (user_id, date, top_priorities, brain_dump, schedule, slot_minutes, day_start,
+                                  day_end)
+    VALUES %s
+    ON CONFLICT (user_id, date) DO UPDATE
+    SET top_priorities = EXCLUDED.top_priorities,
+        brain_dump = EXCLUDED.brain_dump,
+        schedule = EXCLUDED.schedule,
+        slot_minutes = EXCLUDED.slot_minutes,
+        day_start = EXCLUDED.day_start,
+        day_end = EXCLUDED.day_end
+    {{where}}
+    RETURNING {ENTRY_COLUMNS}
+"""
+
+UPSERT_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s)"
+
+UPSERT_ENTRY_SQL = _UPSERT_SQL.format(where="")
+
+# Only updates when the stored revision is the one the client last saw
+UPSERT_IF_REVISION_SQL = _UPSERT_SQL.format(where="WHERE timeboxing_entry.revision = %s").replace(
+    "VALUES %s", f"VALUES {UPSERT_TEMPLATE}")
+
+SELECT_REVISION_SQL = "SELECT revision, updated_at FROM timeboxing_entry WHERE user_id = %s AND date = %s"
+
+# Locks the day's row, if there is one, for a read-modify-write of its
+# schedule; the encoded form cannot be merged slot by slot in SQL
+SELECT_ENTRY_FOR_UPDATE_SQL = f"""
+    SELECT {ENTRY_COLUMNS} FROM timeboxing_entry WHERE user_id = %s AND date = %s FOR UPDATE
+"""
+
+SELECT_RANGE_SQL = f"""
+    SELECT {ENTRY_COLUMNS} FROM timeboxing_entry
+    WHERE user_id = %s AND date BETWEEN %s AND %s
+    ORDER BY date
+"""
+
+# Keyset page of rows changed after (updated_at, date), oldest change first
+SELECT_CHANGED_SQL = f"""
+    SELECT {ENTRY_COLUMNS} FROM timeboxing_entry
+    WHERE user_id = %s AND (updated_at, date) > (%s, %s)
+    ORDER BY updated_at, date
+    LIMIT %s
+"""
+
+
+class RevisionConflict(Exception):
+    """The entry was changed by someone else since the client loaded it."""
+
+
+def timed_cursor_class(on_query):
+    """psycopg2 cursor class that calls `on_query(statement, seconds)` after every execute.
+
+    Pass it as `cursor_factory` to `connect()` (or to `conn.cursor()`).
+    """
+    class TimedCursor(PgCursor):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                on_query(query, time.perf_counter() - started)
+
+        def executemany(self, query, vars_list):
+            started = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                on_query(query, time.perf_counter() - started)
+
+    return TimedCursor
+
+
+def env_connect_kwargs():
+    """psycopg2 connection arguments from the DB_* environment variables."""
+    return dict(
+        dbname=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        host=os.getenv('DB_HOST')
+    )
+
+
+# Marks a cache miss, since None is a valid cached value (no entry that day)
+MISSING = object()
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, Date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _schedule_param(schedule):
+    # Any shape goes in (JSON string, legacy or decoded dict); it is always
+    # stored in the compact encoding
+    if schedule is None:
+        return None
+    return schedule_codec.dumps(schedule)
+
+
+def entry_params(user_id, date, top_priorities, brain_dump, schedule, grid=None):
+    grid = grid or DEFAULT_GRID
+    return (user_id, date, top_priorities, brain_dump, _schedule_param(schedule),
+            grid.slot_minutes, grid.day_start, grid.day_end)
+
+
+def upsert_entry(cursor, user_id, date, top_priorities, brain_dump, schedule, grid=None, expected_revision=None):
+    """Insert or update `user_id`'s entry for `date` and return the stored row.
+
+    Relies on the unique constraint on `(user_id, date)`, so the
+    write is a single statement and concurrent saves cannot race. With
+    `expected_revision` (0 for a day that did not exist yet) the write only
+    happens if the stored revision still matches; otherwise RevisionConflict
+    is raised.
+    """
+    params = entry_params(user_id, date, top_priorities, brain_dump, schedule, grid)
+    if expected_revision is None:
+        cursor.execute(UPSERT_ENTRY_SQL % UPSERT_TEMPLATE, params)
+    else:
+        cursor.execute(UPSERT_IF_REVISION_SQL, (*params, expected_revision))
+    row = cursor.fetchone()
+    if row is None:
+        raise RevisionConflict(f"Entry for {date} was modified by another client")
+    return DayEntry(*row)
+
+
+def upsert_entries(cursor, user_id, entries, page_size=500):
+    """Upsert many `(date, top_priorities, brain_dump, schedule[, grid])` tuples for `user_id` at once.
+
+    Returns the stored rows. If the same date appears more than once the
+    last occurrence wins, since Postgres refuses to update a row twice in
+    one statement.
+    """
+    by_date = {}
+    for entry in entries:
+        by_date[entry[0]] = entry_params(user_id, *entry)
+    if not by_date:
+        return []
+    rows = execute_values(
+        cursor, UPSERT_ENTRY_SQL, list(by_date.values()),
+        template=UPSERT_TEMPLATE, page_size=page_size, fetch=True,
+    )
+    return [DayEntry(*row) for row in rows]
+
+
+def fetch_revision(cursor, user_id, date):
+    """Return `(revision, updated_at)` for `date`, or `(0, None)` if there is no entry."""
+    cursor.execute(SELECT_REVISION_SQL, (user_id, date))
+    return cursor.fetchone() or (0, None)
+
+
+def _locked_entry(cursor, user_id, date):
+    cursor.execute(SELECT_ENTRY_FOR_UPDATE_SQL, (user_id, date))
+    row = cursor.fetchone()
+    return DayEntry(*row) if row else None
+
+
+def save_slots(cursor, user_id, date, top_priorities, brain_dump, slots, grid=None, replace=False):
+    """Write the day's text and only the changed `slots` (`{time: slot}`).
+
+    With `replace` the stored schedule is swapped for `slots` entirely,
+    which is what a grid change needs.
+    """
+    try:
+        current = _locked_entry(cursor, user_id, date)
+        schedule = schedule_codec.merge_slots(current and current.schedule, slots, replace)
+        return upsert_entry(cursor, user_id, date, top_priorities, brain_dump, schedule, grid,
+                            expected_revision=current.revision if current else 0)
+    except RevisionConflict:
+        # The day did not exist and another client just created it; merge into theirs
+        current = _locked_entry(cursor, user_id, date)
+        schedule = schedule_codec.merge_slots(current.schedule, slots, replace)
+        return upsert_entry(cursor, user_id, date, top_priorities, brain_dump, schedule, grid)
+
+
+def check_slot_fits(time, entry):
+    grid = grid_of(entry)
+    if not fits_grid(time, grid):
+        raise ValueError(f"{time} is not a slot of this day's grid ({grid.slot_minutes}-minute slots, "
+                         f"{grid.day_start}:00-{grid.day_end}:00)")
+
+
+def patch_slot(cursor, user_id, date, time, changes, expected_revision=None):
+    """Merge `changes` (some of task/checked/color) into one slot.
+
+    The row is read under a lock, so checking `expected_revision` and
+    writing happen atomically. Raises ValueError, before writing anything,
+    if `time` is not a slot of the entry's grid.
+    """
+    current = _locked_entry(cursor, user_id, date)
+    check_slot_fits(time, current)
+    revision = current.revision if current else 0
+    if expected_revision is not None and expected_revision != revision:
+        raise RevisionConflict(f"Entry for {date} was modified by another client")
+    schedule = schedule_codec.patch_slot(current and current.schedule, time, changes)
+    return upsert_entry(cursor, user_id, date, current and current.top_priorities, current and current.brain_dump,
+                        schedule, grid_of(current), expected_revision=revision)
+
+
+def fetch_entries_between(cursor, user_id, start, end):
+    cursor.execute(SELECT_RANGE_SQL, (user_id, start, end))
+    return [DayEntry(*row) for row in cursor.fetchall()]
+
+
+def fetch_entries_changed_since(cursor, user_id, since, after_date=Date.min, limit=1000):
+    """Up to `limit` of `user_id`'s entries updated after `since`, ordered by `(updated_at, date)`.
+
+    Pass the last row's `updated_at` and `date` back in to get the next page.
+    """
+    cursor.execute(SELECT_CHANGED_SQL, (user_id, since, after_date, limit))
+    return [DayEntry(*row) for row in cursor.fetchall()]
+
+
+class DayCache:
+    """Thread-safe LRU of day entries keyed by date.
+
+    Days known to have no entry are cached as None so empty days do not
+    go back to the database either.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, date, default=MISSING):
+        date = as_date(date)
+        with self._lock:
+            if date not in self._entries:
+                return default
+            self._entries.move_to_end(date)
+            return self._entries[date]
+
+    def put(self, date, entry):
+        date = as_date(date)
+        with self._lock:
+            self._entries[date] = entry
+            self._entries.move_to_end(date)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, date=None):
+        with self._lock:
+            if date is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(as_date(date), None)
+
+
+def load_day(cache, date, load_range, prefetch_days=3):
+    """Return the entry for `date`, reading through `cache`.
+
+    On a miss the surrounding `prefetch_days` on either side are fetched in
+    the same range query, so stepping through a week costs one round trip.
+    Neighbours that are already cached are left alone, since the cache may
+    hold edits that have not been written yet.
+    """
+    date = as_date(date)
+    entry = cache.get(date)
+    if entry is not MISSING:
+        return entry
+
+    start, end = prefetch_window(date, prefetch_days)
+    return fill_day_cache(cache, date, start, end, load_range(start, end))
+
+
+def prefetch_window(date, prefetch_days=3):
+    return date - timedelta(days=prefetch_days), date + timedelta(days=prefetch_days)
+
+
+def fill_day_cache(cache, date, start, end, entries):
+    """Cache the `entries` loaded for `start`..`end` and return the one for `date`."""
+    found = {e.date: e for e in entries}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        if day == date or cache.get(day) is MISSING:
+            cache.put(day, found.get(day))
+    return found.get(date)
+
+
+# Multi-day planner views and how many days around the chosen date they show
+VIEWS = ('day', 'week', 'month')
+
+
+def view_range(date, view):
+    """First and last day of the week (Monday to Sunday) or month `view` shows around `date`."""
+    date = as_date(date)
+    if view == 'day':
+        return date, date
+    if view == 'week':
+        start = date - timedelta(days=date.weekday())
+        return start, start + timedelta(days=6)
+    if view == 'month':
+        start = date.replace(day=1)
+        next_month = (start + timedelta(days=31)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    raise ValueError(f"view must be one of {VIEWS}")
+
+
+def load_days(cache, start, end, load_range):
+    """Return `(date, entry or None)` for every day from `start` to `end`, reading through `cache`.
+
+    If any day is missing from the cache the whole range is fetched in one
+    range query; days already cached keep their cached entry, as in
+    fill_day_cache.
+    """
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    entries = [cache.get(day) for day in days]
+    if any(entry is MISSING for entry in entries):
+        found = {e.date: e for e in load_range(start, end)}
+        for index, day in enumerate(days):
+            if entries[index] is MISSING:
+                entries[index] = found.get(day)
+                cache.put(day, entries[index])
+    return list(zip(days, entries))
+
+
+class EntryRepository:
+    """Thread-safe access to one user's `timeboxing_entry` rows backed by a connection pool.
+
+    Every call borrows its own connection, so loads started from worker
+    threads never share a cursor.
+    """
+
+    def __init__(self, minconn=1, maxconn=4, cache=None, prefetch_days=3, user_id=DEFAULT_USER,
+                 **connect_kwargs):
+        self.user_id = user_id
+        self.maxconn = maxconn
+        self.cache = cache if cache is not None else DayCache()
+        self.prefetch_days = prefetch_days
+        self.pool = ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        finally:
+            self.pool.putconn(conn)
+
+    @contextmanager
+    def cursor(self):
+        conn = self.pool.getconn()
+        try:
+            # Commits on success, rolls back on error
+            with conn:
+                with conn.cursor() as cursor:
+                    yield cursor
+        finally:
+            self.pool.putconn(conn)
+
+    def search(self, query, limit=50):
+        with self.cursor() as cursor:
+            return search_entries(cursor, self.user_id, query, limit)
+
+    def cached_entry(self, date):
+        return self.cache.get(date)
+
+    def load_entry(self, date):
+        return load_day(self.cache, date, self.load_range, self.prefetch_days)
+
+    def load_range(self, start, end):
+        with self.cursor() as cursor:
+            return fetch_entries_between(cursor, self.user_id, start, end)
+
+    def load_days(self, start, end):
+        return load_days(self.cache, as_date(start), as_date(end), self.load_range)
+
+    def save_entry(self, date, top_priorities, brain_dump, schedule, grid=None):
+        self.cache.invalidate(date)
+        with self.cursor() as cursor:
+            entry = upsert_entry(cursor, self.user_id, date, top_priorities, brain_dump, schedule, grid)
+        self.cache.put(entry.date, entry)
+        return entry
+
+    def save_entries(self, entries):
+        entries = list(entries)
+        for entry in entries:
+            self.cache.invalidate(entry[0])
+        with self.cursor() as cursor:
+            saved = upsert_entries(cursor, self.user_id, entries)
+        for entry in saved:
+            self.cache.put(entry.date, entry)
+        return saved
+
+    def save_changes(self, changes):
+        """Write `{date: change}` slot deltas in one transaction.
+
+        Each change has top_priorities, brain_dump, slots, grid and replace.
+        Cached days keep their (possibly newer) local content and only take
+        the stored id and revision.
+        """
+        saved = []
+        with self.cursor() as cursor:
+            for date, change in changes.items():
+                saved.append(save_slots(cursor, self.user_id, date, change['top_priorities'], change['brain_dump'],
+                                        change['slots'], change['grid'], change['replace']))
+        for entry in saved:
+            cached = self.cache.get(entry.date)
+            if cached is MISSING or cached is None:
+                self.cache.put(entry.date, entry)
+            else:
+                self.cache.put(entry.date, cached._replace(
+                    id=entry.id, revision=entry.revision, updated_at=entry.updated_at))
+        return saved
+
+    def close(self):
+        self.pool.closeall()